@@ -0,0 +1 @@
+"""Benchmarks of the groceries package. See benchmarks.suite and benchmarks.import_time."""
@@ -0,0 +1,98 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          corpus
+ Purpose:       Synthetic cookbooks for benchmarking, made by varying the
+                recipes of the test cookbook.
+-------------------------------------------------------------------------------
+'''
+
+import os
+import re
+import json
+import random
+from typing import Dict, Iterator, List
+
+import yaml
+
+from groceries.loader import map_fields, PLAIN_KEY_PATTERN, PLAIN_VALUE_PATTERN
+
+BASE_COOKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'groceries', 'test', 'bin', 'cookbook.yaml')
+
+# Fields of the written cookbook, in the same order and language as the test cookbook.
+FIELD_NAMES = {
+    'tags': 'kategorier',
+    'time': 'tid',
+    'how_to': 'oppskrift',
+    'serves': 'antall personer i oppskrift',
+    'ingredients': 'ingredienser',
+}
+
+LEADING_NUMBER = re.compile(r'^\d+')
+
+
+def base_recipes(filename: str = BASE_COOKBOOK) -> List[Dict]:
+    """Return the recipes of a cookbook file as dicts of Recipe arguments."""
+    with open(filename, encoding='utf-8-sig') as fid:
+        cookbook = yaml.load(fid, Loader=yaml.BaseLoader)
+    return [dict(map_fields(fields), name=name) for name, fields in cookbook.items()]
+
+
+def generate_recipes(count: int, seed: int = 0, filename: str = BASE_COOKBOOK) -> Iterator[Dict]:
+    """Generate count recipes as dicts of Recipe arguments. The first recipes
+    are the recipes of the base cookbook. The rest are copies with a number
+    added to the name, where ingredients are dropped, added from other recipes
+    and have their amounts changed. The same seed gives the same recipes."""
+    rng = random.Random(seed)
+    base = base_recipes(filename)
+    pool = [line for recipe in base for line in recipe.get('ingredients', [])]
+    tags = sorted({tag for recipe in base for tag in recipe.get('tags', [])})
+
+    for i in range(count):
+        recipe = dict(base[i % len(base)])
+        if i < len(base):
+            yield recipe
+            continue
+
+        ingredients = [line for line in recipe.get('ingredients', []) if rng.random() < 0.8]
+        ingredients += rng.sample(pool, rng.randint(0, 3))
+        recipe['ingredients'] = [LEADING_NUMBER.sub(lambda match: str(int(match.group()) * rng.randint(1, 4)), line)
+                                 for line in ingredients]
+        recipe['tags'] = list(dict.fromkeys(recipe.get('tags', []) + rng.sample(tags, rng.randint(0, 1))))
+        recipe['name'] = '%s %d' % (recipe['name'], i)
+        yield recipe
+
+
+def _scalar(value: object) -> str:
+    """Return value as a plain YAML scalar if possible, or else as a quoted scalar."""
+    value = str(value)
+    if PLAIN_VALUE_PATTERN.match(value) and ': ' not in value and not value.endswith(':'):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def write_cookbook(recipes: Iterator[Dict], filename: str) -> None:
+    """Write recipes (dicts of Recipe arguments) to a cookbook file in the
+    format of the test cookbook."""
+    with open(filename, 'w', encoding='utf-8') as fid:
+        for recipe in recipes:
+            name = recipe['name']
+            fid.write('%s:\n' % (name if PLAIN_KEY_PATTERN.match(name + ':') else json.dumps(name, ensure_ascii=False)))
+            for field, field_name in FIELD_NAMES.items():
+                value = recipe.get(field)
+                if value is None or value == []:
+                    continue
+                if field == 'tags':
+                    fid.write('    %s: %s\n' % (field_name, _scalar(', '.join(value))))
+                elif field == 'ingredients':
+                    fid.write('    %s:\n' % field_name)
+                    for line in value:
+                        fid.write('        -   %s\n' % _scalar(line))
+                else:
+                    fid.write('    %s: %s\n' % (field_name, _scalar(value)))
+
+
+def generate_cookbook(filename: str, count: int, seed: int = 0) -> str:
+    """Write a synthetic cookbook with count recipes to filename, and return the filename."""
+    write_cookbook(generate_recipes(count, seed), filename)
+    return filename
@@ -0,0 +1,77 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          import_time
+ Purpose:       Benchmark of the time it takes to import groceries and parse
+                the first ingredient, in fresh interpreters.
+
+                Only 'import groceries' is lazy. Importing Ingredient imports
+                numpy, tregex, the units and the parser, which Ingredient
+                needs, and numpy takes most of that time. 'import numpy' is
+                timed as the floor of the statements using the package API.
+
+                Run with --path to time another checkout of the package, e.g.
+                an older version to compare with:
+                    python benchmarks/import_time.py --path ../groceries-old
+-------------------------------------------------------------------------------
+'''
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Statements timed in a fresh interpreter each.
+STATEMENTS = {
+    'import numpy': 'import numpy',
+    'import groceries': 'import groceries',
+    'import configs': 'from groceries.configs.config_handler import config',
+    'import Ingredient': 'from groceries import Ingredient',
+    'first parse': 'from groceries import Ingredient; Ingredient("2 dl melk")',
+}
+
+TIMER = '''
+import time
+start = time.perf_counter()
+exec(compile(%r, 'benchmark', 'exec'))
+print(time.perf_counter() - start)
+'''
+
+
+def time_statement(statement: str, path: str) -> float:
+    """Return the seconds it takes to run statement in a new interpreter,
+    with the package at path first on the path."""
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([path, os.environ.get('PYTHONPATH', '')]))
+    output = subprocess.run([sys.executable, '-c', TIMER % statement], env=environment, cwd=path, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return float(output)
+
+
+def run(path: str, repeat: int) -> dict:
+    """Return the median and minimum time of every statement in milliseconds."""
+    results = {}
+    for name, statement in STATEMENTS.items():
+        times = [time_statement(statement, path) * 1000 for _ in range(repeat)]
+        results[name] = {'median_ms': statistics.median(times), 'min_ms': min(times)}
+    return results
+
+
+def main() -> None:
+    argument_parser = argparse.ArgumentParser(description=__doc__.split('Purpose:')[1].split('---')[0].strip())
+    argument_parser.add_argument('--path', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 help='Directory containing the groceries package. Defaults to this checkout.')
+    argument_parser.add_argument('--repeat', type=int, default=10, help='Number of interpreters per statement.')
+    argument_parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    arguments = argument_parser.parse_args()
+
+    results = run(arguments.path, arguments.repeat)
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print('%-20s median %8.1f ms   min %8.1f ms' % (name, result['median_ms'], result['min_ms']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          suite
+ Purpose:       Benchmarks of parsing, unit matching, collation, GroceryList
+                arithmetic, pantry subtraction, recipe matching and menu
+                parsing, on a synthetic cookbook of any size.
+
+                Results are written as JSON, and can be compared with the
+                results of an earlier run:
+                    python -m benchmarks.suite --recipes 10000 --output baseline.json
+                    python -m benchmarks.suite --recipes 10000 --baseline baseline.json
+-------------------------------------------------------------------------------
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import numpy
+
+from groceries import GroceryList, Recipe, Cookbook
+from groceries.groceries import IngredientComponent
+from groceries.loader import load_cookbook
+from groceries.pantry import Pantry
+from groceries.parser import parser
+from groceries.units import units
+
+from benchmarks import corpus
+
+DEFAULT_RECIPES = 1000
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.2  # A benchmark is a regression if it is more than 20 % slower than the baseline.
+
+SAMPLE_SIZE = 200  # Number of recipes used by the benchmarks that work on a few recipes at a time.
+
+MENU_DAYS = ['mandag', 'tirsdag', 'onsdag', 'torsdag', 'fredag', 'lørdag', 'søndag']
+
+
+class Context:
+    """The synthetic cookbook and the inputs of the benchmarks. Everything is
+    made the first time it is used, from the number of recipes and the seed."""
+
+    def __init__(self, recipes: int = DEFAULT_RECIPES, seed: int = 0) -> None:
+        self.size = recipes
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, name: str, make: Callable[[], object]) -> object:
+        if name not in self._cache:
+            self._cache[name] = make()
+        return self._cache[name]
+
+    @property
+    def recipe_dicts(self) -> List[Dict]:
+        return self._get('recipe_dicts', lambda: list(corpus.generate_recipes(self.size, self.seed)))
+
+    @property
+    def lines(self) -> List[str]:
+        """The unique ingredient lines of the cookbook."""
+        return self._get('lines', lambda: list(dict.fromkeys(
+            line for recipe in self.recipe_dicts for line in recipe.get('ingredients', []))))
+
+    @property
+    def cookbook(self) -> Cookbook:
+        return self._get('cookbook', lambda: Cookbook([Recipe(**recipe) for recipe in self.recipe_dicts]))
+
+    @property
+    def sample(self) -> List[Recipe]:
+        """A random sample of the recipes in the cookbook."""
+        def make() -> List[Recipe]:
+            recipes = list(self.cookbook.recipes.values())
+            return random.Random(self.seed).sample(recipes, min(SAMPLE_SIZE, len(recipes)))
+        return self._get('sample', make)
+
+    @property
+    def filename(self) -> str:
+        """A cookbook file with the recipes, removed when the program exits."""
+        def make() -> str:
+            fid, filename = tempfile.mkstemp(suffix='.yaml')
+            os.close(fid)
+            corpus.write_cookbook(self.recipe_dicts, filename)
+            _temporary_files.append(filename)
+            return filename
+        return self._get('filename', make)
+
+
+_temporary_files = []
+
+
+class Benchmark(NamedTuple):
+    """A benchmark. setup is called before every timed run, and returns the
+    arguments of run and the number of operations run performs."""
+    name: str
+    setup: Callable[[Context], Tuple[tuple, int]]
+    run: Callable
+
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, setup: Callable[[Context], Tuple[tuple, int]]) -> Callable:
+    """Decorator adding a function as a benchmark."""
+    def decorator(run: Callable) -> Callable:
+        BENCHMARKS.append(Benchmark(name, setup, run))
+        return run
+    return decorator
+
+
+def _uncached_lines(context: Context) -> Tuple[tuple, int]:
+    parser.cache.clear()
+    return (context.lines,), len(context.lines)
+
+
+@benchmark('parse_ingredients', _uncached_lines)
+def parse_ingredients(lines: List[str]) -> None:
+    for line in lines:
+        IngredientComponent(line)
+
+
+def _unit_strings(context: Context) -> Tuple[tuple, int]:
+    strings = list(units.index) + [text for entries in units.multi_word_index.values() for text, *_ in entries]
+    strings += ['%d %s' % (i, text) for i, text in enumerate(strings)] + ['ingen enhet', '']
+    return (strings,), len(strings)
+
+
+@benchmark('units_match', _unit_strings)
+def units_match(strings: List[str]) -> None:
+    for string in strings:
+        units.match(string)
+
+
+def _grocery_list(context: Context) -> Tuple[tuple, int]:
+    ingredients = [ing for recipe in context.sample for ing in recipe.ingredients.ingredient_list]
+    return (GroceryList(ingredients, indexed=False),), len(ingredients)
+
+
+@benchmark('collate_ingredients', _grocery_list)
+def collate_ingredients(grocery_list: GroceryList) -> None:
+    grocery_list.collate_ingredients()
+
+
+@benchmark('ingredients_formatted', _grocery_list)
+def ingredients_formatted(grocery_list: GroceryList) -> None:
+    GroceryList(grocery_list.ingredient_list).ingredients_formatted(sort='alphabetical')
+
+
+def _recipe_lists(context: Context) -> Tuple[tuple, int]:
+    lists = [recipe.ingredients for recipe in context.sample]
+    return (lists,), len(lists)
+
+
+@benchmark('grocery_list_arithmetic', _recipe_lists)
+def grocery_list_arithmetic(lists: List[GroceryList]) -> None:
+    total = GroceryList()
+    for grocery_list in lists:
+        total += grocery_list * 2
+        total -= grocery_list
+    total.ingredients()
+
+
+def _compare_lists(context: Context) -> Tuple[tuple, int]:
+    groceries = GroceryList([ing for recipe in context.sample[:10] for ing in recipe.ingredients.ingredient_list])
+    lists = [recipe.ingredients for recipe in context.sample]
+    return (lists, groceries), len(lists)
+
+
+@benchmark('compare_with', _compare_lists)
+def compare_with(lists: List[GroceryList], groceries: GroceryList) -> None:
+    for grocery_list in lists:
+        grocery_list.compare_with(groceries, verbose=True)
+
+
+def _pantry(context: Context) -> Tuple[tuple, int]:
+    pantry = Pantry(context.lines)
+    lists = [recipe.ingredients for recipe in context.sample]
+    return (pantry, lists), len(lists)
+
+
+@benchmark('subtract_pantry', _pantry)
+def subtract_pantry(pantry: Pantry, lists: List[GroceryList]) -> None:
+    for grocery_list in lists:
+        pantry.subtract(grocery_list)
+
+
+def _search_strings(context: Context) -> Tuple[tuple, int]:
+    rng = random.Random(context.seed)
+    strings = []
+    for recipe in context.sample:
+        name = recipe.name.lower()
+        i = rng.randrange(len(name))
+        strings += [name[:i] + name[i + 1:]]  # A typo, so the fuzzy search is used.
+    strings += [tag for recipe in context.sample[:20] for tag in recipe.tags]
+    context.cookbook.reset_available_recipes()
+    random.seed(context.seed)
+    return (context.cookbook, strings), len(strings)
+
+
+@benchmark('find_recipe', _search_strings)
+def find_recipe(cookbook: Cookbook, strings: List[str]) -> None:
+    for string in strings:
+        cookbook.find_recipe(string, make_unavailable=False)
+
+
+def _grocery_lists(context: Context) -> Tuple[tuple, int]:
+    # Every recipe sharing an ingredient with a list is scored, so the time grows with the size of the cookbook.
+    lists = [GroceryList(recipe.ingredients.ingredient_list[:2]) for recipe in context.sample[:5]]
+    context.cookbook.reset_available_recipes()
+    random.seed(context.seed)
+    return (context.cookbook, lists), len(lists)
+
+
+@benchmark('find_recipe_with_groceries', _grocery_lists)
+def find_recipe_with_groceries(cookbook: Cookbook, lists: List[GroceryList]) -> None:
+    for grocery_list in lists:
+        cookbook.find_recipe_with_groceries(grocery_list, make_unavailable=False)
+
+
+def _menus(context: Context) -> Tuple[tuple, int]:
+    rng = random.Random(context.seed)
+    menus = []
+    for i in range(20):
+        recipes = rng.sample(context.sample, len(MENU_DAYS))
+        lines = ['%s: %s x%d' % (day, recipe.name.lower(), rng.randint(1, 3)) for day, recipe in zip(MENU_DAYS, recipes)]
+        lines += [''] + rng.sample(context.lines, min(5, len(context.lines)))
+        menus += ['\n'.join(lines)]
+    context.cookbook.reset_available_recipes()
+    random.seed(context.seed)
+    return (context.cookbook, menus), len(menus)
+
+
+@benchmark('parse_menu', _menus)
+def parse_menu(cookbook: Cookbook, menus: List[str]) -> None:
+    for menu in menus:
+        cookbook.parse_menu(menu).groceries.ingredients()
+        cookbook.reset_available_recipes()
+
+
+def _cookbook_file(context: Context) -> Tuple[tuple, int]:
+    return (context.filename,), context.size
+
+
+@benchmark('load_cookbook', _cookbook_file)
+def load(filename: str) -> None:
+    load_cookbook(filename)
+
+
+def run(context: Context, repeat: int = DEFAULT_REPEAT, names: List[str] = None,
+        log: Callable[[str], None] = None) -> Dict:
+    """Run the benchmarks, and return the results as a JSON serializable dict."""
+    results = {}
+    for case in BENCHMARKS:
+        if names and case.name not in names:
+            continue
+        times = []
+        for i in range(repeat + 1):
+            arguments, operations = case.setup(context)
+            start = time.perf_counter()
+            case.run(*arguments)
+            if i > 0:  # The first run warms up caches and compiled patterns, and is not timed.
+                times += [time.perf_counter() - start]
+
+        median = statistics.median(times)
+        results[case.name] = {
+            'operations': operations,
+            'repeat': repeat,
+            'min': min(times),
+            'median': median,
+            'mean': statistics.mean(times),
+            'per_operation': median / operations if operations else None,
+        }
+        if log:
+            log('%-28s %10.2f ms  %10.2f us/op' % (case.name, median * 1000, results[case.name]['per_operation'] * 1e6))
+
+    return {
+        'meta': {
+            'recipes': context.size,
+            'seed': context.seed,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> Dict:
+    """Compare the fastest times of results with a baseline, as the fastest
+    time is the least affected by other load on the machine. Returns the ratio
+    of every benchmark in both, and the names of the regressions."""
+    ratios = {}
+    for name, result in results['results'].items():
+        if name in baseline['results'] and baseline['results'][name]['min'] > 0:
+            ratios[name] = result['min'] / baseline['results'][name]['min']
+
+    return {
+        'tolerance': tolerance,
+        'ratios': ratios,
+        'regressions': sorted(name for name, ratio in ratios.items() if ratio > 1 + tolerance),
+        'missing': sorted(set(baseline['results']) - set(results['results'])),
+    }
+
+
+def main(arguments: List[str] = None) -> int:
+    argument_parser = argparse.ArgumentParser(description='Benchmarks of the groceries package.')
+    argument_parser.add_argument('--recipes', type=int, default=DEFAULT_RECIPES,
+                                 help='Number of recipes in the synthetic cookbook (up to 100000 or more).')
+    argument_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic cookbook.')
+    argument_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Timed runs of each benchmark.')
+    argument_parser.add_argument('--only', nargs='*', help='Names of the benchmarks to run.')
+    argument_parser.add_argument('--output', help='Write the results as JSON to this file instead of stdout.')
+    argument_parser.add_argument('--baseline', help='JSON results to compare with. Exits with 1 on regressions.')
+    argument_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                                 help='Allowed slowdown relative to the baseline, as a fraction.')
+    arguments = argument_parser.parse_args(arguments)
+
+    def log(message: str) -> None:
+        print(message, file=sys.stderr)
+
+    try:
+        results = run(Context(arguments.recipes, arguments.seed), arguments.repeat, arguments.only, log)
+    finally:
+        for filename in _temporary_files:
+            os.remove(filename)
+        _temporary_files.clear()
+
+    status = 0
+    if arguments.baseline:
+        with open(arguments.baseline) as fid:
+            comparison = compare(results, json.load(fid), arguments.tolerance)
+        results['comparison'] = comparison
+        for name, ratio in comparison['ratios'].items():
+            log('%-28s %6.2fx baseline%s' % (name, ratio, '  REGRESSION' if name in comparison['regressions'] else ''))
+        status = 1 if comparison['regressions'] else 0
+
+    text = json.dumps(results, indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w') as fid:
+            fid.write(text + '\n')
+    else:
+        print(text)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,58 @@
-from groceries.groceries import GroceryList, Ingredient
-from groceries.recipes import Recipe, Cookbook, Menu
-from groceries.units import Unit, Units
-from groceries.configs import constants, unit_definition, menu_format, settings, language
-from groceries.configs import config_handler, config_types
-from groceries.configs.config_handler import config
-
-__all__ = ['GroceryList', 'Ingredient', 'Recipe', 'Cookbook', 'Menu', 'Unit', 'Units', 'config']
\ No newline at end of file
+import importlib
+from typing import TYPE_CHECKING
+
+# The package API is imported on first use, so that importing groceries (or one of its submodules) does not import
+# numpy, tregex and the whole package up front.
+_lazy_attributes = {
+    'GroceryList': 'groceries.groceries',
+    'Ingredient': 'groceries.groceries',
+    'Recipe': 'groceries.recipes',
+    'Cookbook': 'groceries.recipes',
+    'Menu': 'groceries.recipes',
+    'Unit': 'groceries.units',
+    'Units': 'groceries.units',
+    'config': 'groceries.configs.config_handler',
+}
+
+_lazy_modules = {
+    'constants': 'groceries.configs.constants',
+    'unit_definition': 'groceries.configs.unit_definition',
+    'menu_format': 'groceries.configs.menu_format',
+    'settings': 'groceries.configs.settings',
+    'language': 'groceries.configs.language',
+    'density_table': 'groceries.configs.density_table',
+    'config_handler': 'groceries.configs.config_handler',
+    'config_types': 'groceries.configs.config_types',
+}
+
+# Submodules that were imported with the package, and are still available as attributes of it.
+_submodules = ('groceries', 'recipes', 'units', 'parser', 'columns', 'search', 'configs', 'instrumentation',
+               'similarity', 'symbols', 'pantry', 'conversion', 'aio')
+
+__all__ = ['GroceryList', 'Ingredient', 'Recipe', 'Cookbook', 'Menu', 'Unit', 'Units', 'config']
+
+
+def __getattr__(name: str) -> object:
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+    elif name in _lazy_modules:
+        value = importlib.import_module(_lazy_modules[name])
+    elif name in _submodules:
+        value = importlib.import_module(__name__ + '.' + name)
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    globals()[name] = value  # Later lookups don't go through __getattr__.
+    return value
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(_lazy_attributes) | set(_lazy_modules) | set(_submodules))
+
+
+if TYPE_CHECKING:
+    from groceries.groceries import GroceryList, Ingredient
+    from groceries.recipes import Recipe, Cookbook, Menu
+    from groceries.units import Unit, Units
+    from groceries.configs import constants, unit_definition, menu_format, settings, language, density_table
+    from groceries.configs import config_handler, config_types
+    from groceries.configs.config_handler import config
@@ -0,0 +1,149 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          aio
+ Purpose:       Module with an asyncio interface for parsing menus and building
+                grocery lists, which runs the work in an executor in chunks of
+                lines, so that the event loop is not blocked.
+-------------------------------------------------------------------------------
+'''
+
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Callable, Iterator, List, Sequence
+
+from groceries.groceries import GroceryList, Ingredient
+from groceries.recipes import Cookbook, Menu, RandomGenerator
+
+CHUNK_SIZE = 8  # Default number of lines processed in the executor at a time.
+CONCURRENCY = 4  # Default number of menus or grocery lists processed at the same time by the batch functions.
+
+
+def _chunks(items: Sequence, chunk_size: int) -> Iterator[Sequence]:
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1, got %r.' % chunk_size)
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+async def _run(function: Callable, *args: object, executor: Executor = None, offload: bool = True) -> object:
+    """Run function in executor (by default the executor of the event loop),
+    or on the event loop after yielding to other tasks if offload is False."""
+    if not offload:
+        await asyncio.sleep(0)
+        return function(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args))
+
+
+async def _gather(coroutines: List) -> list:
+    """Like asyncio.gather, but the other tasks are cancelled if one of them fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def _parse_menu(cookbook: Cookbook, menu_text: str, seed: object, rng: RandomGenerator, executor: Executor,
+                      chunk_size: int, offload: bool) -> Menu:
+    menu = Menu(cookbook, menu_text, seed=seed, rng=rng, process=False)
+
+    def process(lines: Sequence[str]) -> list:
+        return [menu.process_line(line) for line in lines]
+
+    processed_lines = []
+    for lines in _chunks(menu.input_lines, chunk_size):
+        processed_lines += await _run(process, lines, executor=executor, offload=offload)
+
+    # Formatting the plan and collating the groceries:
+    await _run(menu.set_processed_lines, processed_lines, executor=executor, offload=offload)
+    return menu
+
+
+async def parse_menu(cookbook: Cookbook, menu_text: str, seed: object = None, rng: RandomGenerator = None,
+                     executor: Executor = None, chunk_size: int = CHUNK_SIZE, timeout: float = None,
+                     offload: bool = True) -> Menu:
+    """Return the same Menu as cookbook.parse_menu(menu_text, seed, rng),
+    without blocking the event loop.
+
+    The lines of the menu are processed in order, chunk_size lines at a time,
+    in executor (by default the executor of the event loop), and the event
+    loop runs other tasks in between. With offload=False the lines are
+    processed on the event loop, yielding to other tasks between chunks.
+
+    Raises asyncio.TimeoutError if the menu is not parsed within timeout
+    seconds. When cancelled or timed out, no more chunks are started, but a
+    chunk that is already running in the executor is completed. Like
+    cookbook.parse_menu, the recipes picked are made unavailable in the
+    cookbook, so concurrent menus should be parsed in separate sessions of
+    the cookbook (see Cookbook.session and parse_menus)."""
+    return await asyncio.wait_for(_parse_menu(cookbook, menu_text, seed, rng, executor, chunk_size, offload),
+                                  timeout)
+
+
+async def parse_menus(cookbook: Cookbook, menu_texts: Sequence[str], seeds: Sequence[object] = None,
+                      executor: Executor = None, chunk_size: int = CHUNK_SIZE, timeout: float = None,
+                      concurrency: int = CONCURRENCY, offload: bool = True) -> List[Menu]:
+    """Return the same Menus as cookbook.parse_menus(menu_texts, seeds),
+    without blocking the event loop. Each menu is parsed in its own session
+    of the cookbook, and at most concurrency menus are parsed at the same
+    time. The groceries of the menus are the grocery lists of the batch.
+
+    Raises asyncio.TimeoutError if all menus are not parsed within timeout
+    seconds. If parsing a menu fails, or the batch is cancelled, the other
+    menus are cancelled."""
+    menu_texts = list(menu_texts)
+    seeds = list(seeds) if seeds is not None else [None] * len(menu_texts)
+    if len(seeds) != len(menu_texts):
+        raise ValueError('Got %d seeds for %d menus.' % (len(seeds), len(menu_texts)))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def parse(menu_text: str, seed: object) -> Menu:
+        async with semaphore:
+            return await _parse_menu(cookbook.session(seed), menu_text, None, None, executor, chunk_size, offload)
+
+    return await asyncio.wait_for(_gather([parse(menu_text, seed) for menu_text, seed in zip(menu_texts, seeds)]),
+                                  timeout)
+
+
+async def _grocery_list(ingredients: Sequence[str], executor: Executor, chunk_size: int, offload: bool,
+                        options: dict) -> GroceryList:
+    def parse(lines: Sequence[str]) -> List[Ingredient]:
+        return [Ingredient(line) for line in lines]
+
+    parsed = []
+    for lines in _chunks(list(ingredients), chunk_size):
+        parsed += await _run(parse, lines, executor=executor, offload=offload)
+
+    # The ingredients are collated when added to the list:
+    return await _run(functools.partial(GroceryList, parsed, **options), executor=executor, offload=offload)
+
+
+async def grocery_list(ingredients: Sequence[str], executor: Executor = None, chunk_size: int = CHUNK_SIZE,
+                       timeout: float = None, offload: bool = True, **options: object) -> GroceryList:
+    """Return GroceryList(ingredients, **options) without blocking the event
+    loop. The ingredients are parsed chunk_size at a time in executor, like
+    the lines of parse_menu."""
+    return await asyncio.wait_for(_grocery_list(ingredients, executor, chunk_size, offload, options), timeout)
+
+
+async def grocery_lists(ingredient_lists: Sequence[Sequence[str]], executor: Executor = None,
+                        chunk_size: int = CHUNK_SIZE, timeout: float = None, concurrency: int = CONCURRENCY,
+                        offload: bool = True, **options: object) -> List[GroceryList]:
+    """Return a GroceryList for every list of ingredients, without blocking
+    the event loop. At most concurrency lists are built at the same time.
+
+    Raises asyncio.TimeoutError if all lists are not built within timeout
+    seconds. If building a list fails, or the batch is cancelled, the other
+    lists are cancelled."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def build(ingredients: Sequence[str]) -> GroceryList:
+        async with semaphore:
+            return await _grocery_list(ingredients, executor, chunk_size, offload, options)
+
+    return await asyncio.wait_for(_gather([build(ingredients) for ingredients in ingredient_lists]), timeout)
@@ -0,0 +1,175 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          columns
+ Purpose:       Module containing a columnar store of the amounts of the
+                IngredientComponents in a GroceryList, for collating and
+                scaling with single numpy operations.
+-------------------------------------------------------------------------------
+'''
+
+import numpy
+from typing import List, Dict, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from groceries.groceries import Ingredient
+
+
+class CollatedColumns:
+    """The collated amounts of a ComponentColumns, one entry per ingredient key.
+
+    The amounts are the same as Ingredient.amount() for the collated
+    Ingredient with the same key."""
+
+    def __init__(self, keys: List[int], first: numpy.ndarray, last: numpy.ndarray, complete: numpy.ndarray,
+                 ranged: numpy.ndarray, negative: numpy.ndarray) -> None:
+        self.keys = keys
+        self.first = first  # Sum of the first (or only) number of every component.
+        self.last = last  # Sum of the last (or only) number of every component.
+        self.complete = complete  # All components have an amount.
+        self.ranged = ranged  # At least one component is a range.
+        self.negative = negative  # At least one component has a scale <= 0, i.e. is subtracted.
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def amount(self, i: int) -> numpy.array:
+        """Return the amount of the ingredient at index i."""
+        if not self.complete[i]:
+            if self.negative[i]:
+                # If one is a negative, then we assume that we have the ingredient.
+                return numpy.array([0])
+            return numpy.array([])
+        elif self.ranged[i]:
+            return numpy.array([self.first[i], self.last[i]])
+        else:
+            return numpy.array([self.first[i]])
+
+    def amounts(self) -> Dict[int, numpy.array]:
+        """Return the amount of every ingredient, keyed on ingredient key."""
+        return {key: self.amount(i) for i, key in enumerate(self.keys)}
+
+    def nonempty(self) -> numpy.ndarray:
+        """Return a mask of the ingredients that are kept when collating a
+        GroceryList: those with a positive amount, or no amount at all."""
+        total = numpy.where(self.ranged, self.first + self.last, self.first)
+        no_amount = ~self.complete & ~self.negative
+        return no_amount | (self.complete & (total > 0))
+
+
+class ComponentColumns:
+    """Flat arrays with one row per IngredientComponent in a list of
+    Ingredients. Ranges are stored as their first and last number, and rows
+    are coded on the position of their ingredient key (Ingredient.key) in
+    self.keys.
+
+    Collating, scaling and subtracting are done on whole arrays. The
+    Ingredient objects stay the source of truth; the columns mirror them."""
+
+    def __init__(self, keys: List[int], codes: numpy.ndarray, first: numpy.ndarray, last: numpy.ndarray,
+                 count: numpy.ndarray, scale: numpy.ndarray, unit_scale: numpy.ndarray) -> None:
+        self.keys = keys
+        self.codes = codes
+        self.first = first
+        self.last = last
+        self.count = count  # Number of numbers in the component: 0 (no amount), 1 or 2 (range).
+        self.scale = scale
+        self.unit_scale = unit_scale
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_ingredients(cls, ingredients: List["Ingredient"]) -> "ComponentColumns":
+        """Build the columns from a list of Ingredients."""
+        keys = []
+        key_codes = {}
+        codes, first, last, count, scale, unit_scale = [], [], [], [], [], []
+
+        for ing in ingredients:
+            code = key_codes.get(ing.key)
+            if code is None:
+                code = key_codes[ing.key] = len(keys)
+                keys += [ing.key]
+
+            for component in ing._components:
+                number = component._number
+                codes.append(code)
+                count.append(len(number))
+                first.append(number[0] if number else 0.0)
+                last.append(number[-1] if number else 0.0)
+                scale.append(component.scale * ing.scale)
+                unit_scale.append(component.unit_scale)
+
+        return cls(keys=keys,
+                   codes=numpy.array(codes, dtype=numpy.int64),
+                   first=numpy.array(first, dtype=float),
+                   last=numpy.array(last, dtype=float),
+                   count=numpy.array(count, dtype=numpy.int8),
+                   scale=numpy.array(scale, dtype=float),
+                   unit_scale=numpy.array(unit_scale, dtype=float))
+
+    def scaled(self, number: Union[float, int]) -> "ComponentColumns":
+        """Return new columns with all amounts multiplied by number."""
+        return ComponentColumns(self.keys, self.codes, self.first, self.last, self.count, self.scale * number,
+                                self.unit_scale)
+
+    def concatenate(self, other: "ComponentColumns") -> "ComponentColumns":
+        """Return new columns with the rows of other appended to the rows of self."""
+        keys = list(self.keys)
+        key_codes = {key: code for code, key in enumerate(keys)}
+        remap = numpy.empty(len(other.keys), dtype=numpy.int64)
+        for i, key in enumerate(other.keys):
+            if key not in key_codes:
+                key_codes[key] = len(keys)
+                keys += [key]
+            remap[i] = key_codes[key]
+
+        return ComponentColumns(keys=keys,
+                                codes=numpy.concatenate([self.codes, remap[other.codes]]),
+                                first=numpy.concatenate([self.first, other.first]),
+                                last=numpy.concatenate([self.last, other.last]),
+                                count=numpy.concatenate([self.count, other.count]),
+                                scale=numpy.concatenate([self.scale, other.scale]),
+                                unit_scale=numpy.concatenate([self.unit_scale, other.unit_scale]))
+
+    def converted(self, conversions: Dict[int, Tuple[int, float]]) -> "ComponentColumns":
+        """Return new columns where the rows of the keys in conversions are
+        moved to the converted key, with the unit scale multiplied by the
+        factor (see groceries.conversion)."""
+        keys = []
+        key_codes = {}
+        remap = numpy.empty(len(self.keys), dtype=numpy.int64)
+        factors = numpy.ones(len(self.keys), dtype=float)
+        for i, key in enumerate(self.keys):
+            if key in conversions:
+                key, factors[i] = conversions[key]
+            if key not in key_codes:
+                key_codes[key] = len(keys)
+                keys += [key]
+            remap[i] = key_codes[key]
+
+        return ComponentColumns(keys=keys,
+                                codes=remap[self.codes],
+                                first=self.first,
+                                last=self.last,
+                                count=self.count,
+                                scale=self.scale,
+                                unit_scale=self.unit_scale * factors[self.codes])
+
+    def collate(self) -> CollatedColumns:
+        """Sum the amounts of all rows with the same ingredient key."""
+        n = len(self.keys)
+        has_amount = self.count > 0
+
+        # Same order of operations as IngredientComponent.amount(): number * scale * unit_scale.
+        first = self.first * self.scale * self.unit_scale
+        last = self.last * self.scale * self.unit_scale
+
+        return CollatedColumns(
+            keys=self.keys,
+            first=numpy.bincount(self.codes, weights=first, minlength=n),
+            last=numpy.bincount(self.codes, weights=last, minlength=n),
+            complete=numpy.bincount(self.codes, weights=~has_amount, minlength=n) == 0,
+            ranged=numpy.bincount(self.codes, weights=self.count == 2, minlength=n) > 0,
+            negative=numpy.bincount(self.codes, weights=self.scale <= 0, minlength=n) > 0,
+        )
@@ -1,9 +1,14 @@
-from groceries.configs.config_types import ConfigBase, Settings, Language, Constants, MenuFormat, UnitDefinition
+import hashlib
+from typing import List
+
+from groceries.configs.config_types import ConfigBase, Settings, Language, Constants, MenuFormat, UnitDefinition, \
+    DensityTable
 from groceries.configs.constants.default import constants as default_constants
 from groceries.configs.settings.metric_imperial import settings as default_settings
 from groceries.configs.language.english import language as default_language
 from groceries.configs.menu_format.simple_text_menu import menu_format as default_menu_format
 from groceries.configs.unit_definition.metric_imperial import unit_definition as default_unit_definition
+from groceries.configs.density_table.kitchen import density_table as default_density_table
 
 
 class ConfigHandler:
@@ -13,7 +18,8 @@ class ConfigHandler:
                  language: Language = None,
                  constants: Constants = None,
                  menu_format: MenuFormat = None,
-                 unit_definition: UnitDefinition = None
+                 unit_definition: UnitDefinition = None,
+                 density_table: DensityTable = None
                  ):
 
         self.settings = settings or default_settings
@@ -21,6 +27,10 @@ class ConfigHandler:
         self.constants = constants or default_constants
         self.menu_format = menu_format or default_menu_format
         self.unit_definition = unit_definition or default_unit_definition
+        self.density_table = density_table or default_density_table
+
+        # Incremented every time a config is swapped, so that anything compiled from the configs knows when to rebuild.
+        self.revision = 0
 
     def set_config(self, config: ConfigBase):
         """Use a specific configs instead of default. Can enter any configs, and it will work:
@@ -33,6 +43,37 @@ class ConfigHandler:
 
         """
         setattr(self, config.name, config)
+        self.revision += 1
+
+    def fingerprint(self) -> str:
+        """Return a hash of the configs used when parsing ingredients: the
+        language, constants and unit definitions. The hash is the same in
+        every process using configs with the same content."""
+        content = canonical([self.language, self.constants, self.unit_definition])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def configs(self) -> List[ConfigBase]:
+        """Return all active configs. Passing these to set_config in another
+        process gives that process the same configs."""
+        return [self.settings, self.language, self.constants, self.menu_format, self.unit_definition,
+                self.density_table]
+
+
+def canonical(value: object) -> str:
+    """Return a text representation of a config value that does not depend
+    on object addresses or set ordering."""
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return repr(value)
+    elif isinstance(value, dict):
+        return '{%s}' % ', '.join(sorted('%s: %s' % (canonical(k), canonical(v)) for k, v in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return '[%s]' % ', '.join(canonical(v) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return '{%s}' % ', '.join(sorted(canonical(v) for v in value))
+    elif hasattr(value, '__dict__'):
+        return '%s(%s)' % (type(value).__qualname__, canonical(vars(value)))
+    else:
+        return type(value).__qualname__
 
 
 config = ConfigHandler()
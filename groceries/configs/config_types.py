@@ -143,3 +143,31 @@ class UnitDefinition(ConfigBase):
         self.constants = constants
         self.formatting = formatting
         self.units = units
+
+
+class DensityTable(ConfigBase):
+    name = 'density_table'
+
+    def __init__(self,
+                 densities: ty.Dict[str, Number],
+                 piece_weights: ty.Dict[str, Number],
+                 target_dimension: str = 'mass',
+                 volume_dimension: str = 'volume',
+                 piece_dimension: str = 'none',
+                 ) -> None:
+        """
+        Container for the densities and piece weights used to convert the amounts of ingredients between dimensions.
+        Ingredients are looked up on their (lowercased) name.
+        :param densities: Dictionary keyed on ingredient name, with the mass per volume of the ingredient, in units of
+                          the target dimension per unit of the volume dimension (grams per liter with metric units).
+        :param piece_weights: Dictionary keyed on ingredient name, with the mass of a single piece of the ingredient, in
+                              units of the target dimension (grams with metric units).
+        :param target_dimension: The dimension ingredients are converted to.
+        :param volume_dimension: The dimension converted with densities.
+        :param piece_dimension: The dimension converted with piece weights, i.e. ingredients counted without a unit.
+        """
+        self.densities = {name.lower(): density for name, density in densities.items()}
+        self.piece_weights = {name.lower(): weight for name, weight in piece_weights.items()}
+        self.target_dimension = target_dimension
+        self.volume_dimension = volume_dimension
+        self.piece_dimension = piece_dimension
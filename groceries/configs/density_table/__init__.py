@@ -0,0 +1 @@
+from groceries.configs.density_table import kitchen
@@ -0,0 +1,114 @@
+from groceries.configs.config_types import DensityTable
+
+# Grams per liter.
+_densities = {
+    # English
+    'water': 1000,
+    'milk': 1030,
+    'cream': 1000,
+    'sour cream': 1000,
+    'yoghurt': 1030,
+    'greek yoghurt': 1030,
+    'coconut milk': 1000,
+    'butter': 910,
+    'oil': 920,
+    'olive oil': 920,
+    'sunflower oil': 920,
+    'vinegar': 1010,
+    'honey': 1420,
+    'syrup': 1370,
+    'flour': 550,
+    'wheat flour': 550,
+    'sugar': 850,
+    'brown sugar': 720,
+    'icing sugar': 560,
+    'salt': 1200,
+    'rice': 800,
+    'oats': 350,
+    'cocoa': 450,
+    'grated cheese': 400,
+    'tomato paste': 1100,
+    'ketchup': 1150,
+    'mustard': 1050,
+    'stock': 1000,
+    'white wine': 990,
+    # Norwegian
+    'vann': 1000,
+    'melk': 1030,
+    'fløte': 1000,
+    'matfløte': 1000,
+    'rømme': 1000,
+    'yoghurt naturell': 1030,
+    'gresk yoghurt': 1030,
+    'kokosmelk': 1000,
+    'smør': 910,
+    'olje': 920,
+    'olivenolje': 920,
+    'solsikkeolje': 920,
+    'eddik': 1010,
+    'honning': 1420,
+    'sirup': 1370,
+    'mel': 550,
+    'hvetemel': 550,
+    'sukker': 850,
+    'brunt sukker': 720,
+    'melis': 560,
+    'ris': 800,
+    'middagsris': 800,
+    'havregryn': 350,
+    'kakao': 450,
+    'revet ost': 400,
+    'tomatpuré': 1100,
+    'ketsjup': 1150,
+    'sennep': 1050,
+    'kyllingfond': 1000,
+    'hvitvin': 990,
+}
+
+# Grams per piece.
+_piece_weights = {
+    # English
+    'egg': 60,
+    'eggs': 60,
+    'onion': 150,
+    'onions': 150,
+    'garlic clove': 5,
+    'carrot': 80,
+    'carrots': 80,
+    'potato': 150,
+    'potatoes': 150,
+    'tomato': 120,
+    'tomatoes': 120,
+    'banana': 120,
+    'bananas': 120,
+    'apple': 150,
+    'apples': 150,
+    'lemon': 100,
+    'lime': 70,
+    'avocado': 200,
+    'bell pepper': 150,
+    'cucumber': 350,
+    # Norwegian
+    'løk': 150,
+    'rødløk': 150,
+    'sjalottløk': 40,
+    'gulrot': 80,
+    'gulrøtter': 80,
+    'potet': 150,
+    'poteter': 150,
+    'tomat': 120,
+    'tomater': 120,
+    'eple': 150,
+    'epler': 150,
+    'sitron': 100,
+    'avokado': 200,
+    'paprika': 150,
+    'rød paprika': 150,
+    'gul paprika': 150,
+    'agurk': 350,
+}
+
+density_table = DensityTable(
+    densities=_densities,
+    piece_weights=_piece_weights,
+)
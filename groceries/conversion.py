@@ -0,0 +1,107 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          conversion
+ Purpose:       Module converting the amounts of ingredients between
+                dimensions (volume and pieces to mass) with the densities and
+                piece weights of the density table config, so that the same
+                ingredient measured in different units can be collated.
+-------------------------------------------------------------------------------
+'''
+
+import threading
+from typing import Dict, Tuple, Union, TYPE_CHECKING
+
+import numpy
+
+from groceries.columns import ComponentColumns
+from groceries.configs.config_handler import config
+from groceries.symbols import ingredient_key, split_key
+from groceries.units import Unit, units
+
+if TYPE_CHECKING:
+    from groceries.groceries import Ingredient
+
+
+class Conversions:
+    """Conversion of ingredient amounts to the target dimension of the
+    density table (config.density_table). An ingredient is converted if its
+    name is in the table for the dimension of its unit, and is otherwise left
+    as it is.
+
+    Conversions are looked up on ingredient keys (see groceries.symbols), and
+    are compiled from the config the first time a key is used. They are
+    compiled again when the configs or units change."""
+
+    def __init__(self) -> None:
+        self._conversions = {}  # Ingredient key -> (converted key, factor), or None if the key is not converted.
+        self._revision = None
+        self._lock = threading.Lock()
+
+    def _table(self) -> Dict[int, Union[Tuple[int, float], None]]:
+        revision = (config.revision, units.revision)
+        if self._revision != revision:
+            with self._lock:
+                self._conversions = {}
+                self._revision = revision
+        return self._conversions
+
+    def factor(self, name: str, dimension: str) -> Union[Tuple[str, float], None]:
+        """Return the dimension an ingredient is converted to and the factor
+        converting its amount, or None if it is not converted."""
+        table = config.density_table
+        if dimension == table.target_dimension or table.target_dimension not in units.dimensions:
+            return None
+        if dimension == table.volume_dimension:
+            factor = table.densities.get(name.lower())
+        elif dimension == table.piece_dimension:
+            factor = table.piece_weights.get(name.lower())
+        else:
+            factor = None
+        if factor is None:
+            return None
+        return table.target_dimension, float(factor)
+
+    def convert_key(self, key: int) -> Union[Tuple[int, float], None]:
+        """Return the converted key of the ingredients with a key and the
+        factor converting their amounts, or None if they are not converted."""
+        conversions = self._table()
+        try:
+            return conversions[key]
+        except KeyError:
+            pass
+
+        name, dimension = split_key(key)
+        conversion = self.factor(name, dimension)
+        if conversion is not None:
+            conversion = ingredient_key(name, conversion[0]), conversion[1]
+        conversions[key] = conversion
+        return conversion
+
+    def unit(self) -> Unit:
+        """The Unit of the target dimension."""
+        return units.get(config.density_table.target_dimension)
+
+    def convert_ingredient(self, ingredient: "Ingredient") -> "Ingredient":
+        """Return the ingredient converted to the target dimension, or the
+        ingredient itself if it is not converted."""
+        conversion = self.convert_key(ingredient.key)
+        if conversion is None:
+            return ingredient
+        return ingredient.converted(self.unit(), conversion[1])
+
+    def convert_columns(self, columns: ComponentColumns) -> ComponentColumns:
+        """Return columns with the rows of converted ingredients moved to
+        their converted keys, and their unit scales multiplied by the factors,
+        in a single pass over the rows."""
+        conversions = {}
+        for key in columns.keys:
+            conversion = self.convert_key(key)
+            if conversion is not None:
+                conversions[key] = conversion
+        if not conversions:
+            return columns
+        return columns.converted(conversions)
+
+
+# Conversions used by GroceryLists with convert=True.
+conversions = Conversions()
@@ -0,0 +1,412 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          formatter
+ Purpose:       Module containing the compiled amount formatter of a Unit. The
+                formatting rules of the unit are flattened into threshold
+                tables, and the intuitive fractions are looked up in a
+                precomputed table.
+-------------------------------------------------------------------------------
+'''
+
+import re
+import math
+import numpy
+from typing import Dict, List, Tuple, Union, Callable, TYPE_CHECKING
+
+from groceries.configs.config_handler import config
+from groceries.instrumentation import instrumentation
+from groceries.configs.unit_definition import unit_constants
+
+if TYPE_CHECKING:
+    from groceries.units import Unit
+
+FRACTION_PRECISION = 4  # Decimal places used when looking for intuitive fractions, as in Unit.find_intuitive_fraction.
+FRACTION_REST_LIMIT = 0.001
+
+_fraction_tables = {}  # Intuitive denominators -> FractionTable.
+
+
+class FractionTable:
+    """Intuitive fractions of every decimal in [-1, 1] rounded to
+    FRACTION_PRECISION decimal places.
+
+    For each rounded decimal, the table holds the first denominator where the
+    rest is below the limit, and the rest itself, so that the numerator is
+    computed from the exact decimal the same way as Unit.find_intuitive_fraction."""
+
+    def __init__(self, denominators: List[int]) -> None:
+        self.denominators = list(denominators)
+        self.steps = 10 ** FRACTION_PRECISION
+
+        # The keys are the same floats as round(decimal, FRACTION_PRECISION).
+        keys = numpy.arange(-self.steps, self.steps + 1) / self.steps
+        denominator = numpy.zeros(keys.size, dtype=numpy.int64)
+        rest = numpy.zeros(keys.size)
+        for i in reversed(self.denominators):  # The first denominator within the limit wins.
+            candidate = numpy.fmod(keys, round(1 / float(i), FRACTION_PRECISION))
+            hit = candidate < FRACTION_REST_LIMIT
+            denominator[hit] = i
+            rest[hit] = candidate[hit]
+
+        self.denominator_array = denominator
+        self.rest_array = rest
+        self._denominator = [int(i) for i in denominator]
+        self._rest = rest.tolist()
+
+    def find(self, number: float) -> Union[Tuple[None, None], Tuple[int, int]]:
+        """Return the numerator and denominator of the intuitive fraction of
+        number, or None, None if there is none. Same as Unit.find_intuitive_fraction."""
+        key = round(number, FRACTION_PRECISION)
+        if not -1 <= key <= 1:
+            return _find_intuitive_fraction(number, self.denominators)
+        index = int(round(key * self.steps)) + self.steps
+        denominator = self._denominator[index]
+        if not denominator:
+            return None, None
+        return round((number - self._rest[index]) * denominator), denominator
+
+    def find_all(self, numbers: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Return the numerators and denominators of the intuitive fractions
+        of an array of numbers in (-1, 1), with 0 as the denominator where
+        there is none or the number is not finite."""
+        finite = numpy.isfinite(numbers)
+        scaled = numpy.where(finite, numbers, 0) * self.steps
+        keys = numpy.rint(scaled)
+        # Where the scaled number is close to halfway, rint can round differently than round(number, 4):
+        for i in numpy.flatnonzero(numpy.abs(scaled - numpy.floor(scaled) - 0.5) < 1e-6).tolist():
+            keys[i] = round(round(float(numbers[i]), FRACTION_PRECISION) * self.steps)
+
+        index = keys.astype(numpy.int64) + self.steps
+        denominators = numpy.where(finite, self.denominator_array[index], 0)
+        numerators = numpy.where(denominators > 0, numpy.rint((numbers - self.rest_array[index]) * denominators), 0)
+        return numerators, denominators
+
+
+def fraction_table(denominators: List[int]) -> FractionTable:
+    """Return the FractionTable of a list of intuitive denominators."""
+    key = tuple(denominators)
+    if key not in _fraction_tables:
+        _fraction_tables[key] = FractionTable(denominators)
+    return _fraction_tables[key]
+
+
+def _find_intuitive_fraction(number: float, denominators: List[int]) -> Union[Tuple[None, None], Tuple[int, int]]:
+    for i in denominators:
+        rest = math.fmod(round(number, FRACTION_PRECISION), round(1 / float(i), FRACTION_PRECISION))
+        if rest < FRACTION_REST_LIMIT:
+            return round((number - rest) * i), i
+    return None, None
+
+
+class RuleTable:
+    """The formatting rules of a Unit as a table, one row per rule.
+
+    A rule matches a candidate within [lower, upper] that is a fraction of
+    all its fraction limits. The comparison checks of unit_constants are
+    flattened into the bounds, FractionOf checks into fraction limits, and
+    any other checks are kept and called like in Unit.formatting."""
+
+    # Check class -> function returning (lower, upper) bounds from the limit.
+    bounds = {
+        unit_constants.Constants.LessThan: lambda limit: (-math.inf, numpy.nextafter(limit, -math.inf)),
+        unit_constants.Constants.LessThanOrEqualTo: lambda limit: (-math.inf, limit),
+        unit_constants.Constants.GreaterThan: lambda limit: (numpy.nextafter(limit, math.inf), math.inf),
+        unit_constants.Constants.GreaterThanOrEqualTo: lambda limit: (limit, math.inf),
+        unit_constants.Constants.EqualTo: lambda limit: (limit, limit),
+    }
+
+    def __init__(self, formatting: List[Dict]) -> None:
+        self.units = []
+        self.lower = []
+        self.upper = []
+        self.bounded = []  # False if the rule has no bounds, so it also matches nan like the checks do.
+        self.fractions = []  # Fraction limits of each rule.
+        self.calls = []  # Checks of each rule that could not be flattened.
+
+        # Same as unit_constants.Constants.FractionOf, which uses the default constants.
+        self.fraction_steps = [1 / float(i) for i in unit_constants.constants.intuitive_denominators]
+        self.fraction_rest_limit = unit_constants.constants.fraction_rest_limit
+
+        for variant in formatting:
+            lower, upper, bounded, fractions, calls = -math.inf, math.inf, False, [], []
+            for check in variant['checks']:
+                limit = getattr(check, 'limit', None)
+                real = isinstance(limit, (int, float)) and not isinstance(limit, bool) and math.isfinite(limit)
+                if type(check) in self.bounds and real:
+                    check_lower, check_upper = self.bounds[type(check)](float(limit))
+                    lower, upper, bounded = max(lower, check_lower), min(upper, check_upper), True
+                elif type(check) is unit_constants.Constants.FractionOf and real and limit != 0:
+                    fractions += [float(limit)]
+                elif type(check) is not unit_constants.Constants.AlwaysTrue:
+                    calls += [check]
+
+            self.units += [variant['unit']]
+            self.lower += [float(lower)]
+            self.upper += [float(upper)]
+            self.bounded += [bounded]
+            self.fractions += [fractions]
+            self.calls += [calls]
+
+        self.vectorizable = not any(self.calls)
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    def is_fraction(self, candidate: float, limit: float) -> bool:
+        number = candidate / limit
+        return any(math.fmod(number, step) < self.fraction_rest_limit for step in self.fraction_steps)
+
+    def find(self, candidate: float) -> int:
+        """Return the index of the first rule matching candidate, or len(self) if no rule matches."""
+        for i in range(len(self.units)):
+            if self.bounded[i] and not self.lower[i] <= candidate <= self.upper[i]:
+                continue
+            if not all(self.is_fraction(candidate, limit) for limit in self.fractions[i]):
+                continue
+            if self.calls[i] and not _call_checks(self.calls[i], candidate):
+                continue
+            return i
+        return len(self.units)
+
+    def find_all(self, candidates: numpy.ndarray) -> numpy.ndarray:
+        """Return the index of the first rule matching each candidate, or
+        len(self) where no rule matches."""
+        if not self.vectorizable:
+            return numpy.array([self.find(candidate) for candidate in numpy.asarray(candidates)], dtype=numpy.int64)
+
+        candidates = numpy.asarray(candidates, dtype=float)
+        lower = numpy.array(self.lower)[:, None]
+        upper = numpy.array(self.upper)[:, None]
+        bounded = numpy.array(self.bounded)[:, None]
+        match = ~bounded | ((lower <= candidates) & (candidates <= upper))
+        for i, limits in enumerate(self.fractions):
+            for limit in limits:
+                number = candidates / limit
+                match[i] &= numpy.any([numpy.fmod(number, step) < self.fraction_rest_limit
+                                       for step in self.fraction_steps], axis=0)
+
+        # One row past the rules that always matches, for the candidates without a matching rule.
+        match = numpy.vstack([match, numpy.ones((1, candidates.size), dtype=bool)])
+        return numpy.argmax(match, axis=0)
+
+
+def _call_checks(checks: List[Callable], candidate: float) -> bool:
+    """Call the checks of a rule the way Unit formatting always has, where a
+    TypeError in any check means the rule does not match."""
+    try:
+        return len(checks) == sum([check(candidate) for check in checks])
+    except TypeError:
+        return False
+
+
+def fraction_translation(fractions_inverse: Dict[str, str]) -> Callable[[str], str]:
+    """Return a function replacing every big fraction (1/2) with its small
+    fraction (½). A single regex pass is used if it gives the same result as
+    replacing one fraction at a time."""
+    patterns = list(fractions_inverse)
+    glyph_characters = set(''.join(fractions_inverse.values()))
+    single_pass = all(re.escape(pattern) == pattern and not glyph_characters & set(pattern) for pattern in patterns)
+    for i, first in enumerate(patterns):
+        for second in patterns[i + 1:]:
+            # The second must not contain the first, or end in the start of the first.
+            if first in second or any(second.endswith(first[:k]) for k in range(1, len(first))):
+                single_pass = False
+
+    if not patterns:
+        return lambda string: string
+
+    if single_pass:
+        pattern = re.compile('|'.join(patterns))
+        return lambda string: pattern.sub(lambda match: fractions_inverse[match.group()], string)
+
+    def translate(string: str) -> str:
+        for fraction in fractions_inverse:
+            string = re.sub(fraction, fractions_inverse[fraction], string)
+        return string
+    return translate
+
+
+class UnitFormatter:
+    """Compiled amount formatting of a Unit. Gives the same output as
+    formatting rule by rule, and is rebuilt by the Unit when the configs
+    change."""
+
+    def __init__(self, unit: "Unit") -> None:
+        self.revision = config.revision
+        self.lookup_dict = unit.lookup_dict
+        self.rules = RuleTable(unit.formatting)
+        self.fractions = fraction_table(config.constants.intuitive_denominators)
+        self.translate = fraction_translation(config.constants.fractions_inverse)
+
+        # Unit used when no rule matches: the unit with scale == 1, or else the last unit.
+        self.default_unit = ''
+        for variant in self.lookup_dict:
+            if self.lookup_dict[variant]['scale'] == 1:
+                self.default_unit = variant
+                break
+        if not self.default_unit:
+            for variant in self.lookup_dict:
+                self.default_unit = variant
+
+    def unit(self, candidate: float) -> str:
+        """Return the unit text used for formatting an amount starting at candidate."""
+        i = self.rules.find(candidate)
+        return self.rules.units[i] if i < len(self.rules) else self.default_unit
+
+    def scale_amount(self, normalized_amount: numpy.ndarray) -> list:
+        """Return the scaled components of the normalized amount. See Unit.scale_amount."""
+        integer = 0
+        decimal = 0
+        numerator = 0
+        denominator = 0
+        amounts = []
+
+        normalized_amount.sort()
+        numbers = normalized_amount.tolist()  # Python numbers are faster to work with one by one.
+
+        unit = self.unit(numbers[0])
+        scale = self.lookup_dict[unit]['scale']
+
+        for number in numbers:
+            number /= scale
+            if number != 0:  # Only parse if nonzero.
+                decimal, integer = math.modf(number)
+
+                if decimal:
+                    numerator, denominator = self.fractions.find(decimal)
+
+            amounts += [(integer, decimal, numerator, denominator, unit)]
+
+        return amounts
+
+    def amount_formatted(self, normalized_amount: numpy.ndarray) -> str:
+        """Return the amount and unit as a text string. See Unit.amount_formatted."""
+        if not isinstance(normalized_amount, numpy.ndarray):
+            raise TypeError('amount_formatted input must be numpy.ndarray')
+
+        if normalized_amount.size == 0:
+            return ''
+
+        less_than_zero = ''
+        if (normalized_amount < 0).all():
+            normalized_amount = abs(normalized_amount)
+            less_than_zero = '-'
+
+        amounts = self.scale_amount(normalized_amount)
+        amount_string = ' - '.join(less_than_zero + self.format_number(integer, decimal, numerator, denominator)
+                                   for integer, decimal, numerator, denominator, _ in amounts)
+
+        fraction = bool(amounts[-1][1] and amounts[-1][2])
+        unit = amounts[-1][4]
+        if max(normalized_amount.tolist()) != 1 and not fraction:
+            unit = self.lookup_dict[unit]['plural']
+        else:
+            unit = self.lookup_dict[unit]['unit']
+
+        formatted = amount_string + ' ' + unit if amount_string and unit else amount_string + unit
+
+        # Swap big fractions (1/2) with small fractions (½):
+        if config.settings.small_fractions:
+            formatted = self.translate(formatted)
+
+        return formatted
+
+    def amounts_formatted(self, normalized_amounts: List[numpy.ndarray]) -> List[str]:
+        """Return the amount and unit of many amounts as text strings, the
+        same as amount_formatted for each amount. The unit, scaling and
+        fractions of all the amounts are found with array operations."""
+        output = [''] * len(normalized_amounts)
+        rows = [i for i, amount in enumerate(normalized_amounts) if amount.size]
+        if not rows:
+            return output
+
+        sizes = numpy.array([normalized_amounts[i].size for i in rows])
+        starts = numpy.concatenate([[0], numpy.cumsum(sizes)[:-1]])
+        segments = numpy.repeat(numpy.arange(len(rows)), sizes)
+        numbers = numpy.concatenate([normalized_amounts[i] for i in rows]).astype(float)
+
+        negative = numpy.logical_and.reduceat(numbers < 0, starts)
+        numbers = numpy.where(negative[segments], numpy.abs(numbers), numbers)
+        numbers = numbers[numpy.lexsort((numbers, segments))]  # Sorted within each amount.
+
+        units = self.rules.find_all(numbers[starts])
+        unit_texts = self.rules.units + [self.default_unit]
+        scales = numpy.array([self.lookup_dict[unit]['scale'] for unit in unit_texts], dtype=float)
+        scaled = numbers / scales[units][segments]
+
+        # A zero after the first number of an amount keeps the parts of the number before it, and is formatted one
+        # amount at a time, as are amounts that are not finite.
+        first = numpy.zeros(numbers.size, dtype=bool)
+        first[starts] = True
+        single = numpy.logical_or.reduceat(~numpy.isfinite(scaled) | ((scaled == 0) & ~first), starts)
+
+        decimals, integers = numpy.modf(scaled)
+        decimals[scaled == 0] = 0
+        integers[scaled == 0] = 0
+        numerators, denominators = self.fractions.find_all(decimals)
+        maximum = numpy.maximum.reduceat(numbers, starts)
+
+        # The strings are built from Python numbers, which are faster to work with one by one.
+        integers, decimals = integers.tolist(), decimals.tolist()
+        numerators, denominators = numerators.tolist(), denominators.tolist()
+        format_number = self.format_number
+        plurals = [self.lookup_dict[unit]['plural'] for unit in unit_texts]
+        singulars = [self.lookup_dict[unit]['unit'] for unit in unit_texts]
+        translate = self.translate if config.settings.small_fractions else None
+
+        for row, start, size, is_negative, is_single, unit, largest in zip(
+                rows, starts.tolist(), sizes.tolist(), negative.tolist(), single.tolist(), units.tolist(),
+                maximum.tolist()):
+            if is_single:
+                output[row] = self.amount_formatted(normalized_amounts[row].copy())
+                continue
+
+            end = start + size
+            if size == 1:
+                amount_string = format_number(integers[start], decimals[start], numerators[start], denominators[start])
+                if is_negative:
+                    amount_string = '-' + amount_string
+            else:
+                less_than_zero = '-' if is_negative else ''
+                amount_string = ' - '.join(
+                    less_than_zero + format_number(integers[i], decimals[i], numerators[i], denominators[i])
+                    for i in range(start, end))
+
+            fraction = decimals[end - 1] and numerators[end - 1]
+            unit = plurals[unit] if largest != 1 and not fraction else singulars[unit]
+
+            formatted = amount_string + ' ' + unit if unit else amount_string
+            output[row] = translate(formatted) if translate else formatted
+
+        return output
+
+    @staticmethod
+    def format_number(integer: float, decimal: float, numerator: Union[int, None],
+                      denominator: Union[int, None]) -> str:
+        """Format one number of an amount, as a fraction if it has an intuitive fraction."""
+        if decimal:
+            if numerator:
+                if integer:
+                    return '%d %d/%d' % (integer, numerator, denominator)
+                return '%d/%d' % (numerator, denominator)
+            return '%0.2f' % (integer + decimal)  # Keep decimals if fraction is not found.
+        return '%0.0f' % integer  # No decimal if no decimal.
+
+
+@instrumentation.timed('format')
+def amounts_formatted(units: List["Unit"], normalized_amounts: List[numpy.ndarray]) -> List[str]:
+    """Return the amounts of many ingredients as text strings, the same as
+    Unit.amount_formatted for each unit and amount. The amounts are formatted
+    together with the other amounts of the same unit."""
+    groups = {}  # Unit -> positions of the amounts in that unit.
+    for i, unit in enumerate(units):
+        group = groups.get(id(unit))
+        if group is None:
+            group = groups[id(unit)] = (unit, [])
+        group[1].append(i)
+
+    output = [''] * len(normalized_amounts)
+    for unit, positions in groups.values():
+        for i, formatted in zip(positions, unit.formatter.amounts_formatted([normalized_amounts[i] for i in positions])):
+            output[i] = formatted
+    return output
@@ -12,13 +12,18 @@
 -------------------------------------------------------------------------------
 '''
 
-import re
-import copy
+import sys
 import numpy
-from typing import Union, Tuple, List, TYPE_CHECKING
+from typing import Union, Tuple, List, Iterable, Sequence, Callable, TYPE_CHECKING
 
-import tregex
-from groceries.units import units, Unit
+from groceries.units import Unit, units
+from groceries.parser import parser, ParseResult
+from groceries.columns import ComponentColumns
+from groceries.conversion import conversions
+from groceries.formatter import amounts_formatted
+from groceries.instrumentation import instrumentation
+from groceries.similarity import similarity_engine, bounded
+from groceries.symbols import ingredient_key
 
 from groceries.configs.config_handler import config
 
@@ -33,9 +38,20 @@ class IngredientComponent:
     component when summarizing a chain of ingredients.
 
     An Ingredient does not have to be a litteral ingredient,  but can be
-    absolutely anything the user needs to buy."""
+    absolutely anything the user needs to buy.
 
-    def __init__(self, ingredient_input: str, recipe: "recipes.Recipe" = None) -> None:
+    IngredientComponents are read only, as they are shared by copies of
+    Ingredients and GroceryLists. Use scaled, with_recipe and converted to get
+    modified copies. IngredientComponent.scale_ingredient_amount is removed
+    for the same reason; scale the Ingredient, or use scaled, instead.
+
+    Components are kept compact, as there can be millions of them: the amount
+    numbers and comments are the tuples of the (cached) parse result, and are
+    read as a new numpy array and list. Names are interned."""
+
+    __slots__ = ('_scale', '_recipe', '_number', '_unit', '_unit_scale', '_comments', '_name', '_original_string')
+
+    def __init__(self, ingredient_input: str, recipe: "recipes.Recipe" = None, parsed: ParseResult = None) -> None:
         """Constructor.
 
         Input:
@@ -46,32 +62,63 @@ class IngredientComponent:
             recipe:             recipe object where the ingredient component
                                 came from. Used to track the amounts of
                                 ingredients that come from where.
+            parsed:             result of parsing ingredient_input, if already
+                                parsed (i.e. by parser.parse_batch).
         """
-        self.scale = 1  # Used to handle subtracted ingredients (in that case, scale = -1).
-        self.recipe = recipe
-
-        ingredient_string = self.process_input_string(ingredient_input)
-
-        # Get the amount,  return the matched amount string and remove from ingredient_string.
-        self.number, number_text = self._parse_amount(ingredient_string)
-        ingredient_string = re.sub(number_text, '', ingredient_string, 1).strip()
-
-        # Get the unit,  return the matched unit string and remove from ingredient_string.
-        self.unit, self.unit_scale, unit_text = self._parse_unit(ingredient_string)
-        ingredient_string = re.sub(unit_text, '', ingredient_string, 1).strip()
-
-        # Get the comment(s),  return the matched comment string and remove from ingredient_string.
-        self.comments, comment_match_string = self._parse_comments(ingredient_string)
-
-        for k in comment_match_string:
-            ingredient_string = re.sub(k, '', ingredient_string).strip()
-
-        # What is left should be the name of the ingredient.
-        self.name = ingredient_string
-        self.original_string = ingredient_input
+        self._scale = 1  # Used to handle subtracted ingredients (in that case, scale = -1).
+        self._recipe = recipe
+
+        # Get the amount, unit, comment(s) and name. What is left after amount, unit and comments are removed
+        # should be the name of the ingredient.
+        if parsed is None:
+            parsed = parser.parse_cached(ingredient_input)
+        self._number = parsed.number
+        self._unit = parsed.unit
+        self._unit_scale = parsed.unit_scale
+        self._comments = parsed.comments
+        self._name = sys.intern(parsed.name)
+        self._original_string = ingredient_input
+
+    @property
+    def scale(self) -> Union[int, float]:
+        """The scale of the amount, negative if the component is subtracted."""
+        return self._scale
+
+    @property
+    def recipe(self) -> "recipes.Recipe":
+        """The recipe the component came from, if any."""
+        return self._recipe
+
+    @property
+    def number(self) -> numpy.array:
+        """The numbers of the amount, before scaling and normalizing the unit."""
+        return numpy.array(self._number, dtype=float)
+
+    @property
+    def unit(self) -> Unit:
+        return self._unit
+
+    @property
+    def unit_scale(self) -> Union[int, float]:
+        """The factor normalizing the amount to the base unit of its dimension."""
+        return self._unit_scale
+
+    @property
+    def comments(self) -> List[str]:
+        return list(self._comments)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def original_string(self) -> str:
+        return self._original_string
 
     def __str__(self) -> str:
-        return str(self.__dict__)
+        return str({'scale': self.scale, 'recipe': self.recipe, 'number': self.number, 'unit': self.unit,
+                    'unit_scale': self.unit_scale, 'comments': self.comments, 'name': self.name,
+                    'original_string': self.original_string})
 
     def __repr__(self) -> str:
         return '<%s object: %s %s: %s>' % ('IngredientComponent', self.amount_formatted(), self.name, str(self.unit))
@@ -80,89 +127,32 @@ class IngredientComponent:
     def process_input_string(ingredient_input: str) -> str:
         """The input might contain some crazy unicode characters to represent
         fractions and other crazyness. Replace these."""
-
-        ingredient_input = ingredient_input.strip()
-
-        for fraction in config.constants.fractions:
-            ingredient_input = re.sub(fraction, config.constants.fractions[fraction], ingredient_input)
-
-        return ingredient_input
+        parser.refresh()
+        return parser.process_input_string(ingredient_input)
 
     @staticmethod
     def _parse_amount(ingredient_string: str) -> Tuple[numpy.array, str]:
-        """Find the assumed amounts of a specific ingredient. If the ingredient
-        is specified as a range (i.e. 2 - 2 1/2 ounces) the method will return
-        all numbers present in the range ([2,  2.5]). If no amount is found,
-        method returns None,  as an unspecified is something different than
-        0 of something."""
-        aprox_prefixes = '|'.join(config.language.aprox_prefixes)
-        number_combo = '^(?:%s)?[ ]*%s(?:[ -]+%s)?(?(1)|(?!))' % (
-            aprox_prefixes, config.constants.number_format, config.constants.number_format)
-        all_amounts = []
-        amount_text = ''
-
-        # Purge named groups:
-        # TODO: Fix this more elegantly.
-        import re
-        namedGroupDetection = r'(\(\?P<\w+>)'
-        namedGroupReferenceDetection = r'\(\?\(\w+\)'
-        number_combo2 = re.sub(namedGroupDetection, '(', number_combo)  # Remove named groups.
-        number_combo2 = re.sub(namedGroupReferenceDetection, '(', number_combo2)  # Remove named groups.
-
-        numbers = tregex.match(number_combo2, ingredient_string)
-
-        if numbers:
-            amount_text = numbers[0]
-            amount_alternatives = tregex.to_dict(config.constants.number_format, amount_text)
-
-            for a in amount_alternatives:
-                amount = 0
-                numerator = 0
-                denominator = 1
-                if a['amount']: amount = float(a['amount'].replace(',', '.'))
-                if a['numerator']: numerator = float(a['numerator'])
-                if a['denominator']: denominator = float(a['denominator'])
-
-                all_amounts += [amount + numerator / denominator]
-
-        # Convert array to numpy array,  for easier manipulation:
-        all_amounts = numpy.array(all_amounts)
-
-        return all_amounts, amount_text
+        """Find the assumed amounts of a specific ingredient. See IngredientParser.parse_amount."""
+        parser.refresh()
+        return parser.parse_amount(ingredient_string)
 
     @staticmethod
     def _parse_unit(ing: str) -> Tuple[Unit, Union[float, int], str]:
         """Get the unit object of the ingredient."""
-        unit_text = re.findall(r'^\w+', ing)
-        if not unit_text:
-            unit_text = ''
-        else:
-            unit_text = unit_text[0]
-
-        unit, scale, text = units.match(unit_text)
-
-        return unit, scale, text
+        return parser.parse_unit(ing)
 
     @staticmethod
-    def _parse_comments(ing: str) -> Tuple[list, str]:
+    def _parse_comments(ing: str) -> Tuple[list, list]:
         """Get all individual comments from the ingredient and return them as a list."""
+        parser.refresh()
+        return parser.parse_comments(ing)
 
-        comment_match_string = tregex.to_tuple(r'(\(.*?\)|, .*?$)', ing)
-        if comment_match_string:
-            comment_match_string = [re.escape(s[0]) for s in comment_match_string]
-            comments = tregex.to_tuple(r'(?:(?<=\()|(?<=, ))(.+?)(?:(?=\))|(?=$))',
-                                    ing)  # Comments without containers ( "([comment])" and ",  [comment]"
-            comments = [s[0] for s in comments]
-        else:
-            comments = []
+    def amount(self, scale: Union[int, float] = 1) -> numpy.array:
+        """Return the normalized amount of the ingredient component, multiplied
+        by an optional scale."""
 
-        return comments, comment_match_string  # TODO: Change in tregex now produces different output.
-
-    def amount(self) -> numpy.array:
-        """Return the normalized amount of the ingredient component."""
-
-        if self.number.all():
-            amount = self.number * self.scale * self.unit_scale
+        if all(self._number):
+            amount = numpy.array(self._number, dtype=float) * (self._scale * scale) * self._unit_scale
         else:
             amount = None  # No amount, different from zero.
 
@@ -171,12 +161,35 @@ class IngredientComponent:
     def amount_formatted(self) -> str:
         return self.unit.amount_formatted(self.amount())
 
-    def scale_ingredient_amount(self, scale: Union[int, float]) -> None:
-        """Multiply all IngredientComponent amounts with the given scale.
-        Primarily used to multiply all IngredientComponents with -1, so that
-        the contents of one GroceryList can be subtracted from the contents of
+    def scaled(self, scale: Union[int, float]) -> "IngredientComponent":
+        """Return a copy of the component with the amount multiplied by scale.
+        Primarily used to multiply IngredientComponents with -1, so that the
+        contents of one GroceryList can be subtracted from the contents of
         another GroceryList."""
-        self.scale *= scale
+        component = self._copy()
+        component._scale = self._scale * scale
+        return component
+
+    def with_recipe(self, recipe: "recipes.Recipe") -> "IngredientComponent":
+        """Return a copy of the component coming from another recipe."""
+        component = self._copy()
+        component._recipe = recipe
+        return component
+
+    def converted(self, unit: Unit, factor: Union[int, float]) -> "IngredientComponent":
+        """Return a copy of the component measured in another unit, with the
+        amount multiplied by factor. Used for converting between dimensions
+        (see groceries.conversion)."""
+        component = self._copy()
+        component._unit = unit
+        component._unit_scale = self._unit_scale * factor
+        return component
+
+    def _copy(self) -> "IngredientComponent":
+        component = IngredientComponent.__new__(IngredientComponent)
+        for name in IngredientComponent.__slots__:
+            setattr(component, name, getattr(self, name))
+        return component
 
 
 class Ingredient:
@@ -187,24 +200,119 @@ class Ingredient:
     are simply combined.
 
     An Ingredient does not have to be a literal ingredient, but can represent
-    absolutely anything the user needs to buy."""
+    absolutely anything the user needs to buy.
+
+    Copying an Ingredient is copy-on-write: the copy shares the component list
+    with the original until either of them adds components. Scaling and
+    setting the recipe are recorded on the Ingredient, and are only applied to
+    (copies of) the components when components with different scales or
+    recipes are combined, or when the components are read.
 
-    def __init__(self, ingredient_input: Union[str, "Ingredient"], recipe: "recipes.Recipe" = None) -> None:
+    Ingredients with the same name and unit dimension are identified by an
+    integer key from the symbol tables (see groceries.symbols), which is made
+    when first used."""
 
-        if isinstance(ingredient_input, str):
-            initial_ingredient = IngredientComponent(ingredient_input, recipe)
-            self.components = [initial_ingredient]
+    __slots__ = ('_components', '_shared', 'scale', '_recipe', '_recipe_set', '_name', '_unit', '_key')
+
+    def __init__(self, ingredient_input: Union[str, "Ingredient", IngredientComponent],
+                 recipe: "recipes.Recipe" = None) -> None:
+
+        if isinstance(ingredient_input, (str, IngredientComponent)):
+            if isinstance(ingredient_input, str):
+                initial_ingredient = IngredientComponent(ingredient_input, recipe)
+            else:
+                initial_ingredient = ingredient_input
+            self._components = [initial_ingredient]
+            self._shared = False
+            self.scale = 1
+            self._recipe = None
+            self._recipe_set = False
+            self._key = None
         elif isinstance(ingredient_input, Ingredient):
-            # If input is Ingredient, copy all components into this new Ingredient instance.
-            # If not copy, the original Ingredient will be modified when we modify this ingredient.
+            # If input is Ingredient, share the components with the original Ingredient. Both are marked as shared,
+            # so the component list is copied by whichever of them is modified first.
             initial_ingredient = ingredient_input
-            self.components = [copy.copy(component) for component in initial_ingredient.components]
+            self._components = initial_ingredient._components
+            self._shared = initial_ingredient._shared = True
+            self.scale = initial_ingredient.scale
+            self._recipe = initial_ingredient._recipe
+            self._recipe_set = initial_ingredient._recipe_set
+            self._key = initial_ingredient._key
         else:
             raise
 
-        self.name = initial_ingredient.name
-        self.unit = initial_ingredient.unit
-        self.id = self.name + '_' + self.unit.dimension
+        self._name = initial_ingredient.name
+        self._unit = initial_ingredient.unit
+
+    @property
+    def name(self) -> str:
+        """The name of the Ingredient. Setting it clears the key."""
+        return self._name
+
+    @name.setter
+    def name(self, name: str) -> None:
+        self._name = name
+        self._key = None
+
+    @property
+    def unit(self) -> Unit:
+        """The Unit of the Ingredient. Setting it clears the key."""
+        return self._unit
+
+    @unit.setter
+    def unit(self, unit: Unit) -> None:
+        self._unit = unit
+        self._key = None
+
+    @property
+    def id(self) -> str:
+        """Identifies the ingredients that can be combined: the name and the dimension of the unit."""
+        return self.name + '_' + self.unit.dimension
+
+    @property
+    def key(self) -> int:
+        """Integer identifying the ingredients that can be combined, the same as id within a process."""
+        if self._key is None:
+            self._key = ingredient_key(self.name, self.unit.dimension)
+        return self._key
+
+    @property
+    def components(self) -> List[IngredientComponent]:
+        """The IngredientComponents of the Ingredient, with the scale and
+        recipe of the Ingredient applied."""
+        self._apply()
+        return self._components
+
+    @components.setter
+    def components(self, components: List[IngredientComponent]) -> None:
+        self._components = components
+        self._shared = False
+        self.scale = 1
+        self._recipe = None
+        self._recipe_set = False
+
+    def _own(self) -> None:
+        """Copy the component list if it is shared with another Ingredient."""
+        if self._shared:
+            self._components = list(self._components)
+            self._shared = False
+
+    def _applied_components(self) -> List[IngredientComponent]:
+        """Return a new list of the components with the scale and recipe of
+        the Ingredient applied."""
+        components = list(self._components)
+        if self.scale != 1:
+            components = [component.scaled(self.scale) for component in components]
+        if self._recipe_set:
+            components = [component.with_recipe(self._recipe) for component in components]
+        return components
+
+    def _apply(self) -> None:
+        """Apply the scale and recipe of the Ingredient to its components."""
+        if self.scale != 1 or self._recipe_set:
+            self.components = self._applied_components()
+        else:
+            self._own()
 
     def __str__(self) -> str:
         amount = self.amount_formatted()
@@ -219,19 +327,18 @@ class Ingredient:
     def __eq__(self, other: "Ingredient") -> bool:
         """When comparing ingredients,  we only compare the name and the unit.
         We can then continue with combining the components of each ingredient."""
-        return self.name == other.name and self.unit == other.unit
+        return self.key == other.key
 
     def contains(self, other: "Ingredient", amount: bool = True,
-                 aprox_name_limit: Union[float, int] = config.constants.ingredient_match_limit, verbose: bool = False) -> \
-            Union[dict, bool]:
+                 aprox_name_limit: Union[float, int] = config.constants.ingredient_match_limit, verbose: bool = False,
+                 similarity: Callable[[str, str], float] = similarity_engine) -> Union[dict, bool]:
         """Check if one ingredient is a superset of another ingredient. Returns
         variants of (bool, bool) according to the different matches of name and
-        amount."""
+        amount. The names are compared with similarity, which can be replaced
+        by any function scoring like tregex.similarity."""
 
         output = {'result': False, 'amount': 0, 'name': 0}
 
-        name_match = tregex.similarity(self.name, other.name)
-
         # Punish mismatch stricter if the word is short. Punishment is reduced to zero at 6 characters.
         name_length_punish_limit = 6
 
@@ -239,6 +346,11 @@ class Ingredient:
         new_limit = aprox_name_limit + (1 - aprox_name_limit) * (name_length_punish_limit - min_name_length) / name_length_punish_limit
         limit = max(aprox_name_limit, new_limit)
 
+        if not verbose:
+            # The name score is only returned when verbose, so names that can't reach the limit are not scored.
+            similarity = bounded(similarity, limit)
+        name_match = instrumentation.wrap('similarity', similarity)(self.name, other.name)
+
 
         # average_length = (len(self.name) + len(other.name)) / 2
         # if average_length <= name_length_punish_limit:
@@ -267,11 +379,26 @@ class Ingredient:
         else:
             return output['result']
 
+    def converted(self, unit: Unit, factor: Union[int, float]) -> "Ingredient":
+        """Return a copy of the Ingredient measured in another unit, with the
+        amounts of all components multiplied by factor."""
+        new = Ingredient(self)
+        new.components = [component.converted(unit, factor) for component in self._applied_components()]
+        new.unit = unit
+        return new
+
     def combine_with_ingredient(self, other: object) -> None:
         assert isinstance(other, Ingredient)
 
         if self == other:  # Ingredient equals compares names and units.
-            self.components += other.components
+            if (self.scale == other.scale and self._recipe_set == other._recipe_set
+                    and self._recipe is other._recipe):
+                # Same scale and recipe, so the components can be combined as they are.
+                self._own()
+                self._components += other._components
+            else:
+                self._apply()
+                self._components += other._applied_components()
         else:
             raise Exception('Attempt to combine non-comparable ingredients.')
 
@@ -282,10 +409,10 @@ class Ingredient:
 
         # If the ingredient is not specified by an amount, return 0 if the sum of component
         # scales is 0
-        amount = sum([component.amount() for component in self.components])
+        amount = sum([component.amount(self.scale) for component in self._components])
         if amount.size == 0:
-            positive_scale_count = sum([1 for component in self.components if component.scale > 0])
-            if positive_scale_count < len(self.components):
+            positive_scale_count = sum([1 for component in self._components if component.scale * self.scale > 0])
+            if positive_scale_count < len(self._components):
                 # If one is a negative, then we assume that we have the ingredient.
                 return numpy.array([0])
         return amount
@@ -301,16 +428,20 @@ class Ingredient:
         return self.unit.amount_formatted(self.amount())
 
     def ingredient_formatted(self, pretty: bool = False, pretty_right_offset: int = 15,
-                             include_comments: bool = False) -> str:
-        """Return a string representation of the ingredient."""
-        if self.amount_check():
-            amount_unit = self.amount_formatted() + ' '
-        else:
-            amount_unit = ''
+                             include_comments: bool = False, amount: numpy.array = None,
+                             amount_text: str = None) -> str:
+        """Return a string representation of the ingredient. The amount, or the
+        formatted amount, can be passed in if it is already known."""
+        if amount_text is None:
+            if amount is None:
+                amount = self.amount()
+            amount_text = self.unit.amount_formatted(amount) if amount.size != 0 else ''
+
+        amount_unit = amount_text + ' ' if amount_text else ''
 
         if include_comments:
             comments = []
-            for comp in self.components:
+            for comp in self._components:
                 comments += comp.comments
 
             comments = ', '.join(comments)
@@ -332,9 +463,9 @@ class Ingredient:
         """Multiply all IngredientComponent amounts with the given scale.
         Primarily used to multiply all IngredientComponents with -1, so that
         the contents of one GroceryList can be subtracted from the contents of
-        another GroceryList."""
-        for i in range(len(self.components)):
-            self.components[i].scale_ingredient_amount(scale)
+        another GroceryList. The scale is applied to the components when
+        needed."""
+        self.scale *= scale
 
     def dict(self) -> dict:
         """Return a more easily accessible dictionary of all the information in the Ingredient."""
@@ -344,20 +475,20 @@ class Ingredient:
             'components': []
         }
 
-        for ing in self.components:
+        for ing in self._components:
+            recipe = self._recipe if self._recipe_set else ing.recipe
             component_dict = {}
-            if ing.recipe:
-                component_dict['recipe'] = ing.recipe.name
-                if hasattr(ing.recipe, 'made_for') and hasattr(ing.recipe, 'multiplier') and hasattr(ing.recipe,
-                                                                                                     'scale'):
-                    component_dict['recipe_made_for'] = ing.recipe.made_for
-                    component_dict['recipe_multiplier'] = ing.recipe.multiplier
-                    component_dict['recipe_scale'] = ing.recipe.scale
+            if recipe:
+                component_dict['recipe'] = recipe.name
+                if hasattr(recipe, 'made_for') and hasattr(recipe, 'multiplier') and hasattr(recipe, 'scale'):
+                    component_dict['recipe_made_for'] = recipe.made_for
+                    component_dict['recipe_multiplier'] = recipe.multiplier
+                    component_dict['recipe_scale'] = recipe.scale
             else:
                 component_dict['recipe'] = config.language.no_recipe_name
 
             component_dict['name'] = ing.name
-            component_dict['amount'] = ing.amount_formatted()
+            component_dict['amount'] = ing.unit.amount_formatted(ing.amount(self.scale))
             component_dict['comments'] = ing.comments
 
             properties['components'] += [component_dict]
@@ -365,9 +496,21 @@ class Ingredient:
         return properties
 
     def set_component_recipe(self, recipe: object):
-        """Set the recipe property of all IngredientComponents in Ingredient."""
-        for i in range(len(self.components)):
-            self.components[i].recipe = recipe
+        """Set the recipe property of all IngredientComponents in Ingredient.
+        The recipe is applied to the components when needed."""
+        self._recipe = recipe
+        self._recipe_set = True
+
+
+def parse_ingredients(ingredient_inputs: Iterable[str], recipe: "recipes.Recipe" = None, workers: int = None,
+                      chunksize: int = None) -> List[Ingredient]:
+    """Parse many ingredient strings into Ingredients, in the same order as
+    the input. With workers > 1, the strings are parsed in a pool of worker
+    processes (see IngredientParser.parse_batch)."""
+    ingredient_inputs = list(ingredient_inputs)
+    parsed = parser.parse_batch(ingredient_inputs, workers=workers, chunksize=chunksize)
+    return [Ingredient(IngredientComponent(ingredient_input, recipe, parsed=result))
+            for ingredient_input, result in zip(ingredient_inputs, parsed)]
 
 
 IngredientInputType = Union[Ingredient, str]
@@ -376,11 +519,39 @@ IngredientOptionalSequenceInputType = Union[List[IngredientInputType], Ingredien
 
 class GroceryList:
     """Class for handling a list of Ingredients. Methods for combining lists,  and
-    for collating the ingrediens by combining duplicates."""
-
-    def __init__(self, ingredients: IngredientOptionalSequenceInputType = None, recipe: object = None):
-
-        self.ingredient_list = []
+    for collating the ingrediens by combining duplicates.
+
+    The list keeps a collated index of its ingredients keyed on Ingredient.key,
+    which is updated as ingredients are added or subtracted, so reading the
+    collated ingredients does not collate the whole list again. Set
+    indexed=False to collate from scratch on every read instead.
+
+    With columnar=True the list also keeps a ComponentColumns store of all
+    component amounts, and sums, filters and sorts the collated amounts with
+    numpy operations on the columns instead of per Ingredient.
+
+    With convert=True ingredients measured in volume or pieces are converted
+    to mass when collated, if they are in the density table (see
+    groceries.conversion), so '200 g flour' and '3 dl flour' are collated to
+    a single ingredient. The uncollated ingredient list is not converted."""
+
+    def __init__(self, ingredients: IngredientOptionalSequenceInputType = None, recipe: object = None,
+                 indexed: bool = True, columnar: bool = False, convert: bool = False):
+
+        if columnar and not indexed:
+            raise ValueError('A columnar GroceryList must be indexed.')
+
+        self.indexed = indexed
+        self.columnar = columnar
+        self.convert = convert
+        self._index = {}
+        self._ingredient_list = []
+        self._columns = None
+        self._pending_columns = []
+        self._collated = None  # Collated ingredients of an indexed list, until the collated keys change.
+        self._amounts = {}  # Amounts of the collated ingredients of an indexed list, keyed on Ingredient.key.
+        self._changed = set()  # Keys of the index changed since the amounts were read.
+        self._revision = None  # The revision of the configs and units the columns were converted with.
 
         if ingredients:
             if isinstance(ingredients, str):
@@ -393,6 +564,41 @@ class GroceryList:
             else:
                 raise TypeError()
 
+    @property
+    def ingredient_list(self) -> List[Ingredient]:
+        """The uncollated list of Ingredients in the GroceryList."""
+        return self._ingredient_list
+
+    @ingredient_list.setter
+    def ingredient_list(self, ingredients: List[Ingredient]) -> None:
+        self._ingredient_list = ingredients
+        self._index = {}
+        self._collated = None
+        self._amounts = {}
+        self._changed = set()
+        self._index_ingredients(ingredients)
+        self._columns = None
+        self._pending_columns = []
+
+    @property
+    def columns(self) -> ComponentColumns:
+        """Columnar store of the component amounts in the list, in the order
+        of ingredient_list. Built on first use, and extended with the rows of
+        added ingredients when next used."""
+        if self._columns is None:
+            self._columns = ComponentColumns.from_ingredients(self.ingredient_list)
+        else:
+            for chunk in self._pending_columns:
+                if not isinstance(chunk, ComponentColumns):
+                    chunk = ComponentColumns.from_ingredients(chunk)
+                self._columns = self._columns.concatenate(chunk)
+        self._pending_columns = []
+        return self._columns
+
+    def _new_list(self, ingredients: List[Ingredient]) -> "GroceryList":
+        """Create a new GroceryList with the same storage options as self."""
+        return GroceryList(ingredients, indexed=self.indexed, columnar=self.columnar, convert=self.convert)
+
     def __str__(self) -> str:
         return self.__repr__()
 
@@ -403,34 +609,36 @@ class GroceryList:
 
     def __add__(self, other: object) -> "GroceryList":
         assert isinstance(other, GroceryList)
-        new_list = GroceryList(self._combine_lists(other.ingredient_list))
+        new_list = self._new_list(self.ingredient_list)
+        new_list += other
         return new_list
 
     def __iadd__(self, other: object) -> "GroceryList":
         assert isinstance(other, GroceryList)
-        self.ingredient_list = self._combine_lists(other.ingredient_list)
+        self._extend(self._prepare_ingredients(other.ingredient_list), other._reusable_columns())
         return self
 
     def __sub__(self, other: object) -> "GroceryList":
         assert isinstance(other, GroceryList)
-        new_list = GroceryList(self._combine_lists(other.ingredient_list, subtract=True))
+        new_list = self._new_list(self.ingredient_list)
+        new_list -= other
         return new_list
 
     def __isub__(self, other: object) -> "GroceryList":
         assert isinstance(other, GroceryList)
-        self.ingredient_list = self._combine_lists(other.ingredient_list, subtract=True)
+        columns = other._reusable_columns()
+        if columns is not None:
+            columns = columns.scaled(-1)
+        self._extend(self._prepare_ingredients(other.ingredient_list, subtract=True), columns)
         return self
 
     def __mul__(self, number: Union[float, int]) -> "GroceryList":
         """Multiplication (left hand: GroceryList * x) of a GroceryList with an
         integer or a float."""
         assert isinstance(number, (int, float))
-        # This is not in place multiply, so we need to copy the ingredients:
-        ingredients = [Ingredient(ing) for ing in self.ingredient_list]
-        for i in range(len(ingredients)):
-            ingredients[i].scale_ingredient_amount(number)
-
-        new_list = GroceryList(ingredients)
+        # This is not in place multiply, but the new list holds copy-on-write copies of the ingredients:
+        new_list = self._new_list(self.ingredient_list)
+        new_list *= number
         return new_list
 
     def __rmul__(self, number: Union[float, int]) -> "GroceryList":
@@ -440,11 +648,24 @@ class GroceryList:
 
     def __imul__(self, number: Union[float, int]) -> "GroceryList":
         assert isinstance(number, (int, float))
-        # This is in place multiply, so we modify ingredients directly.
-        for i in range(len(self.ingredient_list)):
-            self.ingredient_list[i].scale_ingredient_amount(number)
+        # This is in place multiply, so we modify ingredients directly. Only the scale of each Ingredient is changed.
+        for ing in self.ingredient_list:
+            ing.scale_ingredient_amount(number)
+        for ing in self._index.values():
+            ing.scale_ingredient_amount(number)
+
+        if self._columns is not None:
+            self._columns = self.columns.scaled(number)
+        self._changed.update(self._index)
         return self
 
+    def _reusable_columns(self) -> Union[ComponentColumns, None]:
+        """Return the columns of this list if they are already built, so they
+        can be reused by a list the ingredients are added to."""
+        if self.columnar and self._columns is not None:
+            return self.columns
+        return None
+
     def __contains__(self, other: object) -> bool:
         """Method called by the in-keyword."""
         if isinstance(other, str):
@@ -454,98 +675,201 @@ class GroceryList:
     def ingredients_formatted(self, pretty: bool = False, sort: str = None, include_comments: bool = False) -> List[
         str]:
         """Return a list of string representations of each ingredient."""
-        return [ing.ingredient_formatted(pretty=pretty, include_comments=include_comments) for ing in
-                self.ingredients(sort)]
-
-    def ingredients(self, sort: str = None, collate: bool = True) -> List[Ingredient]:
-        """Return collated list of ingredients in GroceryList. CONSIDER REVISING
-         FOR SPEED. Might be just as effective to solve the collation right
-         away when adding the individual ingredients. Or maybe not."""
-
-        if collate:
+        ingredients, amounts = self._collated_ingredients(sort)
+        if amounts is None:
+            amounts = {ing.key: ing.amount() for ing in ingredients}
+
+        # The amounts are formatted all at once, unit by unit:
+        amount_texts = amounts_formatted([ing.unit for ing in ingredients], [amounts[ing.key] for ing in ingredients])
+        return [ing.ingredient_formatted(pretty=pretty, include_comments=include_comments, amount_text=amount_text)
+                for ing, amount_text in zip(ingredients, amount_texts)]
+
+    def ingredients(self, sort: str = None, collate: bool = True, copy: bool = False) -> Tuple[Ingredient, ...]:
+        """Return a tuple of the collated ingredients in GroceryList. The
+        collated ingredients are read from the index kept up to date when
+        adding and subtracting, unless the list is not indexed.
+
+        The ingredients are the ones kept in the list, and the same tuple is
+        returned until the list is modified, so they must not be modified.
+        Set copy=True to get copies of the ingredients that can be."""
+        return tuple(self._collated_ingredients(sort, collate, copy)[0])
+
+    def amounts(self) -> dict:
+        """Return the amounts of the collated ingredients, keyed on Ingredient.id."""
+        ingredients, amounts = self._collated_ingredients()
+        if amounts is None:
+            return {ing.id: ing.amount() for ing in ingredients}
+        return {ing.id: amounts[ing.key].copy() for ing in ingredients}
+
+    @instrumentation.timed('collate')
+    def _collated_ingredients(self, sort: str = None, collate: bool = True,
+                              copy: bool = False) -> Tuple[Sequence[Ingredient], Union[dict, None]]:
+        """Return the (optionally collated and sorted) ingredients, and their
+        amounts keyed on Ingredient.key if the list is indexed. Without copy,
+        the ingredients are the ones in the list, and must not be modified."""
+        amounts = None
+
+        if collate and (self.columnar or self.indexed):
+            ingredients, amounts = self._collated_amounts()
+        elif collate:
             ingredients = self.collate_ingredients()
+            copy = False  # The collated ingredients are new instances already.
         else:
             ingredients = self.ingredient_list
 
+        if copy:
+            ingredients = [Ingredient(ing) for ing in ingredients]
+
+        if amounts is None:
+            def amount_of(ing: Ingredient) -> numpy.array:
+                return ing.amount()
+        else:
+            def amount_of(ing: Ingredient) -> numpy.array:
+                return amounts[ing.key].copy()
+
         if sort:
             if sort == 'alphabetical':
-                ingredients.sort(key=lambda x: x.name)  # , reverse=baklengsSortering)
+                ingredients = sorted(ingredients, key=lambda x: x.name)  # , reverse=baklengsSortering)
             elif sort == 'numerical':
-                ingredients.sort(key=lambda x: x.name)  # Sort alphabetically first, for equal amounts.
-                no_amount = [ing for ing in ingredients if not ing.amount_check()]
-                amount = [ing for ing in ingredients if ing.amount_check()]
-                amount.sort(key=lambda x: min(x.unit.scale_amount(x.amount())))  # , reverse=baklengsSortering)
+                ingredients = sorted(ingredients, key=lambda x: x.name)  # Sort alphabetically first, for equal amounts.
+                no_amount = [ing for ing in ingredients if amount_of(ing).size == 0]
+                amount = [ing for ing in ingredients if amount_of(ing).size != 0]
+                amount.sort(key=lambda x: min(x.unit.scale_amount(amount_of(x))))  # , reverse=baklengsSortering)
                 ingredients = no_amount + amount
             elif sort == 'other':
                 # ADD CUSTOM CATEGORY SORT SO GROCERIES CAN BE SORTED IN STORE
                 # TRAVERSE ORDER.
                 pass
 
-        return ingredients
-
+        return ingredients, amounts
+
+    def _collated_amounts(self) -> Tuple[Tuple[Ingredient, ...], dict]:
+        """Return the collated ingredients of the index and their amounts
+        keyed on Ingredient.key, which are kept on the list and must not be
+        modified. The amounts of a columnar list are summed from the columns
+        after it is modified. Otherwise only the collated ingredients of the
+        keys changed since the last read are summed again."""
+        if self.columnar:
+            # Converted columns also depend on the density table and the units:
+            revision = (config.revision, units.revision) if self.convert else None
+            if self._collated is None or self._changed or self._revision != revision:
+                self._collate_columns(revision)
+        elif self._changed:
+            collated = ComponentColumns.from_ingredients([self._index[key] for key in self._changed]).collate()
+            for i, (key, keep) in enumerate(zip(collated.keys, collated.nonempty())):
+                if keep:
+                    if key not in self._amounts:
+                        self._collated = None
+                    self._amounts[key] = collated.amount(i)
+                elif self._amounts.pop(key, None) is not None:
+                    self._collated = None
+            self._changed = set()
+
+        if self._collated is None:
+            # The collated ingredients are in the order of the index:
+            self._collated = tuple(ing for key, ing in self._index.items() if key in self._amounts)
+        return self._collated, self._amounts
+
+    def _collate_columns(self, revision: object) -> None:
+        """Sum the amounts of a columnar list from its columns."""
+        columns = self.columns
+        if self.convert:
+            # The columns hold the ingredients as they were added, and are converted like the collated index:
+            columns = conversions.convert_columns(columns)
+        collated = columns.collate()
+        keep = collated.nonempty()
+        self._collated = tuple(self._index[key] for key, k in zip(collated.keys, keep) if k)
+        self._amounts = {key: collated.amount(i) for i, key in enumerate(collated.keys) if keep[i]}
+        self._changed = set()
+        self._revision = revision
+
+    @instrumentation.timed('collate')
     def collate_self(self) -> None:
         """Force a collation of all ingredients in self."""
         self.ingredient_list = self.collate_ingredients()
 
-    def _combine_lists(self, ingredients: IngredientOptionalSequenceInputType, subtract: bool = False, recipe: object = None) -> List[object]:
-        """Combine ingredients in list with the ingredients in the current
-        instance of GroceryList. Return ingredient list."""
-        ingredient_list = []
+    @staticmethod
+    def _prepare_ingredients(ingredients: IngredientOptionalSequenceInputType, subtract: bool = False,
+                             recipe: object = None) -> List[Ingredient]:
+        """Parse the input to a new list of Ingredient objects, ready to be
+        added to a GroceryList."""
 
         if not isinstance(ingredients, list):
             ingredients = [ingredients]
+        else:
+            ingredients = list(ingredients)  # Never extend a list with itself.
 
-        if all(isinstance(ing, Ingredient) for ing in ingredients) and subtract:
-            # When subtracting, we modify the scale property of the ingredient
-            # components. If the input is Ingredient objects, the original
-            # ingredients will be modified. So we make copyies:
-            ingredients = [Ingredient(ing, recipe) for ing in ingredients]
-        elif all(isinstance(ing, str) for ing in ingredients):
-            ingredients = [Ingredient(ing, recipe) for ing in ingredients]
-
-        assert all(isinstance(ing, Ingredient) for ing in ingredients)
+        # Strings are parsed, and Ingredient objects are copied so that modifying the GroceryList never modifies the
+        # input. The copies are copy-on-write, so the components are not copied.
+        assert all(isinstance(ing, (str, Ingredient)) for ing in ingredients)
+        ingredients = [Ingredient(ing, recipe) for ing in ingredients]
 
         if subtract:  # If subtracted, scale all Ingredient amounts with -1.
             for i in range(len(ingredients)):
                 ingredients[i].scale_ingredient_amount(-1)
 
-        ingredient_list += self.ingredient_list
+        return ingredients
 
-        ingredient_list += ingredients
+    def _extend(self, ingredients: List[Ingredient], columns: ComponentColumns = None) -> None:
+        """Append prepared ingredients to the list and the collated index. If
+        the columns of the ingredients are already built, they can be passed
+        in and are reused for the columns of this list."""
+        self._ingredient_list += ingredients
+        self._index_ingredients(ingredients)
+        if self.columnar and self._columns is not None:
+            self._pending_columns += [columns if columns is not None else ingredients]
+
+    def _index_ingredients(self, ingredients: List[Ingredient]) -> None:
+        """Combine ingredients into the collated index. The collated
+        Ingredients are copy-on-write copies of the ingredients in the list,
+        and are scaled along with the list."""
+        if not self.indexed:
+            return
+
+        for ing in ingredients:
+            if self.convert:
+                ing = conversions.convert_ingredient(ing)
+            collated = self._index.get(ing.key)
+            if collated is None:
+                self._index[ing.key] = Ingredient(ing)
+            else:
+                collated.combine_with_ingredient(ing)
+            self._changed.add(ing.key)
 
-        return ingredient_list
+    @staticmethod
+    def _remove_empty(ingredients: Iterable[Ingredient]) -> List[Ingredient]:
+        """If any amounts in the collated list are reduced to zero, remove from list."""
+        return [ing for ing in ingredients if sum(ing.amount()) > 0 or not ing.amount_check()]
 
     def add_ingredients(self, ingredients: IngredientOptionalSequenceInputType, recipe: "recipes.Recipe" = None) -> None:
         """Add ingredients as strings or Ingredient objects to the GroceryList.
         Input can aalso be a list. If subtract = True, all input ingredient
         amounts are scaled to -1 so they are subtracted from the Ingredient
         total."""
-        ingredient_list = self._combine_lists(ingredients, recipe=recipe)
-        self.ingredient_list = ingredient_list
+        self._extend(self._prepare_ingredients(ingredients, recipe=recipe))
 
     def subtract_ingredients(self, ingredients: IngredientOptionalSequenceInputType) -> None:
         """Subtract ingredients as strings from the GroceryList. Ingredients can
         be a single string or a list of strings. The subtracted string(s) will
         be parsed and added to the GroceryList with all amounts multiplied by
         -1."""
-        ingredient_list = self._combine_lists(ingredients, subtract=True)
-        self.ingredient_list = ingredient_list
+        self._extend(self._prepare_ingredients(ingredients, subtract=True))
 
     def collate_ingredients(self) -> list:
         """Collate a list of ingredients so that all ingredients with comparable
-        unit and name are combined."""
+        unit and name are combined. Collates the whole list from scratch; see
+        ingredients() for reading the collated index."""
         collated_dict = {}
         for ing in self.ingredient_list:
-            if not ing.id in collated_dict:
-                collated_dict[ing.id] = Ingredient(
+            if self.convert:
+                ing = conversions.convert_ingredient(ing)
+            if not ing.key in collated_dict:
+                collated_dict[ing.key] = Ingredient(
                     ing)  # Create a new Ingredient object as a copy of the existing ingredient.
             else:
-                collated_dict[ing.id].combine_with_ingredient(ing)
-
-        # If any amounts in the collated list are reduced to zero, remove from list:
-        collated_list = [ing for ing in collated_dict.values() if sum(ing.amount()) > 0 or not ing.amount_check()]
+                collated_dict[ing.key].combine_with_ingredient(ing)
 
-        return collated_list
+        return self._remove_empty(collated_dict.values())
 
     def components(self, sort: str = 'alphabetical', pretty: bool = False) -> list:
         """Return a list ingredient properties as ready formatted strings."""
@@ -557,8 +881,11 @@ class GroceryList:
 
     def set_recipe(self, recipe: object) -> None:
         """Set the recipe property of each Ingredient to a specified Recipe-object."""
-        for i in range(len(self.ingredient_list)):
-            self.ingredient_list[i].set_component_recipe(recipe)
+        for ing in self.ingredient_list:
+            ing.set_component_recipe(recipe)
+        for ing in self._index.values():
+            ing.set_component_recipe(recipe)
+        self._collated = None
 
     def copy(self, in_place: bool = False) -> list:
         """Return a copy of this list, where all Ingredients are new instances."""
@@ -566,16 +893,19 @@ class GroceryList:
         if in_place:
             self.ingredient_list = new_ingredients
         else:
-            new_list = GroceryList(self.copy_ingredients())
+            new_list = self._new_list(new_ingredients)
             return new_list
 
     def copy_ingredients(self) -> list:
         """return a copy of this lists Ingredients, where all new Ingredients
-        are new instances."""
+        are new instances. The copies are copy-on-write, and share their
+        components with the original Ingredients until either is modified."""
         new_ingredients = [Ingredient(ing) for ing in self.ingredient_list]
         return new_ingredients
 
-    def contains(self, ingredient: Ingredient, amount: bool = True, verbose: bool = False):
+    def contains(self, ingredient: Ingredient, amount: bool = True, verbose: bool = False,
+                 similarity: Callable[[str, str], float] = similarity_engine,
+                 aprox_name_limit: Union[float, int] = config.constants.ingredient_match_limit):
         """Check if an ingredient exists within the GroceryList. Returns
             (True, True) if name and amounts are present.
             (True, False) if name and not amount is present.
@@ -584,9 +914,22 @@ class GroceryList:
         # TODO: This method can't be finished. The output does not look complete.
 
         assert isinstance(ingredient, Ingredient)
+        if self.convert:
+            ingredient = conversions.convert_ingredient(ingredient)
+        return self._contains(self._collated_ingredients()[0], ingredient, amount, verbose, similarity,
+                              aprox_name_limit)
+
+    @staticmethod
+    def _contains(ingredients: List[Ingredient], ingredient: Ingredient, amount: bool, verbose: bool,
+                  similarity: Callable[[str, str], float], aprox_name_limit: Union[float, int]):
+        """GroceryList.contains for a list of collated ingredients."""
+        # Only matching names are returned, and the limit of every pair of names is at least aprox_name_limit, so
+        # names that can't reach it are not scored:
+        similarity = bounded(similarity, aprox_name_limit)
 
-        for ing in self.ingredients():
-            match = ing.contains(ingredient, amount=amount, verbose=verbose)
+        for ing in ingredients:
+            match = ing.contains(ingredient, amount=amount, aprox_name_limit=aprox_name_limit, verbose=verbose,
+                                 similarity=similarity)
 
             if verbose:
                 if match['result']:
@@ -600,7 +943,8 @@ class GroceryList:
         else:
             False
 
-    def compare_with(self, other: object, amount: bool = True, verbose: bool = False) -> Union[List[float], float]:
+    def compare_with(self, other: object, amount: bool = True, verbose: bool = False,
+                     similarity: Callable[[str, str], float] = similarity_engine) -> Union[List[float], float]:
         """Compare the contents of one list with the contents of this list. If
         self is a superset of other (taking amounts into account) a score of 1
         is returned. For mismatches in amounts or names, reduce score."""
@@ -609,9 +953,15 @@ class GroceryList:
 
         assert isinstance(other, GroceryList)
 
+        # The ingredients of self are collated once, and not for every ingredient of other:
+        ingredients = self._collated_ingredients()[0]
+        aprox_name_limit = config.constants.ingredient_match_limit
+
         score_vector = []
         for other_ing in other.ingredients():
-            match = self.contains(other_ing, amount=amount, verbose=True)
+            if self.convert:
+                other_ing = conversions.convert_ingredient(other_ing)
+            match = self._contains(ingredients, other_ing, amount, True, similarity, aprox_name_limit)
             score = min([match['name'] * 0.7 + match['amount'] * 0.3, 1])  # Cap at 100.
 
             score_vector += [(other_ing.name, score, match['result'], match['name'], match['amount'])]
@@ -0,0 +1,206 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          instrumentation
+ Purpose:       Opt-in timing of the stages of parsing, matching, collating,
+                comparing and formatting ingredients, with export of the
+                recorded timings as JSON or in the Prometheus text format.
+-------------------------------------------------------------------------------
+'''
+
+import os
+import json
+import bisect
+import functools
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Tuple
+
+# Upper bounds in seconds of the histogram buckets. The last bucket holds everything slower.
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1,
+           0.25, 0.5, 1.0)
+
+# Name of the metric in the Prometheus text format. Each stage is a label of the metric.
+PROMETHEUS_METRIC = 'groceries_stage_seconds'
+
+# Instrumentation is enabled on import if this environment variable is set to something other than 0 or empty.
+ENVIRONMENT_VARIABLE = 'GROCERIES_INSTRUMENTATION'
+
+
+class StageTimings:
+    """The number of calls, cumulative time and histogram of the times of a
+    single stage."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def dict(self) -> dict:
+        """Return the timings as a dict. The histogram is a list of
+        [upper bound, count] with counts that are not cumulative, and None as
+        the upper bound of the last bucket."""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'histogram': [[bound, count] for bound, count in zip(list(self.buckets) + [None], self.bucket_counts)],
+        }
+
+
+class Instrumentation:
+    """Records the time spent in each stage of groceries. Disabled by
+    default, and then a stage only costs a check of Instrumentation.enabled.
+
+    Stages are timed with the timed decorator, the timer context manager or
+    the wrap method. Stages can be nested, i.e. the time of 'parse' includes
+    the time of 'parse.amount'."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.stages = {}  # Stage name -> StageTimings.
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Discard all recorded timings."""
+        with self._lock:
+            self.stages = {}
+
+    @contextmanager
+    def recording(self, reset: bool = True) -> Iterator["Instrumentation"]:
+        """Enable instrumentation within a with block, and restore the previous
+        state after. By default the recorded timings are discarded first."""
+        enabled = self.enabled
+        if reset:
+            self.reset()
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = enabled
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record a single call of a stage that took seconds."""
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = StageTimings()
+            self.stages[stage].record(seconds)
+
+    def timed(self, stage: str) -> Callable[[Callable], Callable]:
+        """Decorator timing every call of a function as a stage."""
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(stage, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def timer(self, stage: str) -> object:
+        """Context manager timing a block as a stage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def wrap(self, stage: str, function: Callable) -> Callable:
+        """Return function timed as a stage if instrumentation is enabled, or
+        else function itself. Used for functions passed as arguments, such as
+        similarity functions, so that they cost nothing extra when disabled."""
+        if not self.enabled:
+            return function
+        return self.timed(stage)(function)
+
+    def stats(self) -> Dict[str, dict]:
+        """Return the timings of every stage as dicts (see StageTimings.dict)."""
+        with self._lock:
+            return {stage: timings.dict() for stage, timings in sorted(self.stages.items())}
+
+    def to_json(self, indent: int = None) -> str:
+        """Return the timings of every stage as JSON."""
+        return json.dumps({'enabled': self.enabled, 'stages': self.stats()}, indent=indent)
+
+    def to_prometheus(self, metric: str = PROMETHEUS_METRIC) -> str:
+        """Return the timings of every stage as a histogram in the Prometheus
+        text exposition format, with the stage as a label."""
+        lines = ['# HELP %s Time spent in each stage of groceries.' % metric,
+                 '# TYPE %s histogram' % metric]
+        for stage, timings in self.stats().items():
+            label = 'stage="%s"' % _escape_label(stage)
+            cumulative = 0
+            for bound, count in timings['histogram']:
+                cumulative += count
+                lines += ['%s_bucket{%s,le="%s"} %d' % (metric, label, _format_bound(bound), cumulative)]
+            lines += ['%s_sum{%s} %r' % (metric, label, timings['total']),
+                      '%s_count{%s} %d' % (metric, label, timings['count'])]
+        return '\n'.join(lines) + '\n'
+
+
+class _Timer:
+    """Context manager recording the time of a with block."""
+
+    def __init__(self, instrumentation: Instrumentation, stage: str) -> None:
+        self.instrumentation = instrumentation
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self) -> "_Timer":
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.instrumentation.record(self.stage, perf_counter() - self.start)
+
+
+class _NullTimer:
+    """Context manager doing nothing, used when instrumentation is disabled."""
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound is None else repr(bound)
+
+
+def _enabled_by_environment() -> bool:
+    return os.environ.get(ENVIRONMENT_VARIABLE, '') not in ('', '0')
+
+
+instrumentation = Instrumentation(enabled=_enabled_by_environment())
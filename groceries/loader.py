@@ -0,0 +1,229 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          loader
+ Purpose:       Module containing a loader for cookbooks stored as YAML, where
+                recipes are only parsed when they are used.
+-------------------------------------------------------------------------------
+'''
+
+import os
+import re
+import mmap
+import itertools
+import threading
+from typing import Callable, Dict, Iterator, List, NamedTuple, Pattern, Tuple, Union
+
+import yaml
+
+from groceries.recipes import Recipe, Cookbook
+
+# The libyaml loader is used if PyYAML is built with it. Both read all values as strings.
+YAML_LOADER = getattr(yaml, 'CBaseLoader', yaml.BaseLoader)
+
+# Field names in the cookbook file and the Recipe arguments they map to.
+FIELD_MAPPING = {
+    'kategorier': 'tags',
+    'tid': 'time',
+    'oppskrift': 'how_to',
+    'antall personer i oppskrift': 'serves',
+    'ingredienser': 'ingredients',
+    'tags': 'tags',
+    'time': 'time',
+    'how_to': 'how_to',
+    'serves': 'serves',
+    'ingredients': 'ingredients',
+}
+
+# The lines of a cookbook file that are read when loading: the start or end of a YAML document, the name of a recipe
+# (starting at column 0), and the tags of a recipe, with %s replaced by the tag field names. The indent of a tag line is
+# captured, as only tag keys at the indent of the fields of the recipe are the tags of the recipe.
+LINE_PATTERN = rb'\n(?:(---|\.\.\.)(?=[ \t\r\n]|$)|([^ \t\r\n#%%-][^\r\n]*)|([ \t]+)(?:%s)[ \t]*:([^\r\n]*))'
+
+# The indent of the first field of a recipe, matched at the end of the recipe name line. Blank lines and comments are
+# skipped.
+FIELD_INDENT_PATTERN = re.compile(rb'\n(?:[ \t]*(?:#[^\r\n]*)?\r?\n)*([ \t]+)[^ \t\r\n#]')
+
+# Recipes are loaded one at a time, so that a recipe used from several threads is only loaded once.
+_load_lock = threading.RLock()
+
+# A recipe name line and a field line with plain YAML scalars, which can be read without a YAML parser.
+PLAIN_KEY_PATTERN = re.compile(r'^([^\'"\[\]{}&*!|>%@`#,?:\s][^:#]*?)[ \t]*:[ \t]*$')
+PLAIN_VALUE_PATTERN = re.compile(r'^[^\'"\[\]{}&*!|>%@`#,?\s](?:(?! #).)*$')
+
+
+class RecipeBlock(NamedTuple):
+    """The location of a recipe in a cookbook file."""
+    filename: str
+    start: int
+    end: int
+
+    def read(self) -> Tuple[str, dict]:
+        """Read and parse the recipe, returning the name and the fields of the recipe."""
+        with open(self.filename, 'rb') as fid:
+            fid.seek(self.start)
+            text = fid.read(self.end - self.start).decode('utf-8-sig')
+
+        document = yaml.load(text, Loader=YAML_LOADER)
+        if not isinstance(document, dict) or len(document) != 1:
+            raise ValueError('Could not read recipe at position %d in %s.' % (self.start, self.filename))
+        name, fields = next(iter(document.items()))
+        return name, fields or {}
+
+
+class LazyRecipe(Recipe):
+    """A Recipe read from a cookbook file. Only the name and tags are read
+    when the cookbook is loaded. The other fields are read, and the
+    ingredients parsed, the first time any of them is used."""
+
+    lazy_fields = ('time', 'serves', 'how_to', 'ingredients')
+
+    def __init__(self, name: str, tags: List[str], block: RecipeBlock,
+                 field_mapping: Dict[str, str] = None) -> None:
+        self.name = name
+        self.tags = tags
+        self._block = block
+        self._field_mapping = field_mapping or FIELD_MAPPING
+        self._listeners = []
+
+    def __getattr__(self, item: str) -> object:
+        # Only called for attributes that are not set, i.e. the lazy fields before the recipe is loaded.
+        if item in LazyRecipe.lazy_fields and '_block' in self.__dict__:
+            self.load()
+            return self.__dict__[item]
+        raise AttributeError(item)
+
+    @property
+    def loaded(self) -> bool:
+        """True if the recipe has been read from the cookbook file."""
+        return 'ingredients' in self.__dict__
+
+    def load(self) -> "LazyRecipe":
+        """Read the recipe from the cookbook file, and parse the ingredients."""
+        changed = False
+        if not self.loaded:
+            with _load_lock:
+                if not self.loaded:
+                    name, fields = self._block.read()
+                    fields = map_fields(fields, self._field_mapping)
+                    old_tags = self.tags
+                    Recipe.__init__(self, name=self.name, tags=fields.pop('tags', []), **fields)
+                    changed = self.tags != old_tags
+            # Listeners are called outside the load lock, as they take the locks of their cookbooks:
+            if changed:
+                for listener in list(self._listeners):
+                    listener(self, old_tags)
+        return self
+
+    def add_listener(self, listener: Callable[["LazyRecipe", List[str]], None]) -> None:
+        """Call listener(recipe, old tags) if the tags read when loading the
+        recipe differ from the tags read when the cookbook file was scanned."""
+        self._listeners += [listener]
+
+
+def map_fields(fields: dict, field_mapping: Dict[str, str] = None) -> dict:
+    """Map the fields of a recipe in a cookbook file to Recipe arguments.
+    Tags are split on commas, and the number of servings is a float."""
+    field_mapping = field_mapping or FIELD_MAPPING
+
+    output = {}
+    for key, value in fields.items():
+        if key not in field_mapping:
+            raise ValueError('Unknown recipe field: %s' % key)
+        field = field_mapping[key]
+        if field == 'tags':
+            value = split_tags(value)
+        elif field == 'serves':
+            value = float(value)
+        output[field] = value
+    return output
+
+
+def split_tags(value: Union[str, List[str]]) -> List[str]:
+    """Return a list of tags from a comma separated string of tags."""
+    if isinstance(value, list):
+        return [tag.strip() for tag in value]
+    return [tag.strip() for tag in value.split(',')]
+
+
+def read_recipes(filename: str, field_mapping: Dict[str, str] = None) -> Iterator[LazyRecipe]:
+    """Read the recipes in a cookbook file, one at a time.
+
+    The file is a stream of one or more YAML documents, each a mapping from
+    recipe names to recipe fields. The file is scanned for the lines naming
+    the recipes and their tags, and the rest of each recipe is only parsed
+    when used (see LazyRecipe). Recipes written in a way the scan can't read
+    are parsed with the YAML parser right away."""
+    filename = os.fspath(filename)
+    field_mapping = field_mapping or FIELD_MAPPING
+    tag_keys = b'|'.join(re.escape(key.encode('utf-8')) for key, field in field_mapping.items() if field == 'tags')
+    line_pattern = re.compile(LINE_PATTERN % tag_keys)
+
+    if os.path.getsize(filename) == 0:
+        return
+
+    for start, end, name_line, tag_line in _scan_recipes(filename, line_pattern):
+        yield _read_recipe(RecipeBlock(filename, start, end), name_line, tag_line, field_mapping)
+
+
+def _scan_recipes(filename: str, line_pattern: Pattern) -> List[Tuple[int, int, bytes, Union[bytes, None]]]:
+    """Return the start, end, name line and tag line of every recipe in a
+    cookbook file. The file is memory mapped while scanning, and nothing
+    pointing into the map is kept after, so that the map can be closed."""
+    recipes = []
+    with open(filename, 'rb') as fid, mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # The pattern matches lines after a line break, so the first line is matched separately:
+        first_end = data.find(b'\n')
+        first_line = line_pattern.match(b'\n' + data[:first_end if first_end >= 0 else len(data)])
+        lines = itertools.chain([first_line] if first_line else [], line_pattern.finditer(data))
+
+        try:
+            recipe = None  # [start, name line, indent of the fields, tag line] of the current recipe.
+            for match in lines:
+                if match is first_line:
+                    start, end = 0, first_end
+                else:
+                    start, end = match.start() + 1, match.end()
+                document, name_line, indent, tag_line = match.groups()
+                if tag_line is not None:
+                    if recipe and recipe[3] is None and indent == recipe[2]:
+                        recipe[3] = tag_line
+                    continue
+
+                if recipe:
+                    recipes += [(recipe[0], start, recipe[1], recipe[3])]
+                if name_line is not None:
+                    field_indent = FIELD_INDENT_PATTERN.match(data, end) if end >= 0 else None
+                    recipe = [start, name_line, field_indent.group(1) if field_indent else None, None]
+                else:
+                    recipe = None
+
+            if recipe:
+                recipes += [(recipe[0], len(data), recipe[1], recipe[3])]
+        finally:
+            # Matches and the scanner hold on to the map, and closing it while they exist raises BufferError:
+            del lines, first_line
+            match = field_indent = None
+    return recipes
+
+
+def _read_recipe(block: RecipeBlock, name_line: bytes, tag_line: Union[bytes, None],
+                 field_mapping: Dict[str, str]) -> LazyRecipe:
+    """Create a LazyRecipe from the name and tag lines of a recipe, or from
+    the parsed recipe if the lines are not plain YAML scalars."""
+    name = PLAIN_KEY_PATTERN.match(name_line.decode('utf-8').lstrip('\ufeff'))
+    tags = tag_line.decode('utf-8').strip() if tag_line is not None else None
+
+    if name and (tags is None or PLAIN_VALUE_PATTERN.match(tags)):
+        name = name.group(1)
+        tags = split_tags(tags) if tags is not None else []
+    else:
+        name, fields = block.read()
+        tags = map_fields(fields, field_mapping).get('tags', [])
+
+    return LazyRecipe(name, tags, block, field_mapping)
+
+
+def load_cookbook(filename: str, field_mapping: Dict[str, str] = None) -> Cookbook:
+    """Return a Cookbook with the recipes of a cookbook file. The recipes are
+    parsed when they are first used."""
+    return Cookbook(read_recipes(filename, field_mapping))
@@ -0,0 +1,141 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          pantry
+ Purpose:       Module for subtracting the contents of a pantry from grocery
+                lists, matching groceries to pantry items by fuzzy names
+                through an index of the pantry.
+-------------------------------------------------------------------------------
+'''
+
+from typing import Callable, Dict, List, Tuple, Union
+
+from groceries.configs.config_handler import config
+from groceries.groceries import GroceryList, Ingredient, IngredientOptionalSequenceInputType
+from groceries.instrumentation import instrumentation
+from groceries.search import TrigramIndex
+from groceries.similarity import similarity_engine, bounded
+
+
+class Pantry:
+    """The collated contents of a pantry, with an index of the names of the
+    pantry items, for subtracting the pantry from many grocery lists.
+
+    A grocery matches the first pantry item that contains it by name, like
+    GroceryList.contains: the similarity of the names must reach the limit of
+    Ingredient.contains, which is stricter for short names. Only the pantry
+    items whose names can reach the limit are scored (see TrigramIndex)."""
+
+    def __init__(self, ingredients: IngredientOptionalSequenceInputType = None,
+                 aprox_name_limit: Union[float, int] = config.constants.ingredient_match_limit,
+                 similarity: Callable[[str, str], float] = similarity_engine) -> None:
+        if isinstance(ingredients, GroceryList):
+            groceries = ingredients
+        else:
+            groceries = GroceryList(ingredients)
+
+        self.aprox_name_limit = aprox_name_limit
+        self.similarity = similarity
+        # Collated, in the order of GroceryList.contains. The ingredients of a list passed in are copied, as they
+        # change with the list:
+        self.ingredients = groceries.ingredients(copy=groceries is ingredients)
+        self.names = TrigramIndex(lowercase=False)
+        self._positions = {}  # Name -> positions in self.ingredients of the items with the name.
+        for position, ing in enumerate(self.ingredients):
+            if ing.name not in self._positions:
+                self._positions[ing.name] = []
+                self.names.add(ing.name)
+            self._positions[ing.name] += [position]
+
+    def __len__(self) -> int:
+        return len(self.ingredients)
+
+    def __repr__(self) -> str:
+        return '<Pantry object: %d ingredients>' % len(self.ingredients)
+
+    def _candidates(self, ingredient: Ingredient) -> List[int]:
+        """Return the positions of the pantry items with names that can match
+        the name of ingredient, in order."""
+        positions = []
+        for name in self.names.candidates(ingredient.name, self.aprox_name_limit):
+            positions += self._positions[name]
+        return sorted(positions)
+
+    def match(self, ingredient: Ingredient, amount: bool = True) -> Union[Ingredient, None]:
+        """Return the first pantry item containing ingredient, the same as
+        GroceryList.contains finds, or None if there is no such item."""
+        position = self._match(ingredient, amount, self._bounded_similarity())
+        return None if position is None else self.ingredients[position]
+
+    def _bounded_similarity(self) -> Callable[[str, str], float]:
+        return bounded(self.similarity, self.aprox_name_limit)
+
+    def _match(self, ingredient: Ingredient, amount: bool, similarity: Callable[[str, str], float],
+               remaining: Dict[int, float] = None) -> Union[int, None]:
+        """Return the position of the first pantry item containing ingredient.
+        With remaining, the amounts left of pantry items with amounts, items
+        that are used up or measured in another dimension are passed over."""
+        for position in self._candidates(ingredient):
+            item = self.ingredients[position]
+            if remaining is None:
+                if item.contains(ingredient, amount=amount, aprox_name_limit=self.aprox_name_limit,
+                                 similarity=similarity):
+                    return position
+            elif item.contains(ingredient, amount=False, aprox_name_limit=self.aprox_name_limit,
+                               similarity=similarity):
+                if not amount or remaining.get(position) is None or not ingredient.amount_check():
+                    return position
+                if item.unit == ingredient.unit and remaining[position] > 0:
+                    return position
+        return None
+
+    @instrumentation.timed('pantry.subtract')
+    def subtract(self, groceries: GroceryList, amount: bool = True) -> Tuple[GroceryList, List[dict]]:
+        """Subtract the pantry from a grocery list. Returns a new GroceryList,
+        and a report of the pantry items used, with one dict for each grocery
+        matched to a pantry item:
+            pantry: the name of the pantry item.
+            grocery: the name of the grocery.
+            amount: the amount of the pantry item used, in the base unit of
+                its dimension, or None if either has no amount.
+            covered: True if the grocery was removed from the list.
+
+        Groceries are matched to pantry items in the order of the collated
+        list. Pantry items without amounts, and all items when amount is
+        False, cover any amount of a grocery. Pantry items with amounts are
+        used up as groceries of the same dimension are subtracted, and a
+        grocery that needs more keeps the rest of its amount. The amount of a
+        grocery is the largest amount of its range, like in
+        Ingredient.contains."""
+        assert isinstance(groceries, GroceryList)
+
+        similarity = self._bounded_similarity()
+        remaining = {position: float(ing.amount().max()) for position, ing in enumerate(self.ingredients)
+                     if ing.amount_check()}
+
+        subtracted = []
+        report = []
+        for ing in groceries.ingredients():
+            position = self._match(ing, amount, similarity, remaining)
+            if position is None:
+                continue
+
+            used = None
+            scale = 1
+            if amount and remaining.get(position) is not None and ing.amount_check():
+                needed = float(ing.amount().max())
+                used = min(needed, remaining[position])
+                remaining[position] -= used
+                if used < needed:
+                    scale = used / needed
+
+            subtracted_ing = Ingredient(ing)
+            subtracted_ing.scale_ingredient_amount(scale)
+            subtracted += [subtracted_ing]
+            report += [{'pantry': self.ingredients[position].name,
+                        'grocery': ing.name,
+                        'amount': used,
+                        'covered': scale == 1}]
+
+        # The matched groceries are subtracted all at once, and cancel the groceries in the collated list:
+        return groceries - GroceryList(subtracted, indexed=False), report
+
@@ -0,0 +1,326 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          parser
+ Purpose:       Module containing the parser that splits ingredient strings into
+                amount, unit, comments and name.
+-------------------------------------------------------------------------------
+'''
+
+import re
+import math
+import numpy
+import threading
+from collections import OrderedDict
+from typing import Union, Tuple, List, NamedTuple, Hashable, Dict, Iterable
+
+import tregex
+from groceries.units import units, Unit
+from groceries.instrumentation import instrumentation
+
+from groceries.configs.config_handler import config
+from groceries.configs.config_types import ConfigBase
+
+ParseOutput = Tuple[numpy.array, Unit, Union[float, int], List[str], str]
+
+PARSE_CACHE_SIZE = 10000  # Default number of parsed ingredient strings kept in the parse cache.
+
+
+class ParseResult(NamedTuple):
+    """Immutable result of parsing a single ingredient string."""
+    number: Tuple[float, ...]
+    unit: Unit
+    unit_scale: Union[float, int]
+    comments: Tuple[str, ...]
+    name: str
+
+
+class ParseRecord(NamedTuple):
+    """Compact result of parsing a single ingredient string, which can be sent
+    between processes. The unit is identified by its dimension."""
+    number: Tuple[float, ...]
+    dimension: str
+    unit_scale: Union[float, int]
+    comments: Tuple[str, ...]
+    name: str
+
+
+class ParseCache:
+    """Bounded least-recently-used cache of ParseResults. Keeps track of hits,
+    misses and evictions. A maxsize of 0 disables the cache. Safe to use from
+    several threads."""
+
+    def __init__(self, maxsize: int = PARSE_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Union[ParseResult, None]:
+        """Return the cached result for key, or None if not present."""
+        with self._lock:
+            try:
+                result = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, result: ParseResult) -> None:
+        """Store a result, evicting the least recently used results if the cache is full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = result
+            self._data.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize: int) -> None:
+        """Change the size of the cache, evicting results if needed."""
+        self.maxsize = maxsize
+        with self._lock:
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove all cached results and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache statistics."""
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
+
+    def _evict(self) -> None:
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class IngredientParser:
+    """Parser for ingredient strings. All regex patterns are built and compiled
+    once for the active configs, and are rebuilt when config.set_config has
+    swapped any of the configs (language, constants or unit definitions).
+
+    Parse results are cached on the stripped input string and the config
+    fingerprint, so repeated ingredient lines are only parsed once."""
+
+    def __init__(self, cache_size: int = PARSE_CACHE_SIZE) -> None:
+        self.revision = None
+        self.cache = ParseCache(cache_size)
+        self.compile()
+
+    def compile(self) -> None:
+        """Build and compile all patterns from the current configs."""
+        aprox_prefixes = '|'.join(config.language.aprox_prefixes)
+        number_combo = '^(?:%s)?[ ]*%s(?:[ -]+%s)?(?(1)|(?!))' % (
+            aprox_prefixes, config.constants.number_format, config.constants.number_format)
+
+        # Purge named groups:
+        named_group_detection = r'(\(\?P<\w+>)'
+        named_group_reference_detection = r'\(\?\(\w+\)'
+        number_combo = re.sub(named_group_detection, '(', number_combo)  # Remove named groups.
+        number_combo = re.sub(named_group_reference_detection, '(', number_combo)  # Remove named groups.
+
+        self.amount_pattern = tregex.TregexCompiled(number_combo)
+        self.number_pattern = tregex.TregexCompiled(config.constants.number_format)
+        self.unit_pattern = re.compile(r'^\w+')
+        self.comment_pattern = tregex.TregexCompiled(r'(\(.*?\)|, .*?$)')
+        self.comment_content_pattern = tregex.TregexCompiled(r'(?:(?<=\()|(?<=, ))(.+?)(?:(?=\))|(?=$))')
+
+        fractions = config.constants.fractions
+        self.fractions = dict(fractions)
+        self.fraction_pattern = re.compile('|'.join(re.escape(fraction) for fraction in fractions)) if fractions else None
+
+        self.revision = config.revision
+
+    def refresh(self) -> None:
+        """Recompile the patterns if the configs have changed since last compile."""
+        if self.revision != config.revision:
+            self.compile()
+
+    @staticmethod
+    def fingerprint() -> Tuple[int, int]:
+        """Identify the configs and units a parse result was made with."""
+        return config.revision, units.revision
+
+    def parse_cached(self, ingredient_input: str) -> ParseResult:
+        """Parse an ingredient string, returning an immutable ParseResult.
+        Results are looked up in and stored to the parse cache."""
+        key = (ingredient_input.strip(), self.fingerprint())
+
+        result = self.cache.get(key)
+        if result is None:
+            number, unit, unit_scale, comments, name = self.parse(ingredient_input)
+            result = ParseResult(tuple(number.tolist()), unit, unit_scale, tuple(comments), name)
+            self.cache.put(key, result)
+
+        return result
+
+    def parse_batch(self, ingredient_inputs: Iterable[str], workers: int = None,
+                    chunksize: int = None) -> List[ParseResult]:
+        """Parse many ingredient strings, returning a ParseResult for each
+        string in the same order as the input.
+
+        With workers > 1, the strings that are not in the parse cache are
+        parsed once each in a pool of worker processes, in chunks of
+        chunksize strings. The active configs are passed to the workers, and
+        the workers send back ParseRecords, which are stored in the parse
+        cache."""
+        ingredient_inputs = list(ingredient_inputs)
+        if not workers or workers <= 1:
+            return [self.parse_cached(ingredient_input) for ingredient_input in ingredient_inputs]
+
+        self.refresh()
+        fingerprint = self.fingerprint()
+        keys = [(ingredient_input.strip(), fingerprint) for ingredient_input in ingredient_inputs]
+
+        results = {}
+        missing = []
+        for key in keys:
+            if key not in results:
+                results[key] = self.cache.get(key) if key in self.cache else None
+                if results[key] is None:
+                    missing += [key[0]]
+
+        if missing:
+            if not chunksize:
+                chunksize = math.ceil(len(missing) / (workers * 4))
+            chunks = [missing[i:i + chunksize] for i in range(0, len(missing), chunksize)]
+
+            # Imported here, as multiprocessing is slow to import and only needed for parallel parsing.
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                     initargs=(config.configs(),)) as executor:
+                for chunk, records in zip(chunks, executor.map(_parse_chunk, chunks)):
+                    for ingredient_input, record in zip(chunk, records):
+                        result = self.from_record(record)
+                        self.cache.put((ingredient_input, fingerprint), result)
+                        results[(ingredient_input, fingerprint)] = result
+
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def to_record(result: ParseResult) -> ParseRecord:
+        """Convert a ParseResult to a ParseRecord."""
+        return ParseRecord(result.number, result.unit.dimension, result.unit_scale, result.comments, result.name)
+
+    @staticmethod
+    def from_record(record: ParseRecord) -> ParseResult:
+        """Convert a ParseRecord to a ParseResult, with the Unit of the record
+        dimension from the current units."""
+        return ParseResult(record.number, units.get(record.dimension), record.unit_scale, record.comments, record.name)
+
+    @instrumentation.timed('parse')
+    def parse(self, ingredient_input: str) -> ParseOutput:
+        """Parse an ingredient string. Returns the amount, unit, unit scale,
+        comments and name of the ingredient. Does not use the parse cache."""
+        self.refresh()
+
+        ingredient_string = self.process_input_string(ingredient_input)
+
+        # Get the amount and remove the matched amount string from the start of ingredient_string.
+        number, number_text = self.parse_amount(ingredient_string)
+        ingredient_string = ingredient_string[len(number_text):].strip()
+
+        # Get the unit and remove the matched unit string from ingredient_string.
+        unit, unit_scale, unit_text = self.parse_unit(ingredient_string)
+        ingredient_string = ingredient_string.replace(unit_text, '', 1).strip()
+
+        # Get the comment(s) and remove the matched comment strings from ingredient_string.
+        comments, comment_match_string = self.parse_comments(ingredient_string)
+        for k in comment_match_string:
+            ingredient_string = ingredient_string.replace(k, '').strip()
+
+        # What is left should be the name of the ingredient.
+        return number, unit, unit_scale, comments, ingredient_string
+
+    def process_input_string(self, ingredient_input: str) -> str:
+        """The input might contain some crazy unicode characters to represent
+        fractions and other crazyness. Replace these."""
+        ingredient_input = ingredient_input.strip()
+
+        if self.fraction_pattern:
+            ingredient_input = self.fraction_pattern.sub(lambda m: self.fractions[m.group()], ingredient_input)
+
+        return ingredient_input
+
+    @instrumentation.timed('parse.amount')
+    def parse_amount(self, ingredient_string: str) -> Tuple[numpy.array, str]:
+        """Find the assumed amounts of a specific ingredient. If the ingredient
+        is specified as a range (i.e. 2 - 2 1/2 ounces) the method will return
+        all numbers present in the range ([2,  2.5]). If no amount is found,
+        method returns an empty array, as an unspecified is something different
+        than 0 of something."""
+        all_amounts = []
+        amount_text = ''
+
+        numbers = self.amount_pattern.match(ingredient_string)
+
+        if numbers:
+            amount_text = numbers[0]
+
+            for a in self.number_pattern.to_dict(amount_text):
+                amount = 0
+                numerator = 0
+                denominator = 1
+                if a['amount']: amount = float(a['amount'].replace(',', '.'))
+                if a['numerator']: numerator = float(a['numerator'])
+                if a['denominator']: denominator = float(a['denominator'])
+
+                all_amounts += [amount + numerator / denominator]
+
+        # Convert array to numpy array,  for easier manipulation:
+        return numpy.array(all_amounts), amount_text
+
+    @instrumentation.timed('parse.unit')
+    def parse_unit(self, ing: str) -> Tuple[Unit, Union[float, int], str]:
+        """Get the unit object of the ingredient."""
+        unit_text = self.unit_pattern.match(ing)
+        unit_text = unit_text.group() if unit_text else ''
+
+        return units.match(unit_text)
+
+    @instrumentation.timed('parse.comments')
+    def parse_comments(self, ing: str) -> Tuple[List[str], List[str]]:
+        """Get all individual comments from the ingredient. Returns the comments
+        without containers and the full matched comment strings."""
+        comment_match_string = self.comment_pattern.to_tuple(ing)
+        if comment_match_string:
+            comment_match_string = [s[0] for s in comment_match_string]
+            # Comments without containers ( "([comment])" and ",  [comment]"
+            comments = [s[0] for s in self.comment_content_pattern.to_tuple(ing)]
+        else:
+            comments = []
+
+        return comments, comment_match_string
+
+
+parser = IngredientParser()
+
+
+def _initialize_worker(configs: List[ConfigBase]) -> None:
+    """Give a worker process the configs of the process that started it."""
+    for worker_config in configs:
+        config.set_config(worker_config)
+    units.reload_units()
+
+
+def _parse_chunk(ingredient_inputs: List[str]) -> List[ParseRecord]:
+    """Parse a chunk of ingredient strings in a worker process."""
+    return [parser.to_record(parser.parse_cached(ingredient_input)) for ingredient_input in ingredient_inputs]
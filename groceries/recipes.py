@@ -11,13 +11,31 @@
 '''
 
 import re
+import copy
 import random
+import threading
 from typing import Union, List, Sequence, Tuple
 
 import tregex
 from groceries.groceries import GroceryList, Ingredient
+from groceries.search import TrigramIndex, IngredientIndex, AvailableSet
+from groceries.similarity import SimilarityEngine
+from groceries.instrumentation import instrumentation
 from groceries.configs.config_handler import config
 
+RandomGenerator = Union[random.Random, type(random)]  # A random.Random, or the random module itself.
+
+
+def random_generator(seed: object = None, rng: RandomGenerator = None,
+                     default: RandomGenerator = random) -> RandomGenerator:
+    """Return rng if given, or else a random.Random seeded with seed if
+    given, or else default."""
+    if rng is not None:
+        return rng
+    if seed is not None:
+        return random.Random(seed)
+    return default
+
 
 class Recipe:
     """Class for handling a recipe. A recipe has several properties and a list of
@@ -50,7 +68,8 @@ class RecipeChoice(Recipe):
 
     def __init__(self, recipe: Recipe = Recipe(), plan_tag: str = '', made_for: Union[float, int] = None,
                  multiplier: Union[float, int] = None) -> None:
-        Recipe.__init__(self, **recipe.__dict__)
+        Recipe.__init__(self, name=recipe.name, tags=recipe.tags, time=recipe.time, serves=recipe.serves,
+                        how_to=recipe.how_to, ingredients=recipe.ingredients)
         self.plan_tag = plan_tag
 
         if not made_for and multiplier:
@@ -71,12 +90,13 @@ class RecipeChoice(Recipe):
         else:
             self.scale = 1
 
-        # Set Recipe choice property of all ingredients:
-        # Copy ingredient object (de-link them from Recipe in cookbook).
-        self.ingredients.copy(in_place=True)
-        self.ingredients.set_recipe(self)
+        with instrumentation.timer('recipe_choice.scale'):
+            # Set Recipe choice property of all ingredients:
+            # Copy ingredient object (de-link them from Recipe in cookbook).
+            self.ingredients.copy(in_place=True)
+            self.ingredients.set_recipe(self)
 
-        self.ingredients *= self.scale  # In-place multiplication of GroceryList.
+            self.ingredients *= self.scale  # In-place multiplication of GroceryList.
 
     def __str__(self) -> str:
         if self.plan_tag and not self.name:
@@ -124,24 +144,125 @@ class RecipeConfigType:
 
 class Cookbook:
     """Class for handling a collection of Recipes. Contains search functions for
-    the recipes contained within."""
+    the recipes contained within.
 
-    def __init__(self, recipes: Sequence[Recipe]) -> None:
+    Recipes are picked at random with the random number generator of the
+    cookbook, which is rng, a random.Random seeded with seed, or by default
+    the random module. The random generator can also be given for a single
+    search or menu."""
+
+    def __init__(self, recipes: Sequence[Recipe], seed: object = None, rng: RandomGenerator = None) -> None:
         """the constructor only accepts a cookbook_dictionary already parsed
         the location where the cookbook should be stored."""
         self.recipes = {recipe.name: recipe for recipe in recipes}
         self.tags = []
 
+        # Trigram index of the recipe names, for fuzzy search. Names are indexed on the first fuzzy search:
+        self.name_index = TrigramIndex()
+        self._unindexed_names = dict.fromkeys(self.recipes)
+
+        # Inverted index from ingredient names to recipes, and a cache of ingredient name similarities, for searching
+        # with groceries. Recipes are indexed on the first search, so that recipes loaded lazily are not parsed before
+        # they are needed:
+        self.ingredient_index = IngredientIndex()
+        self._unindexed_recipes = set(self.recipes)
+        self.similarity = SimilarityEngine()
+
+        # Guards the lazy indexing, as the indexes are shared with the sessions of the cookbook:
+        self._lock = threading.RLock()
+
+        # Random number generator for picking recipes. Separate for every session:
+        self.random = random_generator(seed, rng)
+
         self.make_recipe_unavailable_after_search_match = True
         self.when_choice_on_empty_selection_reset_available = True
 
-        self.available_recipes = []
-        self.available_tags = dict()
-
-        self.reset_available_recipes()  # Populate self.available_recipes and self.available_tags
+        # The available recipe names, in total and per tag. Built once, and reset by making all names available.
+        self.available_recipes = AvailableSet(self.recipes.keys())
+        self.available_tags = {tag: AvailableSet(names) for tag, names in self._create_tag_lookup().items()}
 
         self.tags = [k for k in self.available_tags.keys()]
 
+        for recipe in self.recipes.values():
+            self._listen(recipe)
+
+    def _listen(self, recipe: Recipe) -> None:
+        """Keep the tag index up to date if the tags of a lazily loaded recipe
+        change when it is loaded (see groceries.loader.LazyRecipe)."""
+        if hasattr(recipe, 'add_listener'):
+            recipe.add_listener(self._retag)
+
+    def _retag(self, recipe: Recipe, old_tags: List[str]) -> None:
+        """Move a recipe from the tags in old_tags to its current tags, keeping
+        its availability. Tags without recipes are removed. Sessions made
+        before the change keep their own copy of the tag index."""
+        with self._lock:
+            if self.recipes.get(recipe.name) is not recipe:
+                return
+            available = recipe.name in self.available_recipes
+            for tag in old_tags:
+                if tag in self.available_tags and tag not in recipe.tags:
+                    self.available_tags[tag].delete(recipe.name)
+                    if not self.available_tags[tag].names:
+                        del self.available_tags[tag]
+                        self.tags.remove(tag)
+            for tag in recipe.tags:
+                if tag not in self.available_tags:
+                    self.available_tags[tag] = AvailableSet()
+                    self.tags += [tag]
+                if recipe.name not in self.available_tags[tag].names:
+                    self.available_tags[tag].add(recipe.name)
+                    if not available:
+                        self.available_tags[tag].remove(recipe.name)
+
+    def add_recipe(self, recipe: Recipe) -> None:
+        """Add a recipe to the cookbook, and make it available for search. A
+        recipe with the same name as an existing recipe replaces it."""
+        if recipe.name in self.recipes:
+            self.remove_recipe(recipe.name)
+
+        self.recipes[recipe.name] = recipe
+        self._unindexed_names[recipe.name] = None
+        self._unindexed_recipes.add(recipe.name)
+
+        self.available_recipes.add(recipe.name)
+        for tag in recipe.tags:
+            if tag not in self.available_tags:
+                self.available_tags[tag] = AvailableSet()
+                self.tags += [tag]
+            self.available_tags[tag].add(recipe.name)
+        self._listen(recipe)
+
+    def remove_recipe(self, name: str) -> None:
+        """Remove a recipe from the cookbook."""
+        recipe = self.recipes.pop(name)
+        if name in self._unindexed_names:
+            del self._unindexed_names[name]
+        else:
+            self.name_index.remove(name)
+        if name in self._unindexed_recipes:
+            self._unindexed_recipes.remove(name)
+        else:
+            self.ingredient_index.remove(name)
+
+        self.available_recipes.delete(name)
+        for tag in recipe.tags:
+            self.available_tags[tag].delete(name)
+
+    def _index_names(self) -> None:
+        """Add the names of all recipes not yet indexed to the name index, in the order of self.recipes."""
+        with self._lock:
+            for name in self._unindexed_names:
+                self.name_index.add(name)
+            self._unindexed_names.clear()
+
+    def _index_ingredients(self) -> None:
+        """Add the ingredients of all recipes not yet indexed to the ingredient index."""
+        with self._lock:
+            for name in self._unindexed_recipes:
+                self.ingredient_index.add(name, [ing.name for ing in self.recipes[name].ingredients.ingredients()])
+            self._unindexed_recipes.clear()
+
     def _create_tag_lookup(self) -> dict:
         tag_lookup = {}
         for recipe in self.recipes.values():
@@ -152,9 +273,12 @@ class Cookbook:
 
         return tag_lookup
 
+    @instrumentation.timed('cookbook.find_recipe_with_groceries')
     def find_recipe_with_groceries(self, grocery_list: GroceryList, best: bool = False,
-                                   make_unavailable: list = None, verbose: bool = False) -> Union[list, None]:
-        """Return a recipe from the cookbook using an existing grocery list."""
+                                   make_unavailable: list = None, verbose: bool = False,
+                                   rng: RandomGenerator = None) -> Union[list, None]:
+        """Return a recipe from the cookbook using an existing grocery list.
+        The recipe is picked with rng, or the random generator of the cookbook."""
 
         candidates = []
         scores = []
@@ -162,8 +286,18 @@ class Cookbook:
         if make_unavailable is None:
             make_unavailable = self.make_recipe_unavailable
 
-        for recipe in self.available_recipes:
-            score_matrix = self.recipes[recipe].ingredients.compare_with(grocery_list, verbose=True)
+        # Only recipes containing at least one ingredient similar to a grocery can get a score above zero:
+        grocery_names = [ing.name for ing in grocery_list.ingredients()]
+        with self._lock:
+            self._index_ingredients()
+            matching_recipes = self.ingredient_index.recipes(grocery_names, config.constants.ingredient_match_limit,
+                                                             self.similarity)
+
+        for recipe in matching_recipes:
+            if recipe not in self.available_recipes:
+                continue
+            score_matrix = self.recipes[recipe].ingredients.compare_with(grocery_list, verbose=True,
+                                                                         similarity=self.similarity)
             score = sum([score for name, score, check, name_score, amount_score in score_matrix]) / len(score_matrix)
 
             if score > 0:
@@ -186,7 +320,7 @@ class Cookbook:
                     results))  # Top 10%, rounded up, but not less than 4. Also, not ever more than length of results.
                 selection = results[-index:]
 
-            selected = random.choice(selection)
+            selected = (rng or self.random).choice(selection)
             output = self.recipes[selected[0]]
 
             if output and make_unavailable:
@@ -194,8 +328,12 @@ class Cookbook:
 
             return output
 
-    def find_recipe(self, search_string: str, make_unavailable: bool = None) -> Recipe:
-        """Return a recipe from the cookbook using a search string."""
+    @instrumentation.timed('cookbook.find_recipe')
+    def find_recipe(self, search_string: str, make_unavailable: bool = None, rng: RandomGenerator = None) -> Recipe:
+        """Return a recipe from the cookbook using a search string. Blank
+        searches and tags are picked with rng, or the random generator of the
+        cookbook."""
+        rng = rng or self.random
 
         fuzzy_match_limit = 0.8
 
@@ -210,7 +348,7 @@ class Cookbook:
                 if self.when_choice_on_empty_selection_reset_available:
                     if len(self.available_recipes) == 0:
                         self.reset_available_recipes()
-                recipe_name = random.choice(self.available_recipes)
+                recipe_name = rng.choice(self.available_recipes)
                 output = self.recipes[recipe_name]
                 break
 
@@ -226,11 +364,13 @@ class Cookbook:
             # Fuzzy name match (override self.available_recipes).
             # You get what you specifically ask for.
             if not output:
-                for name in self.recipes:
-                    ratio = tregex.similarity(search_string, name.lower())
-                    if ratio >= fuzzy_match_limit:
-                        output = self.recipes[name]
-                        break
+                # The index only scores the names that can reach the limit, in the order of self.recipes:
+                with self._lock:
+                    self._index_names()
+                    name = self.name_index.find(search_string, fuzzy_match_limit)
+                if name is not None:
+                    output = self.recipes[name]
+                    break
 
             # If no match yet found, assume tag and check for tags:
             if not output:
@@ -242,7 +382,7 @@ class Cookbook:
                         # No available recipes with tag.
                         pass
                     else:
-                        recipe_name = random.choice(self.available_tags[search_string])
+                        recipe_name = rng.choice(self.available_tags[search_string])
                         output = self.recipes[recipe_name]
                         break
 
@@ -277,8 +417,9 @@ class Cookbook:
 
     def reset_available_recipes(self, unavailable_recipes: list = None) -> None:
         """Make all recipes available for search again."""
-        self.available_recipes = list(self.recipes.keys())  # Recipe names.
-        self.available_tags = self._create_tag_lookup()  # Tags and recipe names.
+        self.available_recipes.reset()
+        for available in self.available_tags.values():
+            available.reset()
 
         # If the user has a list of recipes that still should be unavailable,
         # these can be passed as unavailable_recipes and are handled here:
@@ -292,18 +433,71 @@ class Cookbook:
         # TODO: This method does nothing.
         pass
 
-    def parse_menu(self, menu_text: str) -> object:
-        """Return a menu object from the parsed text."""
-        return Menu(self, menu_text)
+    def parse_menu(self, menu_text: str, seed: object = None, rng: RandomGenerator = None) -> object:
+        """Return a menu object from the parsed text. Recipes are picked with
+        rng, a random.Random seeded with seed, or the random generator of the
+        cookbook. The same menu text and seed give the same menu for the same
+        available recipes, e.g. in a new session of the cookbook."""
+        return Menu(self, menu_text, seed=seed, rng=rng)
+
+    def session(self, seed: object = None, rng: RandomGenerator = None) -> "Cookbook":
+        """Return a session of the cookbook: a view of the same recipes, with
+        its own available recipes and its own random number generator, which
+        is rng or a random.Random seeded with seed. The session starts with the recipes available in the
+        cookbook, and searches in the session don't change what is available
+        in the cookbook or in other sessions.
+
+        The recipes, indexes and similarity cache are shared with the cookbook,
+        so sessions can be used from several threads at the same time, as long
+        as no recipes are added or removed and the configs are not changed
+        meanwhile."""
+        session = copy.copy(self)
+        session.available_recipes = self.available_recipes.copy()
+        session.available_tags = {tag: available.copy() for tag, available in self.available_tags.items()}
+        session.tags = list(self.tags)
+        session.random = random_generator(seed, rng, default=random.Random())
+        return session
+
+    def parse_menus(self, menu_texts: Sequence[str], seeds: Sequence[object] = None,
+                    workers: int = None) -> List["Menu"]:
+        """Parse many menus, each in its own session of the cookbook with the
+        seed of the menu (see session). The result is the same as parsing the
+        menus one after another:
+
+            [cookbook.session(seed).parse_menu(text) for text, seed in zip(menu_texts, seeds)]
+
+        With workers > 1, the menus are parsed in a pool of worker threads."""
+        menu_texts = list(menu_texts)
+        seeds = list(seeds) if seeds is not None else [None] * len(menu_texts)
+        if len(seeds) != len(menu_texts):
+            raise ValueError('Got %d seeds for %d menus.' % (len(seeds), len(menu_texts)))
+
+        def parse(menu_text: str, seed: object) -> Menu:
+            return self.session(seed).parse_menu(menu_text)
+
+        if not workers or workers <= 1 or len(menu_texts) <= 1:
+            return [parse(menu_text, seed) for menu_text, seed in zip(menu_texts, seeds)]
+
+        # Threads, and not processes, as the menus refer to the recipes of the cookbook:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(parse, menu_texts, seeds))
 
 
 class Menu(object):
 
-    def __init__(self, cookbook: Cookbook, menu_text: str) -> None:
+    def __init__(self, cookbook: Cookbook, menu_text: str, seed: object = None, rng: RandomGenerator = None,
+                 process: bool = True) -> None:
         """Class for handling a single menu. A Plan object handles two Menu objects
         in the form of a plan and a cupboard contents list (which is handled in
-        the same way as a menu."""
+        the same way as a menu. Recipes are picked with rng, a random.Random
+        seeded with seed, or the random generator of the cookbook.
+
+        With process=False the lines are only split, and are processed by
+        calling process_line for every line of input_lines and passing the
+        results to set_processed_lines (see groceries.aio)."""
         self.cookbook = cookbook
+        self.random = random_generator(seed, rng, default=cookbook.random)
         self.recipes = []
         self.groceries = GroceryList()
 
@@ -316,8 +510,18 @@ class Menu(object):
 
         self.menu_pattern = start + sep + sep.join([tag_pattern, config.menu_format.tag_separator, recipe_pattern, scaling_pattern]) + sep
 
-        self.input_plan, self.input_lines, self.processed_lines, self.processed_plan = self.process_plan(menu_text)
-
+        if process:
+            self.input_plan, self.input_lines, self.processed_lines, self.processed_plan = self.process_plan(menu_text)
+            self.process_input()
+        else:
+            self.input_plan, self.input_lines = menu_text, self.split_lines(menu_text)
+            self.processed_lines, self.processed_plan = [], ''
+
+    def set_processed_lines(self, processed_lines: list) -> None:
+        """Set the results of process_line for every line of input_lines, and
+        build the processed plan, recipes and groceries of the menu."""
+        self.processed_lines = processed_lines
+        self.processed_plan = self.create_output_lines(processed_lines)
         self.process_input()
 
     def process_input(self) -> None:
@@ -338,14 +542,18 @@ class Menu(object):
 
         # Split into lines:
         input_plan = menu_text
-
-        lines = menu_text.split('\n')
-        input_lines = [line.strip() for line in lines]
+        input_lines = self.split_lines(menu_text)
 
         processed_lines = [self.process_line(line) for line in input_lines]
         processed_plan = self.create_output_lines(processed_lines)
         return input_plan, input_lines, processed_lines, processed_plan
 
+    @staticmethod
+    def split_lines(menu_text: str) -> List[str]:
+        """Split a plan into stripped lines."""
+        return [line.strip() for line in menu_text.split('\n')]
+
+    @instrumentation.timed('menu.process_line')
     def process_line(self, line: str) -> Union[str, Ingredient, RecipeChoice]:
 
         line = re.sub(config.language.recipe_not_found_message, '', line)
@@ -368,7 +576,7 @@ class Menu(object):
                 if match['made_for']:
                     match['made_for'] = float(match['made_for'])
 
-                recipe = self.cookbook.find_recipe(match['recipe'], make_unavailable=True)
+                recipe = self.cookbook.find_recipe(match['recipe'], make_unavailable=True, rng=self.random)
 
                 if recipe:
                     return RecipeChoice(recipe=recipe, plan_tag=match['plan_tag'], made_for=match['made_for'],
@@ -0,0 +1,274 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          search
+ Purpose:       Module containing indexes for searching the recipes of a
+                Cookbook.
+-------------------------------------------------------------------------------
+'''
+
+import math
+from collections import Counter
+from typing import List, Union, Iterable, Iterator, Set, Dict
+
+from groceries.instrumentation import instrumentation
+from groceries.similarity import Scorer, similarity_engine, bounded
+
+
+class TrigramIndex:
+    """Index of the trigrams of (lowercased) names, for narrowing down the
+    candidates of a fuzzy name search before scoring them with
+    tregex.similarity.
+
+    Names are padded with two characters on each side before splitting into
+    trigrams. If the similarity of two strings is at least limit, the number
+    of trigrams they share is at least (2.5 * limit - 2) * T + 2, where T is
+    the sum of their lengths, and the shorter string is at least
+    limit / (2 - limit) times the length of the longer. Candidates are only
+    discarded if they fail these bounds, so the search finds the same name as
+    scoring every name."""
+
+    start_padding = '\x02\x02'
+    end_padding = '\x03\x03'
+
+    def __init__(self, names: List[str] = None, lowercase: bool = True) -> None:
+        self.lowercase = lowercase
+        self._postings = {}  # Trigram -> {name: number of times the trigram occurs in name}
+        self._strings = {}  # Name -> (lowercased) name.
+        self._order = {}  # Name -> order of insertion, so the first match can be found.
+        self._counter = 0
+
+        for name in names or []:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._strings
+
+    @classmethod
+    def trigrams(cls, string: str) -> Dict[str, int]:
+        """Return the number of occurrences of each trigram in the padded string."""
+        padded = cls.start_padding + string + cls.end_padding
+        trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        counts = dict.fromkeys(trigrams, 1)
+        if len(counts) < len(trigrams):
+            counts = Counter(trigrams)
+        return counts
+
+    def add(self, name: str) -> None:
+        """Add a name to the index. Adding a name that is already in the
+        index keeps its original position in the search order."""
+        if name in self._strings:
+            self.remove(name, keep_order=True)
+        else:
+            self._order[name] = self._counter
+            self._counter += 1
+
+        string = name.lower() if self.lowercase else name
+        self._strings[name] = string
+        for trigram, count in self.trigrams(string).items():
+            self._postings.setdefault(trigram, {})[name] = count
+
+    def remove(self, name: str, keep_order: bool = False) -> None:
+        """Remove a name from the index."""
+        string = self._strings.pop(name)
+        for trigram in self.trigrams(string):
+            postings = self._postings[trigram]
+            del postings[name]
+            if not postings:
+                del self._postings[trigram]
+
+        if not keep_order:
+            del self._order[name]
+
+    def candidates(self, search_string: str, limit: float) -> List[str]:
+        """Return the names that can have a similarity of at least limit to
+        the (lowercased) search string, in the order they were added."""
+        length = len(search_string)
+        if limit <= 0:
+            return sorted(self._strings, key=self._order.get)
+
+        # Length range of names that can reach the limit: 2 * min / (length + name length) >= limit.
+        shortest = math.ceil(length * limit / (2 - limit) - 1e-9)
+        longest = math.floor(length * (2 - limit) / limit + 1e-9)
+
+        coefficient = 2.5 * limit - 2
+        total = length + (shortest if coefficient >= 0 else longest)
+        required = math.ceil(coefficient * total + 2 - 1e-9)
+
+        if required <= 0:
+            # The index can't rule out any names, so only the length is checked.
+            names = [name for name, string in self._strings.items() if shortest <= len(string) <= longest]
+        else:
+            shared = {}
+            for trigram, count in self.trigrams(search_string).items():
+                for name, name_count in self._postings.get(trigram, {}).items():
+                    shared[name] = shared.get(name, 0) + min(count, name_count)
+
+            names = []
+            for name, count in shared.items():
+                name_length = len(self._strings[name])
+                if not shortest <= name_length <= longest:
+                    continue
+                if count >= math.ceil(coefficient * (length + name_length) + 2 - 1e-9):
+                    names += [name]
+
+        return sorted(names, key=self._order.get)
+
+    def find(self, search_string: str, limit: float) -> Union[str, None]:
+        """Return the first name with a similarity of at least limit to the
+        (lowercased) search string, or None if there is no such name."""
+        similarity = instrumentation.wrap('similarity', similarity_engine.bounded(limit))
+        for name in self.candidates(search_string, limit):
+            if similarity(search_string, self._strings[name]) >= limit:
+                return name
+        return None
+
+
+class IngredientIndex:
+    """Inverted index from ingredient names to the names of the recipes using
+    them. Ingredient names are kept in a TrigramIndex, so the recipes with
+    ingredients similar to a grocery can be found without comparing the
+    grocery to every ingredient in the cookbook."""
+
+    def __init__(self) -> None:
+        self._recipes = {}  # Ingredient name -> {recipe name: None}, ordered like the recipes were added.
+        self._ingredients = {}  # Recipe name -> ingredient names.
+        self.names = TrigramIndex(lowercase=False)
+
+    def __contains__(self, recipe_name: str) -> bool:
+        return recipe_name in self._ingredients
+
+    def add(self, recipe_name: str, ingredient_names: Iterable[str]) -> None:
+        """Add the ingredients of a recipe to the index."""
+        if recipe_name in self._ingredients:
+            self.remove(recipe_name)
+
+        ingredient_names = list(dict.fromkeys(ingredient_names))
+        self._ingredients[recipe_name] = ingredient_names
+        for name in ingredient_names:
+            if name not in self._recipes:
+                self._recipes[name] = {}
+                self.names.add(name)
+            self._recipes[name][recipe_name] = None
+
+    def remove(self, recipe_name: str) -> None:
+        """Remove the ingredients of a recipe from the index."""
+        for name in self._ingredients.pop(recipe_name):
+            recipes = self._recipes[name]
+            del recipes[recipe_name]
+            if not recipes:
+                del self._recipes[name]
+                self.names.remove(name)
+
+    def recipes(self, grocery_names: Iterable[str], limit: float,
+                similarity: Scorer = similarity_engine) -> Set[str]:
+        """Return the names of the recipes with at least one ingredient with
+        a similarity(ingredient name, grocery name) of at least limit to any
+        of the grocery names."""
+        similarity = instrumentation.wrap('similarity', bounded(similarity, limit))
+        output = set()
+        for grocery_name in set(grocery_names):
+            for name in self.names.candidates(grocery_name, limit):
+                if similarity(name, grocery_name) >= limit:
+                    output.update(self._recipes[name])
+        return output
+
+
+class AvailableSet:
+    """Set of names where each name is either available or unavailable.
+
+    All names are kept in one array, with the available names first. Making a
+    name unavailable swaps it with the last available name, and making it
+    available again swaps it with the first unavailable name, so removing,
+    restoring and picking a random available name are all O(1). Making every
+    name available again puts the names back in the order they were added,
+    so that picking with a seeded random generator after a reset gives the
+    same names as in a new set.
+
+    Indexing, iteration and len only see the available names, so the set can
+    be used with random.choice like a list of the available names. The order
+    of the available names changes as names are removed and restored."""
+
+    def __init__(self, names: Iterable[str] = None) -> None:
+        self._added = dict.fromkeys(names or [])  # All names, in the order they were added.
+        self._names = list(self._added)
+        self._positions = {name: i for i, name in enumerate(self._names)}
+        self._size = len(self._names)  # Number of available names.
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, name: str) -> bool:
+        return self._positions.get(name, self._size) < self._size
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names[:self._size])
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('AvailableSet index out of range')
+        return self._names[i]
+
+    def __repr__(self) -> str:
+        return '<AvailableSet: %d of %d available>' % (self._size, len(self._names))
+
+    @property
+    def names(self) -> List[str]:
+        """All names, available or not."""
+        return list(self._names)
+
+    def _swap(self, i: int, j: int) -> None:
+        name_i, name_j = self._names[i], self._names[j]
+        self._names[i], self._names[j] = name_j, name_i
+        self._positions[name_j], self._positions[name_i] = i, j
+
+    def remove(self, name: str) -> None:
+        """Make an available name unavailable. Raises ValueError if the name is not available."""
+        if name not in self:
+            raise ValueError('%s is not available.' % name)
+        self._swap(self._positions[name], self._size - 1)
+        self._size -= 1
+
+    def restore(self, name: str) -> None:
+        """Make an unavailable name available again."""
+        if name not in self._positions:
+            raise KeyError(name)
+        if name not in self:
+            self._swap(self._positions[name], self._size)
+            self._size += 1
+
+    def reset(self) -> None:
+        """Make all names available, in the order they were added."""
+        self._names = list(self._added)
+        self._positions = {name: i for i, name in enumerate(self._names)}
+        self._size = len(self._names)
+
+    def copy(self) -> "AvailableSet":
+        """Return a copy with the same names available, in the same order."""
+        new = AvailableSet.__new__(AvailableSet)
+        new._added = dict(self._added)
+        new._names = list(self._names)
+        new._positions = dict(self._positions)
+        new._size = self._size
+        return new
+
+    def add(self, name: str) -> None:
+        """Add a new name to the set, and make it available."""
+        if name not in self._positions:
+            self._added[name] = None
+            self._positions[name] = len(self._names)
+            self._names += [name]
+        self.restore(name)
+
+    def delete(self, name: str) -> None:
+        """Delete a name from the set altogether."""
+        if name in self:
+            self.remove(name)
+        self._swap(self._positions[name], len(self._names) - 1)
+        self._names.pop()
+        del self._positions[name]
+        del self._added[name]
@@ -0,0 +1,190 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          similarity
+ Purpose:       Module containing a similarity engine for ingredient and recipe
+                names, which caches scores and skips scoring pairs of names
+                that can't reach a limit.
+-------------------------------------------------------------------------------
+'''
+
+import difflib
+import threading
+from typing import Callable, Dict
+
+import tregex
+
+Scorer = Callable[[str, str], float]
+
+SIMILARITY_CACHE_SIZE = 100000  # Default number of pairs of strings kept in the cache of a SimilarityEngine.
+MATCHER_CACHE_SIZE = 256  # Number of strings with a reusable SequenceMatcher, per thread.
+
+# tregex.similarity is the reference implementation of the similarity score. Scorers of a SimilarityEngine must give
+# the same scores, or declare otherwise.
+reference_similarity = tregex.similarity
+
+
+class MatcherScorer:
+    """Scores like tregex.similarity, i.e. the ratio of
+    difflib.SequenceMatcher(None, string1, string2), but reuses the matcher of
+    string2 when it is scored against many strings, as the matcher keeps the
+    positions of the characters of string2. Matchers are changed when scoring,
+    so every thread has its own."""
+
+    # tregex.similarity(a, b) can differ from tregex.similarity(b, a), as ties between matching blocks are resolved
+    # by position.
+    symmetric = False
+
+    def __init__(self, maxsize: int = MATCHER_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._local = threading.local()
+
+    def __call__(self, string1: str, string2: str) -> float:
+        matchers = getattr(self._local, 'matchers', None)
+        if matchers is None:
+            matchers = self._local.matchers = {}
+
+        matcher = matchers.get(string2)
+        if matcher is None:
+            while matchers and len(matchers) >= self.maxsize:
+                del matchers[next(iter(matchers))]
+            matcher = matchers[string2] = difflib.SequenceMatcher(None, '', string2)
+        matcher.set_seq1(string1)
+        return matcher.ratio()
+
+
+class SimilarityEngine:
+    """Similarity of pairs of strings, called like tregex.similarity.
+
+    Scores are computed by scorer (by default the same scores as
+    tregex.similarity), and kept in a bounded cache with one entry per pair
+    of strings regardless of order. If the scorer is symmetric, scoring a
+    pair in one order also gives the score in the other order. When the cache
+    is full, the oldest pairs are discarded.
+
+    score(string1, string2, limit) only scores pairs that can reach limit,
+    using bounds that hold for ratios of matching characters (see
+    upper_bound). Pairs that can't reach limit get a score of 0."""
+
+    def __init__(self, scorer: Scorer = None, maxsize: int = SIMILARITY_CACHE_SIZE, symmetric: bool = None) -> None:
+        self.scorer = scorer or MatcherScorer()
+        self.symmetric = getattr(self.scorer, 'symmetric', False) if symmetric is None else symmetric
+        self.maxsize = maxsize
+        self._data = {}  # (string1, string2) with string1 <= string2 -> [score, score in reverse order]
+        self._counts = {}  # String -> number of times each character occurs in the string.
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __call__(self, string1: str, string2: str) -> float:
+        if string1 <= string2:
+            key, order = (string1, string2), 0
+        else:
+            key, order = (string2, string1), 1
+
+        scores = self._data.get(key)
+        if scores is not None and scores[order] is not None:
+            self.hits += 1
+            return scores[order]
+
+        self.misses += 1
+        ratio = self.scorer(string1, string2)
+        if self.maxsize > 0:
+            with self._lock:
+                scores = self._data.get(key)
+                if scores is None:
+                    while len(self._data) >= self.maxsize:
+                        del self._data[next(iter(self._data))]
+                    scores = self._data[key] = [None, None]
+                scores[order] = ratio
+                if self.symmetric:
+                    scores[1 - order] = ratio
+        return ratio
+
+    def upper_bound(self, string1: str, string2: str) -> float:
+        """Return an upper bound of the score of a pair of strings. The score
+        is 2 * M / T, where M is the number of matching characters and T the
+        sum of the lengths, and M is at most the number of characters the
+        strings have in common, counting repeated characters."""
+        total = len(string1) + len(string2)
+        if total == 0:
+            return 1.0
+
+        counts1, counts2 = self._character_counts(string1), self._character_counts(string2)
+        if len(counts2) < len(counts1):
+            counts1, counts2 = counts2, counts1
+        common = sum(min(count, counts2.get(character, 0)) for character, count in counts1.items())
+        return 2.0 * common / total
+
+    def score(self, string1: str, string2: str, limit: float) -> float:
+        """Return the score of a pair of strings if it can be at least limit,
+        or else 0. Only the cheap bounds are computed for pairs that can't
+        reach limit."""
+        if string1 <= string2:
+            key, order = (string1, string2), 0
+        else:
+            key, order = (string2, string1), 1
+        scores = self._data.get(key)
+        if scores is not None and scores[order] is not None:
+            self.hits += 1
+            return scores[order]
+
+        # Bound from the lengths, as the number of common characters is at most the length of the shorter string:
+        total = len(string1) + len(string2)
+        if total and 2.0 * min(len(string1), len(string2)) / total < limit \
+                or self.upper_bound(string1, string2) < limit:
+            self.pruned += 1
+            return 0.0
+        return self(string1, string2)
+
+    def bounded(self, limit: float) -> Scorer:
+        """Return a function of two strings giving score(string1, string2, limit)."""
+        def similarity(string1: str, string2: str) -> float:
+            return self.score(string1, string2, limit)
+        return similarity
+
+    def clear(self) -> None:
+        """Remove all cached scores and reset the statistics."""
+        with self._lock:
+            self._data = {}
+            self._counts = {}
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache statistics."""
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'pruned': self.pruned,
+                'size': len(self._data),
+                'maxsize': self.maxsize}
+
+    def _character_counts(self, string: str) -> Dict[str, int]:
+        counts = self._counts.get(string)
+        if counts is None:
+            counts = {}
+            for character in string:
+                counts[character] = counts.get(character, 0) + 1
+            if self.maxsize > 0:
+                with self._lock:
+                    while len(self._counts) >= self.maxsize:
+                        del self._counts[next(iter(self._counts))]
+                    self._counts[string] = counts
+        return counts
+
+
+def bounded(similarity: Scorer, limit: float) -> Scorer:
+    """Return similarity as a function that only needs to score pairs of
+    strings reaching limit, if it is a SimilarityEngine, or else similarity
+    itself. Used where the scores of pairs below limit are not used."""
+    if isinstance(similarity, SimilarityEngine):
+        return similarity.bounded(limit)
+    return similarity
+
+
+# Engine used by default for comparing ingredient names.
+similarity_engine = SimilarityEngine()
@@ -0,0 +1,193 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          snapshot
+ Purpose:       Module containing a binary snapshot format for parsed
+                cookbooks, so that a cookbook can be loaded without parsing
+                the ingredients again.
+-------------------------------------------------------------------------------
+'''
+
+import json
+import struct
+import numpy
+from typing import Dict, List
+
+from groceries.groceries import GroceryList, Ingredient, IngredientComponent
+from groceries.parser import ParseResult
+from groceries.recipes import Recipe, Cookbook
+from groceries.units import units
+from groceries.configs.config_handler import config
+
+MAGIC = b'GROCERY\x00'
+VERSION = 1
+
+# Magic, version, config fingerprint, then offset and length of every section.
+SECTIONS = ('strings', 'string_offsets', 'numbers', 'indices', 'components', 'recipes')
+HEADER = struct.Struct('<8sI64s' + 'QQ' * len(SECTIONS))
+
+# Strings are stored as ids into the string table.
+COMPONENT_DTYPE = numpy.dtype([
+    ('string', '<u4'),  # Original ingredient string.
+    ('name', '<u4'),
+    ('dimension', '<u4'),  # Dimension of the Unit.
+    ('unit_scale', '<f8'),
+    ('scale', '<f8'),
+    ('number_start', '<u4'),  # Position of the amount in the numbers section.
+    ('number_count', '<u4'),
+    ('comment_start', '<u4'),  # Position of the comment ids in the indices section.
+    ('comment_count', '<u4'),
+    ('first', '<u1'),  # 1 if the component is the first component of an Ingredient.
+])
+
+RECIPE_DTYPE = numpy.dtype([
+    ('name', '<u4'),
+    ('tag_start', '<u4'),  # Position of the tag ids in the indices section.
+    ('tag_count', '<u4'),
+    ('time', '<u4'),  # JSON of the time and servings, which can be numbers, strings or None.
+    ('serves', '<u4'),
+    ('how_to', '<u4'),
+    ('component_start', '<u4'),
+    ('component_count', '<u4'),
+])
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot can't be used, i.e. when it is made with other configs."""
+
+
+class _StringTable:
+    """Collects unique strings and gives each an id."""
+
+    def __init__(self) -> None:
+        self.ids = {}
+
+    def __call__(self, string: str) -> int:
+        if string not in self.ids:
+            self.ids[string] = len(self.ids)
+        return self.ids[string]
+
+
+def save_snapshot(cookbook: Cookbook, filename: str) -> None:
+    """Save the recipes of a cookbook, with all ingredients parsed, to a
+    binary snapshot file."""
+    strings = _StringTable()
+    numbers, indices, components, recipes = [], [], [], []
+
+    for recipe in cookbook.recipes.values():
+        component_start = len(components)
+        for ing in recipe.ingredients.ingredient_list:
+            for i, component in enumerate(ing.components):
+                comments = [strings(comment) for comment in component.comments]
+                components += [(strings(component.original_string), strings(component.name),
+                                strings(component.unit.dimension), component.unit_scale, component.scale,
+                                len(numbers), component.number.size, len(indices), len(comments), i == 0)]
+                numbers += component.number.tolist()
+                indices += comments
+
+        tags = [strings(tag) for tag in recipe.tags]
+        recipes += [(strings(recipe.name), len(indices), len(tags), strings(json.dumps(recipe.time)),
+                     strings(json.dumps(recipe.serves)), strings(recipe.how_to or ''), component_start,
+                     len(components) - component_start)]
+        indices += tags
+
+    text = ''.join(strings.ids)
+    string_offsets = numpy.cumsum([0] + [len(string) for string in strings.ids], dtype='<u8')
+
+    sections = [text.encode('utf-8'),
+                string_offsets.tobytes(),
+                numpy.array(numbers, dtype='<f8').tobytes(),
+                numpy.array(indices, dtype='<u4').tobytes(),
+                numpy.array(components, dtype=COMPONENT_DTYPE).tobytes(),
+                numpy.array(recipes, dtype=RECIPE_DTYPE).tobytes()]
+
+    # Sections are aligned to 8 bytes, so they can be read as numpy arrays directly from the file.
+    table = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % 8
+        table += [position, len(section)]
+        position += len(section)
+
+    with open(filename, 'wb') as fid:
+        fid.write(HEADER.pack(MAGIC, VERSION, config.fingerprint().encode('ascii'), *table))
+        for offset, section in zip(table[::2], sections):
+            fid.write(b'\x00' * (offset - fid.tell()))
+            fid.write(section)
+
+
+def load_snapshot(filename: str) -> Cookbook:
+    """Load a Cookbook from a snapshot file. Raises SnapshotError if the
+    snapshot was made with another version of the format, or with other
+    configs than the active configs."""
+    # All recipes are created up front, so the whole file is read at once:
+    with open(filename, 'rb') as fid:
+        data = fid.read()
+
+    if len(data) < HEADER.size:
+        raise SnapshotError('%s is not a cookbook snapshot.' % filename)
+
+    header = HEADER.unpack_from(data)
+    magic, version, fingerprint, table = header[0], header[1], header[2], header[3:]
+    if magic != MAGIC:
+        raise SnapshotError('%s is not a cookbook snapshot.' % filename)
+    if version != VERSION:
+        raise SnapshotError('Snapshot version %d is not supported (expected %d).' % (version, VERSION))
+    if fingerprint.decode('ascii') != config.fingerprint():
+        raise SnapshotError('Snapshot was made with other configs than the active configs.')
+
+    sections = {name: (offset, length) for name, offset, length in zip(SECTIONS, table[::2], table[1::2])}
+    return Cookbook(_read_recipes(data, sections))
+
+
+def _read_recipes(data: bytes, sections: Dict[str, tuple]) -> List[Recipe]:
+    """Create the recipes of a snapshot from the sections of the file."""
+    def array(name: str, dtype: object) -> numpy.ndarray:
+        offset, length = sections[name]
+        dtype = numpy.dtype(dtype)
+        # Each section is decoded with a single numpy call, and converted to a list, which is faster to index.
+        return numpy.frombuffer(data, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    offset, length = sections['strings']
+    text = data[offset:offset + length].decode('utf-8')
+    string_offsets = array('string_offsets', '<u8').tolist()
+    strings = [text[start:end] for start, end in zip(string_offsets[:-1], string_offsets[1:])]
+
+    numbers = array('numbers', '<f8').tolist()
+    indices = array('indices', '<u4').tolist()
+    components = array('components', COMPONENT_DTYPE).tolist()
+    dimensions = {}
+    values = {}  # String id -> decoded JSON value of time and servings.
+
+    def value(string_id: int) -> object:
+        if string_id not in values:
+            values[string_id] = json.loads(strings[string_id])
+        return values[string_id]
+
+    recipes = []
+    for name, tag_start, tag_count, time, serves, how_to, component_start, component_count in \
+            array('recipes', RECIPE_DTYPE).tolist():
+        recipe = Recipe(name=strings[name], tags=[strings[i] for i in indices[tag_start:tag_start + tag_count]],
+                        time=value(time), serves=value(serves), how_to=strings[how_to])
+
+        ingredients = []
+        for (string, component_name, dimension, unit_scale, scale, number_start, number_count, comment_start,
+             comment_count, first) in components[component_start:component_start + component_count]:
+            if dimension not in dimensions:
+                dimensions[dimension] = units.get(strings[dimension])
+
+            parsed = ParseResult(tuple(numbers[number_start:number_start + number_count]), dimensions[dimension],
+                                 unit_scale, tuple(strings[i] for i in indices[comment_start:comment_start + comment_count]),
+                                 strings[component_name])
+            component = IngredientComponent(strings[string], recipe, parsed=parsed)
+            if scale != 1:
+                component = component.scaled(scale)
+
+            if first:
+                ingredients += [Ingredient(component)]
+            else:
+                ingredients[-1].combine_with_ingredient(Ingredient(component))
+
+        recipe.ingredients = GroceryList(ingredients)
+        recipes += [recipe]
+
+    return recipes
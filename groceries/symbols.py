@@ -0,0 +1,75 @@
+'''
+-------------------------------------------------------------------------------
+ Name:          symbols
+ Purpose:       Module containing process-wide symbol tables, giving ingredient
+                names and unit dimensions small integer ids, so that
+                ingredients can be collated and compared on integer keys.
+-------------------------------------------------------------------------------
+'''
+
+import sys
+import threading
+from typing import List, Tuple
+
+# Ingredient keys are name id * DIMENSION_LIMIT + dimension id, so there can be at most this many dimensions.
+DIMENSION_LIMIT = 1 << 16
+
+
+class SymbolTable:
+    """Table of interned strings (symbols), each with an integer id. Ids are
+    given in the order the symbols are first seen, starting at 0, and are
+    never reused. Ids are only valid within the process, and must not be
+    stored."""
+
+    def __init__(self, limit: int = None) -> None:
+        self.limit = limit
+        self._ids = {}
+        self._symbols = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._ids
+
+    def id(self, symbol: str) -> int:
+        """Return the id of a symbol, adding the symbol to the table if needed."""
+        try:
+            return self._ids[symbol]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if symbol not in self._ids:
+                if self.limit is not None and len(self._symbols) >= self.limit:
+                    raise OverflowError('Symbol table is full (%d symbols).' % self.limit)
+                symbol = sys.intern(symbol)
+                self._ids[symbol] = len(self._symbols)
+                self._symbols += [symbol]
+            return self._ids[symbol]
+
+    def symbol(self, symbol_id: int) -> str:
+        """Return the symbol with an id."""
+        return self._symbols[symbol_id]
+
+    @property
+    def symbols(self) -> List[str]:
+        """All symbols, in the order of their ids."""
+        return list(self._symbols)
+
+
+names = SymbolTable()  # Ingredient names.
+dimensions = SymbolTable(DIMENSION_LIMIT)  # Unit dimensions.
+
+
+def ingredient_key(name: str, dimension: str) -> int:
+    """Return the integer key of the ingredients with a name and a unit
+    dimension, which can be combined when collating (see Ingredient.key)."""
+    return names.id(name) * DIMENSION_LIMIT + dimensions.id(dimension)
+
+
+def split_key(key: int) -> Tuple[str, str]:
+    """Return the name and dimension of an ingredient key."""
+    name_id, dimension_id = divmod(key, DIMENSION_LIMIT)
+    return names.symbol(name_id), dimensions.symbol(dimension_id)
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from groceries import aio, Cookbook, GroceryList
+from groceries.test.bin import cookbook_reader
+
+MENU_TEXTS = ['Mandag: fisk\nTirsdag:\nOnsdag: kjøtt x2\n2 dl melk\n%d egg' % i for i in range(1, 11)]
+
+
+def test_parse_menu():
+    expected = Cookbook(cookbook_reader.recipes).parse_menu(MENU_TEXTS[0], seed=3)
+    for options in [{'chunk_size': 1}, {'chunk_size': 100}, {'offload': False}]:
+        cookbook = Cookbook(cookbook_reader.recipes)
+        menu = asyncio.run(aio.parse_menu(cookbook, MENU_TEXTS[0], seed=3, **options))
+        assert menu.generate_processed_menu_str() == expected.generate_processed_menu_str()
+        assert str(menu.groceries) == str(expected.groceries)
+        assert sorted(cookbook.available_recipes) == sorted(expected.cookbook.available_recipes)
+
+
+def test_parse_menus_and_grocery_lists():
+    cookbook = Cookbook(cookbook_reader.recipes)
+    seeds = list(range(len(MENU_TEXTS)))
+    expected = cookbook.parse_menus(MENU_TEXTS, seeds)
+    menus = asyncio.run(aio.parse_menus(cookbook, MENU_TEXTS, seeds, chunk_size=2, concurrency=3))
+    assert [menu.generate_processed_menu_str() for menu in menus] == \
+        [menu.generate_processed_menu_str() for menu in expected]
+    assert [str(menu.groceries) for menu in menus] == [str(menu.groceries) for menu in expected]
+
+    ingredient_lists = [['2 dl melk', '1 l melk', '%d egg' % i] for i in range(1, 6)]
+    lists = asyncio.run(aio.grocery_lists(ingredient_lists, chunk_size=2, columnar=True))
+    assert [grocery_list.ingredients_formatted() for grocery_list in lists] == \
+        [GroceryList(ingredients).ingredients_formatted() for ingredients in ingredient_lists]
+    assert all(grocery_list.columnar for grocery_list in lists)
+
+
+def test_event_loop_is_not_blocked():
+    async def main():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        await aio.grocery_list(['%d g ingredient %d' % (i, i) for i in range(1, 200)], chunk_size=4)
+        task.cancel()
+        return ticks
+
+    assert len(asyncio.run(main())) > 10
+
+
+def test_timeout_and_cancellation():
+    menu_text = '\n'.join('%d dl ingredient %d' % (i, i) for i in range(1, 1000))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(aio.parse_menu(Cookbook(cookbook_reader.recipes), menu_text, chunk_size=1, timeout=0.001))
+
+    async def cancelled():
+        task = asyncio.ensure_future(aio.parse_menus(Cookbook(cookbook_reader.recipes), [menu_text] * 4))
+        await asyncio.sleep(0.001)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancelled())
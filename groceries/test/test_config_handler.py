@@ -31,4 +31,5 @@ def test_change_unit_formatting():
 
         assert str(Ingredient('2 lb butter')) == '907.18 g butter'
     finally:
-        config.set_config(old_config)
\ No newline at end of file
+        config.set_config(old_config)
+        units.units.reload_units()
\ No newline at end of file
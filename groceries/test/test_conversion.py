@@ -0,0 +1,45 @@
+import pytest
+
+from groceries import GroceryList, Ingredient
+from groceries.configs.config_handler import config
+from groceries.configs.config_types import DensityTable
+from groceries.conversion import conversions
+from groceries.symbols import ingredient_key
+
+
+@pytest.mark.parametrize('options', [{}, {'columnar': True}, {'indexed': False}])
+def test_collate_across_dimensions(options):
+    grocery_list = GroceryList(['200 g flour', '3 dl flour', '2 eggs', '60 g eggs', '1 kiwi', 'salt'],
+                               convert=True, **options)
+    amounts = grocery_list.amounts()
+    assert set(amounts) == {'flour_mass', 'eggs_mass', 'kiwi_none', 'salt_none'}
+    assert amounts['flour_mass'] == pytest.approx([365])
+    assert amounts['eggs_mass'] == pytest.approx([180])
+    assert grocery_list.ingredients_formatted() == ['365 g flour', '180 g eggs', '1 kiwi', 'salt']
+
+    # The list itself is not converted, and lists made from it convert too:
+    assert len(grocery_list.ingredient_list) == 6
+    assert set((grocery_list * 2).amounts()) == set(amounts)
+    assert len(GroceryList(grocery_list.ingredient_list).amounts()) == 6
+
+
+def test_contains_across_dimensions():
+    flour = Ingredient('3 dl flour')
+    assert GroceryList(['500 g flour'], convert=True).contains(flour)
+    assert not GroceryList(['100 g flour'], convert=True).contains(flour)
+    assert not GroceryList(['500 g flour']).contains(flour, verbose=True)['result']
+
+
+def test_conversion_follows_config():
+    key = ingredient_key('flour', 'volume')
+    assert conversions.convert_key(key) == (ingredient_key('flour', 'mass'), 550.0)
+    assert conversions.convert_key(ingredient_key('gravel', 'volume')) is None
+
+    old_table = config.density_table
+    try:
+        config.set_config(DensityTable(densities={'Gravel': 1600}, piece_weights={}))
+        assert conversions.convert_key(key) is None
+        assert GroceryList(['1 l gravel', '400 g gravel'], convert=True).amounts()['gravel_mass'] == [2000]
+    finally:
+        config.set_config(old_table)
+    assert conversions.convert_key(key) is not None
@@ -8,10 +8,12 @@
 # Copyright:   (c) Tobias 2015
 # Licence:     <your licence>
 # -------------------------------------------------------------------------------
+import pickle
 import pytest
 import numpy
 
 from groceries import groceries
+from groceries import recipes
 
 INGREDIENT_PARSING_EXAMPLES = [
     u'ca. 1/2 gram safran, finhakket',
@@ -128,6 +130,17 @@ def test_ingredient_component_matching(candidate, amount, dimension, amount_str,
     assert ing.comments == comments
 
 
+def test_ingredient_component_is_read_only():
+    component = groceries.IngredientComponent('2 dl melk (lett)')
+    for name in ['scale', 'recipe', 'number', 'unit', 'unit_scale', 'comments', 'name', 'original_string']:
+        with pytest.raises(AttributeError):
+            setattr(component, name, getattr(component, name))
+
+    subtracted = component.scaled(-1)
+    assert subtracted.scale == -1 and component.scale == 1
+    assert pickle.loads(pickle.dumps(subtracted)).amount() == pytest.approx(-0.2)
+
+
 def test_ingredient():
     candidate_list = [
         u'ca. 1/2 rød chili,  finhakket',
@@ -303,3 +316,135 @@ def test_grocerylist_compare_with():
 def test_grocerylist_components():
     gl = groceries.GroceryList(['something', '4 weird things', '12 foo'])
     assert gl.components()
+
+
+def test_grocerylist_indexed_matches_unindexed():
+    lists = []
+    for indexed in [True, False]:
+        grocery_list = groceries.GroceryList(INGREDIENT_PARSING_EXAMPLES, indexed=indexed)
+        grocery_list += groceries.GroceryList(['tyttebær', '10 m skolisser', '5 cm skolisser'])
+        grocery_list -= groceries.GroceryList(INGREDIENTS_IN_CUPBOARD)
+        grocery_list.subtract_ingredients('2/3 løk')
+        grocery_list *= 2
+        lists += [grocery_list]
+
+    indexed_list, unindexed_list = lists
+    assert indexed_list.ingredients_formatted(sort='alphabetical') == \
+        unindexed_list.ingredients_formatted(sort='alphabetical')
+    assert indexed_list.components() == unindexed_list.components()
+
+
+def test_grocerylist_columnar_matches_objects():
+    results = []
+    for columnar in [True, False]:
+        steps = []
+        grocery_list = groceries.GroceryList(INGREDIENT_PARSING_EXAMPLES, columnar=columnar)
+        steps += [grocery_list.ingredients_formatted(sort='numerical')]
+        grocery_list += groceries.GroceryList(['tyttebær', '10 m skolisser', '5 cm skolisser'], columnar=columnar)
+        steps += [grocery_list.ingredients_formatted(sort='numerical')]
+        grocery_list -= groceries.GroceryList(INGREDIENTS_IN_CUPBOARD, columnar=columnar)
+        steps += [grocery_list.ingredients_formatted(sort='alphabetical')]
+        grocery_list *= 2
+        steps += [grocery_list.ingredients_formatted(sort='alphabetical')]
+        grocery_list += grocery_list
+        grocery_list *= 0.5
+        steps += [grocery_list.ingredients_formatted(sort='numerical')]
+        multiplied = grocery_list * 3
+        steps += [multiplied.ingredients_formatted(sort='numerical'), multiplied.components()]
+        steps += [{k: list(v) for k, v in multiplied.amounts().items()}]
+        results += [steps]
+
+    assert results[0] == results[1]
+
+
+def test_grocerylist_collated_amounts_are_cached(monkeypatch):
+    grocery_list = groceries.GroceryList(['2 dl melk', '3 gulrøtter', '1 dl melk'])
+    read = []
+    from_ingredients = groceries.ComponentColumns.from_ingredients
+
+    def reading(ingredients):
+        read.extend(ing.name for ing in ingredients)
+        return from_ingredients(ingredients)
+    monkeypatch.setattr(groceries.ComponentColumns, 'from_ingredients', reading)
+
+    assert grocery_list.ingredients_formatted(sort='numerical') == ['3 gulrøtter', '3.00 dl melk']
+    grocery_list.amounts()[grocery_list.ingredients()[0].id][0] = 100  # The amounts returned are copies.
+    assert grocery_list.ingredients_formatted(sort='alphabetical') == ['3 gulrøtter', '3.00 dl melk']
+    assert sorted(read) == ['gulrøtter', 'melk']
+
+    # Only the ingredients changed since the last read are summed again:
+    read.clear()
+    grocery_list.add_ingredients('2 gulrøtter')
+    assert grocery_list.ingredients_formatted(sort='alphabetical') == ['5 gulrøtter', '3.00 dl melk']
+    assert read == ['gulrøtter']
+    grocery_list *= 2
+    assert grocery_list.ingredients_formatted(sort='alphabetical') == ['10 gulrøtter', '6.00 dl melk']
+    read.clear()
+    grocery_list -= groceries.GroceryList('6 dl melk')
+    assert grocery_list.ingredients_formatted(sort='alphabetical') == ['10 gulrøtter']
+    assert read == ['melk']
+    grocery_list.add_ingredients('1 dl melk')
+    assert grocery_list.ingredients_formatted(sort='alphabetical') == ['10 gulrøtter', '1 dl melk']
+    grocery_list.set_recipe(recipes.Recipe(name='middag', ingredients=[]))
+    assert all(component['recipe'] == 'middag' for ing in grocery_list.components() for component in ing['components'])
+
+
+def test_grocerylist_ingredients_are_not_copied():
+    grocery_list = groceries.GroceryList(['2 dl melk', '3 gulrøtter', '1 dl melk'])
+    ingredients = grocery_list.ingredients()
+    assert isinstance(ingredients, tuple)
+    assert grocery_list.ingredients() is ingredients
+    assert [ing.name for ing in grocery_list.ingredients(sort='alphabetical')] == ['gulrøtter', 'melk']
+
+    copies = grocery_list.ingredients(copy=True)
+    assert all(copy is not ing for copy, ing in zip(copies, ingredients))
+    copies[1].scale_ingredient_amount(10)
+    assert grocery_list.ingredients_formatted() == ['3.00 dl melk', '3 gulrøtter']
+
+    grocery_list.add_ingredients('1 dl melk')
+    assert grocery_list.ingredients() is ingredients  # The same ingredients are collated.
+    grocery_list.add_ingredients('salt')
+    assert grocery_list.ingredients() is not ingredients
+
+
+def test_grocerylist_copy_on_write():
+    original = groceries.GroceryList(['2 dl melk', '3 gulrøtter (store)'])
+    formatted = original.ingredients_formatted(sort='alphabetical', include_comments=True)
+
+    combined = original + original
+    combined *= 3
+    combined -= original
+    recipe = recipes.Recipe(name='middag', ingredients=[])
+    combined.set_recipe(recipe)
+
+    # The copies share components with the original until they are modified:
+    copied = original.copy()
+    assert copied.ingredient_list[0]._components is original.ingredient_list[0]._components
+
+    assert original.ingredients_formatted(sort='alphabetical', include_comments=True) == formatted
+    assert all(component.recipe is None for ing in original.ingredient_list for component in ing.components)
+    assert combined.ingredients_formatted(sort='alphabetical') == ['15 gulrøtter', '1.00 l melk']
+    assert all(component['recipe'] == 'middag' for ing in combined.components() for component in ing['components'])
+
+
+def test_import_is_lazy():
+    # Importing the package does not import the package API, numpy or tregex until they are used:
+    import sys
+    import subprocess
+    code = ('import sys, groceries\n'
+            'assert "numpy" not in sys.modules and "groceries.groceries" not in sys.modules\n'
+            'assert str(groceries.Ingredient("2 dl melk")) == "2 dl melk"\n'
+            'assert groceries.config is groceries.configs.config_handler.config\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_compact_ingredients():
+    ing = groceries.Ingredient('2 dl melk (lett)')
+    component = ing.components[0]
+    assert not hasattr(ing, '__dict__') and not hasattr(component, '__dict__')
+    assert component.number.tolist() == [2.0] and component.comments == ['lett']
+    assert ing.id == 'melk_volume'
+    assert groceries.Ingredient('1 l melk').name is ing.name  # Names are interned.
+
+    copy = pickle.loads(pickle.dumps(ing))
+    assert copy.dict() == ing.dict()
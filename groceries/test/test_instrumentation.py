@@ -0,0 +1,50 @@
+import json
+
+from groceries.instrumentation import Instrumentation, instrumentation
+from groceries import Ingredient, GroceryList
+from groceries.parser import parser
+
+
+def test_disabled_instrumentation_records_nothing():
+    timings = Instrumentation()
+    function = timings.timed('stage')(lambda x: x + 1)
+    assert function(1) == 2
+    with timings.timer('block'):
+        pass
+    assert timings.wrap('similarity', len) is len
+    assert timings.stats() == {}
+
+
+def test_timings_and_export():
+    timings = Instrumentation()
+    function = timings.timed('stage')(lambda x: x + 1)
+    with timings.recording():
+        for i in range(3):
+            function(i)
+        with timings.timer('block'):
+            pass
+    assert not timings.enabled
+
+    stats = timings.stats()
+    assert set(stats) == {'stage', 'block'}
+    assert stats['stage']['count'] == 3
+    assert sum(count for bound, count in stats['stage']['histogram']) == 3
+    assert json.loads(timings.to_json())['stages']['stage']['count'] == 3
+
+    text = timings.to_prometheus()
+    assert '# TYPE groceries_stage_seconds histogram' in text
+    assert 'groceries_stage_seconds_bucket{stage="stage",le="+Inf"} 3' in text
+    assert 'groceries_stage_seconds_count{stage="block"} 1' in text
+
+
+def test_stages_of_groceries():
+    parser.cache.clear()  # Cached ingredients are not parsed again.
+    with instrumentation.recording():
+        grocery_list = GroceryList(['2 dl milk (fresh)', '1 banana', '1 l milk'])
+        grocery_list.ingredients_formatted()
+        grocery_list.contains(Ingredient('1 dl milk'))
+
+    stats = instrumentation.stats()
+    for stage in ('parse.amount', 'parse.unit', 'parse.comments', 'units.match', 'collate', 'similarity', 'format'):
+        assert stats[stage]['count'] > 0, stage
+    instrumentation.reset()
@@ -0,0 +1,142 @@
+"""Tests for the lazy cookbook loader."""
+import pytest
+import yaml
+
+from groceries import recipes
+from groceries.loader import read_recipes, load_cookbook, map_fields, LazyRecipe
+from groceries.test.bin import cookbook_reader
+
+LAZY_COOKBOOK = '''Grøt:
+    kategorier: frokost, rask
+    oppskrift: Kok opp.
+    antall personer i oppskrift: 2
+    ingredienser:
+        -   2 dl havregryn
+        -   4 dl melk
+# A comment at the start of a line.
+"Pasta: med saus":
+    kategorier: [pasta, middag]
+    ingredienser:
+        -   200 g pasta
+---
+Toast:
+    tags: frokost # Bread.
+    ingredients:
+        -   2 skiver brød
+...
+'''
+
+
+def test_read_recipes_matches_yaml():
+    with open(cookbook_reader.filename, encoding='utf-8-sig') as fid:
+        cookbook_file = yaml.load(fid, Loader=yaml.BaseLoader)
+
+    lazy_recipes = list(read_recipes(cookbook_reader.filename))
+    assert [recipe.name for recipe in lazy_recipes] == list(cookbook_file)
+
+    for recipe in lazy_recipes:
+        assert not recipe.loaded
+        fields = map_fields(cookbook_file[recipe.name])
+        assert recipe.tags == fields['tags']
+        assert recipe.how_to == fields['how_to']
+        assert recipe.loaded
+        assert recipe.serves == fields['serves']
+        assert recipe.ingredients.ingredients_formatted() == \
+            recipes.Recipe(**fields).ingredients.ingredients_formatted()
+
+
+def test_load_cookbook_is_lazy(tmpdir):
+    filename = tmpdir.join('cookbook.yaml')
+    filename.write_text(LAZY_COOKBOOK, encoding='utf-8')
+
+    cookbook = load_cookbook(str(filename))
+    assert list(cookbook.recipes) == ['Grøt', 'Pasta: med saus', 'Toast']
+    assert cookbook.recipes['Pasta: med saus'].tags == ['pasta', 'middag']
+    assert cookbook.recipes['Toast'].tags == ['frokost']
+    assert all(isinstance(recipe, LazyRecipe) and not recipe.loaded for recipe in cookbook.recipes.values())
+
+    # Searching by name or tag does not parse the recipes:
+    assert cookbook.find_recipe('grøt', make_unavailable=False).name == 'Grøt'
+    assert cookbook.find_recipe('middag').name == 'Pasta: med saus'
+    assert not any(recipe.loaded for recipe in cookbook.recipes.values())
+
+    menu = cookbook.parse_menu('mandag: grøt')
+    assert menu.groceries.ingredients_formatted(sort='alphabetical') == ['2 dl havregryn', '4 dl melk']
+    assert cookbook.recipes['Grøt'].loaded
+    assert not cookbook.recipes['Toast'].loaded
+
+    # Searching with groceries parses all recipes:
+    assert cookbook.find_recipe_with_groceries(cookbook.recipes['Toast'].ingredients, best=True).name == 'Toast'
+    assert all(recipe.loaded for recipe in cookbook.recipes.values())
+
+
+def test_read_recipes_falls_back_to_yaml(tmpdir):
+    filename = tmpdir.join('cookbook.yaml')
+    filename.write_text('''Suppe:
+    kategorier:
+        -   suppe
+        -   middag
+    ingredienser:
+        -   1 l buljong
+''', encoding='utf-8')
+
+    recipe, = read_recipes(str(filename))
+    assert recipe.tags == ['suppe', 'middag']
+    assert recipe.ingredients.ingredients_formatted() == ['1 l buljong']
+
+
+def test_tag_key_in_recipe_body(tmpdir):
+    filename = tmpdir.join('cookbook.yaml')
+    filename.write_text('''Pannekaker:
+    oppskrift: |
+        Bland alt.
+        kategorier: ikke en tag
+    kategorier: dessert, søtt
+    ingredienser:
+        -   3 egg
+Vafler:
+    oppskrift: |
+        kategorier: heller ikke en tag
+    ingredienser:
+        -   2 egg
+''', encoding='utf-8')
+
+    cookbook = load_cookbook(str(filename))
+    assert cookbook.recipes['Pannekaker'].tags == ['dessert', 'søtt']
+    assert cookbook.recipes['Vafler'].tags == []
+    assert sorted(cookbook.tags) == ['dessert', 'søtt']
+    assert cookbook.recipes['Pannekaker'].how_to == 'Bland alt.\nkategorier: ikke en tag\n'
+
+
+def test_tags_are_updated_when_loaded(tmpdir):
+    filename = tmpdir.join('cookbook.yaml')
+    # With a repeated key YAML keeps the last value, but the scan reads the first:
+    filename.write_text('''Grøt:
+    kategorier: lunsj
+    kategorier: frokost
+    ingredienser:
+        -   2 dl havregryn
+Suppe:
+    kategorier: middag
+''', encoding='utf-8')
+    cookbook = load_cookbook(str(filename))
+    recipe = cookbook.recipes['Grøt']
+    assert recipe.tags == ['lunsj'] and 'lunsj' in cookbook.tags
+
+    cookbook.make_recipe_unavailable(cookbook.recipes['Suppe'])
+    recipe.load()
+    assert recipe.tags == ['frokost']
+    assert sorted(cookbook.tags) == ['frokost', 'middag']
+    assert list(cookbook.available_tags['frokost']) == ['Grøt']
+    assert cookbook.find_recipe('frokost', make_unavailable=False) is recipe
+
+
+def test_errors_are_not_hidden_by_the_file_map(tmpdir):
+    filename = tmpdir.join('cookbook.yaml')
+    filename.write_text('''"Grøt: [
+  kategorier: frokost
+Suppe:
+  kategorier: middag
+''', encoding='utf-8')
+    with pytest.raises(yaml.YAMLError):
+        list(read_recipes(str(filename)))
@@ -0,0 +1,44 @@
+from groceries import GroceryList, Ingredient
+from groceries.pantry import Pantry
+
+
+def test_pantry_match_like_contains():
+    items = ['1 l milk', 'salt', '500 g flour', '200 g butter', '2 dl cream', '1 kg sugar']
+    pantry = Pantry(items)
+    grocery_list = GroceryList(items)
+    for string in ['2 dl milk', '2 l milk', 'salt', '1 tsp salt', '100 g flours', '1 dl butter', 'banana', 'crem']:
+        ingredient = Ingredient(string)
+        match = pantry.match(ingredient)
+        expected = grocery_list.contains(ingredient, verbose=True)['result']
+        assert (match is not None) == expected, string
+
+
+def test_subtract_pantry():
+    pantry = Pantry(['1 l milk', 'salt', '500 g flour', '200 g butter'])
+    groceries = GroceryList(['3 dl milk', '2 dl milk', '1 tsp salt', '1 kg flour', '1 dl butter', '2 bananas'])
+
+    new_list, report = pantry.subtract(groceries)
+    amounts = new_list.amounts()
+    assert set(amounts) == {'flour_mass', 'butter_volume', 'bananas_none'}
+    assert amounts['flour_mass'] == [500]
+
+    used = {entry['pantry']: entry for entry in report}
+    assert set(used) == {'milk', 'salt', 'flour'}
+    assert used['milk']['covered'] and abs(used['milk']['amount'] - 0.5) < 1e-9
+    assert used['salt']['amount'] is None
+    assert not used['flour']['covered'] and used['flour']['amount'] == 500
+
+    # The grocery list is not changed, and the pantry can be used again:
+    assert len(groceries.ingredients()) == 5
+    assert pantry.subtract(groceries)[1] == report
+
+
+def test_subtract_uses_up_pantry_items():
+    pantry = Pantry(['3 dl milk'])
+    new_list, report = pantry.subtract(GroceryList(['1 l milk']))
+    assert abs(new_list.amounts()['milk_volume'][0] - 0.7) < 1e-9
+    assert not report[0]['covered']
+
+    new_list, report = pantry.subtract(GroceryList(['1 l milk']), amount=False)
+    assert new_list.amounts() == {}
+    assert report[0]['covered'] and report[0]['amount'] is None
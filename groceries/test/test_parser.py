@@ -0,0 +1,88 @@
+"""Tests for the ingredient string parser."""
+import numpy
+
+from groceries.configs.config_handler import config
+from groceries.configs.language.english import language as english
+from groceries.configs.language.norwegian import language as norwegian
+from groceries.parser import IngredientParser
+from groceries import groceries
+
+
+def test_parser_parse():
+    parser = IngredientParser()
+
+    number, unit, unit_scale, comments, name = parser.parse('ca. 1 1/2 teskjeer soyasaus (lys), eller tamari')
+
+    assert numpy.all(number == numpy.array([1.5]))
+    assert unit.dimension == 'volume'
+    assert unit_scale == 0.005
+    assert comments == ['lys', 'eller tamari']
+    assert name == 'soyasaus'
+
+
+def test_parser_recompiles_on_config_change():
+    parser = IngredientParser()
+    revision = parser.revision
+
+    try:
+        config.set_config(norwegian)
+        # Norwegian approximation prefix is not part of the english configs:
+        number, unit, unit_scale, comments, name = parser.parse('omtrent 2 dl melk')
+        assert parser.revision != revision
+        assert numpy.all(number == numpy.array([2]))
+        assert name == 'melk'
+
+        assert groceries.IngredientComponent('omtrent 2 dl melk').name == 'melk'
+    finally:
+        config.set_config(english)
+
+    assert parser.parse('omtrent 2 dl melk')[4] == 'omtrent 2 dl melk'
+
+
+def test_parse_cache():
+    parser = IngredientParser(cache_size=2)
+
+    first = parser.parse_cached('1 ts salt')
+    assert parser.parse_cached('  1 ts salt ') is first
+    assert parser.cache.stats()['hits'] == 1
+    assert parser.cache.stats()['misses'] == 1
+
+    parser.parse_cached('2 fedd hvitløk')
+    parser.parse_cached('1 boks mais')
+    assert parser.cache.stats()['evictions'] == 1
+    assert parser.cache.stats()['size'] == 2
+
+    # Components built from the same cached result do not share mutable data:
+    component1 = groceries.IngredientComponent('2 fedd hvitløk, knust')
+    component2 = groceries.IngredientComponent('2 fedd hvitløk, knust')
+    component1.comments.append('finhakket')
+    assert component2.comments == ['knust']
+    assert component1.number is not component2.number
+
+
+def test_parse_batch():
+    lines = ['2 dl melk', '1 1/2 ts salt (fint)', '2 dl melk', '3 fedd hvitløk, knust', 'tyttebær']
+    parser = IngredientParser()
+
+    sequential = parser.parse_batch(lines)
+    assert sequential == [parser.parse_cached(line) for line in lines]
+
+    try:
+        config.set_config(norwegian)
+        norwegian_parser = IngredientParser(cache_size=0)
+        parallel = norwegian_parser.parse_batch(['omtrent 2 dl melk'] + lines, workers=2, chunksize=2)
+    finally:
+        config.set_config(english)
+
+    assert parallel[1:] == sequential
+    assert parallel[0].name == 'melk'
+    assert parallel[0].unit is parallel[1].unit
+
+
+def test_parse_ingredients():
+    lines = ['2 dl melk', '1 1/2 ts salt (fint)', '3 fedd hvitløk, knust']
+    ingredients = groceries.parse_ingredients(lines, workers=2)
+
+    assert [ing.ingredient_formatted(include_comments=True) for ing in ingredients] == \
+        [groceries.Ingredient(line).ingredient_formatted(include_comments=True) for line in lines]
+    assert groceries.GroceryList(ingredients).ingredients_formatted() == groceries.GroceryList(lines).ingredients_formatted()
@@ -8,6 +8,7 @@
 # Copyright:   (c) Tobias 2015
 # Licence:     <your licence>
 # -------------------------------------------------------------------------------
+import random
 import unittest
 
 from groceries import recipes, groceries
@@ -399,6 +400,22 @@ def test_Cookbook_recipe_search_with_grocery_list():
     assert fasit == response
 
 
+def test_Cookbook_recipe_search_with_grocery_list_scores_all_matches():
+    cookbook = recipes.Cookbook(cookbook_reader.recipes)
+    items = groceries.GroceryList(['300 g kjøttdeig', 'løk', 'avokado', 'mais', '1 boks hakkede tomater'])
+
+    # Recipes not found through the ingredient index all have a score of zero:
+    expected = []
+    for name in cookbook.available_recipes:
+        score_matrix = cookbook.recipes[name].ingredients.compare_with(items, verbose=True)
+        score = sum([score for name_, score, check, name_score, amount_score in score_matrix]) / len(score_matrix)
+        if score > 0:
+            expected += [(score, name)]
+
+    response = cookbook.find_recipe_with_groceries(items, verbose=True)
+    assert [(score, name) for name, score, score_matrix in response] == sorted(expected)
+
+
 def test_Cookbook_recipe_regular_search():
     cookbook = recipes.Cookbook(cookbook_reader.recipes)  # cookbookcookbookcookbookcookbookcookbook
 
@@ -424,6 +441,20 @@ def test_Cookbook_recipe_regular_search():
         assert isinstance(recipe, recipes.Recipe)
 
 
+def test_Cookbook_add_and_remove_recipe():
+    cookbook = recipes.Cookbook([Recipe(**RECIPE_EXAMPLE_1)])
+    assert cookbook.find_recipe('chili con karne', make_unavailable=False).name == 'Chili con Carne'
+    assert cookbook.find_recipe('tacoparty', make_unavailable=False) is None
+
+    cookbook.add_recipe(Recipe(**RECIPE_EXAMPLE_2))
+    assert cookbook.find_recipe('tacoparti', make_unavailable=False).name == RECIPE_EXAMPLE_2['name']
+    assert cookbook.find_recipe(RECIPE_EXAMPLE_2['tags'][0]).name in cookbook.recipes
+
+    cookbook.remove_recipe('Chili con Carne')
+    assert cookbook.find_recipe('chili con karne', make_unavailable=False) is None
+    assert 'Chili con Carne' not in cookbook.available_recipes
+
+
 def test_menu():
 
     recipe1 = Recipe(
@@ -473,3 +504,51 @@ Wednesday: Carbonara for 2
     print(menu.groceries)
 
     print(menu.recipes)
+
+
+def test_Cookbook_sessions_and_parse_menus():
+    cookbook = Cookbook(cookbook_reader.recipes)
+    cookbook.make_recipe_unavailable(cookbook.find_recipe('fisk'))
+    available = sorted(cookbook.available_recipes)
+
+    menu_texts = ['Mandag: fisk\nTirsdag:\nOnsdag: kjøtt x2\n2 dl melk\n%d egg' % i for i in range(1, 21)]
+    seeds = list(range(20))
+    expected = [cookbook.session(seed).parse_menu(text) for text, seed in zip(menu_texts, seeds)]
+
+    # Sessions start from the availability of the cookbook, and don't change it:
+    assert sorted(cookbook.available_recipes) == available
+    assert all(menu.recipes[0].name in available for menu in expected)
+
+    for workers in [1, 4]:
+        menus = cookbook.parse_menus(menu_texts, seeds, workers=workers)
+        assert [menu.generate_processed_menu_str() for menu in menus] == \
+            [menu.generate_processed_menu_str() for menu in expected]
+        assert [str(menu.groceries) for menu in menus] == [str(menu.groceries) for menu in expected]
+    assert sorted(cookbook.available_recipes) == available
+
+
+def test_Cookbook_seeded_random_generator():
+    menu_text = 'Mandag:\nTirsdag: fisk\nOnsdag: kjøtt\nTorsdag:\n2 dl melk'
+    state = random.getstate()
+
+    menus = [Cookbook(cookbook_reader.recipes, seed=7).parse_menu(menu_text) for _ in range(3)]
+    menus += [Cookbook(cookbook_reader.recipes).parse_menu(menu_text, seed=7) for _ in range(3)]
+    menus += [Cookbook(cookbook_reader.recipes).parse_menu(menu_text, rng=random.Random(7)) for _ in range(3)]
+    assert len({menu.generate_processed_menu_str() for menu in menus}) == 1
+
+    picks = []
+    for cookbook in [Cookbook(cookbook_reader.recipes, seed=1), Cookbook(cookbook_reader.recipes, rng=random.Random(1))]:
+        picks += [[cookbook.find_recipe('', make_unavailable=False).name for _ in range(20)]]
+    assert picks[0] == picks[1]
+    assert random.getstate() == state  # The random module is not used when a seed is given.
+
+
+def test_Cookbook_reset_gives_same_menu_as_new_cookbook():
+    menu_text = 'Mandag:\nTirsdag: fisk\nOnsdag: kjøtt\nTorsdag:\nFredag:'
+    cookbook = Cookbook(cookbook_reader.recipes)
+    cookbook.parse_menu(menu_text, seed=1)
+    cookbook.reset_available_recipes()
+
+    expected = Cookbook(cookbook_reader.recipes).parse_menu(menu_text, seed=5)
+    assert cookbook.parse_menu(menu_text, seed=5).generate_processed_menu_str() == \
+        expected.generate_processed_menu_str()
@@ -0,0 +1,78 @@
+"""Tests for the recipe search indexes."""
+import random
+
+import pytest
+import tregex
+
+from groceries.search import TrigramIndex, IngredientIndex, AvailableSet
+from groceries.similarity import SimilarityEngine
+from groceries.test.bin import cookbook_reader
+
+
+def test_trigram_index_matches_linear_search():
+    names = [recipe.name for recipe in cookbook_reader.recipes]
+    index = TrigramIndex(names)
+
+    random.seed(1)
+    searches = [name.lower() for name in names] + ['fisk', 'laks', 'chili con karne', 'tacp', 'pasta med laks']
+    for search in searches + [''.join(random.sample(search, len(search))) for search in searches]:
+        for limit in [0.5, 0.8, 0.95]:
+            expected = next((name for name in names if tregex.similarity(search, name.lower()) >= limit), None)
+            assert index.find(search, limit) == expected
+
+
+def test_trigram_index_add_and_remove():
+    index = TrigramIndex(['Lasagne', 'Pizza'])
+    assert index.find('lasange', 0.8) == 'Lasagne'
+
+    index.add('Lasange')
+    index.add('Lasagne')  # Re-adding keeps the original order.
+    assert index.find('lasange', 0.8) == 'Lasagne'
+
+    index.remove('Lasagne')
+    assert 'Lasagne' not in index
+    assert index.find('lasange', 0.8) == 'Lasange'
+    assert index.find('pizza', 0.8) == 'Pizza'
+    assert len(index) == 2
+
+
+def test_ingredient_index():
+    index = IngredientIndex()
+    index.add('Chili', ['kjøttdeig', 'hakket tomat', 'paprika'])
+    index.add('Taco', ['kjøttdeig', 'lomper', 'mais'])
+    index.add('Laks', ['laks', 'poteter'])
+
+    similarity = SimilarityEngine(maxsize=2)
+    assert index.recipes(['kjøttdeig'], 0.9, similarity) == {'Chili', 'Taco'}
+    assert index.recipes(['hakkede tomat', 'potet'], 0.8, similarity) == {'Chili', 'Laks'}
+    assert index.recipes(['melk'], 0.9, similarity) == set()
+    assert len(similarity) <= 2
+
+    index.remove('Taco')
+    assert 'Taco' not in index
+    assert index.recipes(['kjøttdeig', 'lomper'], 0.9) == {'Chili'}
+
+
+def test_available_set():
+    available = AvailableSet(['a', 'b', 'c', 'd'])
+    available.remove('b')
+    available.remove('a')
+    assert len(available) == 2
+    assert sorted(available) == ['c', 'd']
+    assert 'a' not in available and 'c' in available
+    assert random.choice(available) in ['c', 'd']
+    with pytest.raises(ValueError):
+        available.remove('a')
+
+    available.restore('a')
+    assert sorted(available) == ['a', 'c', 'd']
+
+    available.add('e')
+    available.delete('c')
+    assert sorted(available) == ['a', 'd', 'e']
+    assert sorted(available.names) == ['a', 'b', 'd', 'e']
+
+    available.reset()
+    assert list(available) == ['a', 'b', 'd', 'e']  # In the order they were added.
+    with pytest.raises(IndexError):
+        available[4]
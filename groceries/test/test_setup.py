@@ -0,0 +1,28 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_import_from_built_tree(tmp_path):
+    """The packages listed in setup.py are all that an installed build has."""
+    build = subprocess.run([sys.executable, 'setup.py', '-q', 'build', '--build-base', str(tmp_path / 'build')],
+                           cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if build.returncode != 0:
+        pytest.skip('setup.py build failed: %s' % build.stdout.decode(errors='replace')[-500:])
+
+    code = ('import groceries\n'
+            'assert groceries.__file__.startswith(%r)\n'
+            'from groceries import GroceryList, Ingredient\n'
+            'from groceries.pantry import Pantry\n'
+            'from groceries import aio, conversion\n'
+            'print(GroceryList(["200 g flour", "3 dl flour"], convert=True).ingredients_formatted())\n'
+            % str(tmp_path))
+    env = dict(os.environ, PYTHONPATH=str(tmp_path / 'build' / 'lib'))
+    result = subprocess.run([sys.executable, '-c', code], cwd=str(tmp_path), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    assert result.returncode == 0, result.stdout.decode(errors='replace')
+    assert b'365 g flour' in result.stdout
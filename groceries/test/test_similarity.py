@@ -0,0 +1,55 @@
+"""Tests for the similarity engine."""
+import itertools
+
+import pytest
+import tregex
+
+from groceries import GroceryList
+from groceries.similarity import SimilarityEngine, MatcherScorer
+from groceries.test.bin import cookbook_reader
+
+NAMES = sorted({ing.name for recipe in cookbook_reader.recipes for ing in recipe.ingredients.ingredients()}) + \
+    ['', 'a', 'aaaa', 'løk', 'kjøttdeig', 'kjøtdeig', 'hakkede tomater']
+
+
+def test_scores_match_reference():
+    engine = SimilarityEngine()
+    scorer = MatcherScorer(maxsize=4)
+    for _ in range(2):  # The second time, the scores are cached.
+        for string1, string2 in itertools.product(NAMES, repeat=2):
+            expected = tregex.similarity(string1, string2)
+            assert scorer(string1, string2) == expected
+            assert engine(string1, string2) == expected
+            assert engine.upper_bound(string1, string2) >= expected
+
+
+@pytest.mark.parametrize('limit', [0.5, 0.8, 0.9])
+def test_score_with_limit(limit):
+    engine = SimilarityEngine()
+    for string1, string2 in itertools.product(NAMES, repeat=2):
+        expected = tregex.similarity(string1, string2)
+        score = engine.score(string1, string2, limit)
+        if expected >= limit:
+            assert score == expected
+        else:
+            assert score in (expected, 0)  # Pairs below the limit are either scored or pruned.
+    assert engine.pruned > 0
+
+
+def test_cache_is_bounded_and_symmetric():
+    engine = SimilarityEngine(scorer=tregex.similarity, maxsize=3, symmetric=True)
+    engine('melk', 'mel')
+    assert engine.stats()['misses'] == 1
+    engine('mel', 'melk')
+    assert engine.stats()['hits'] == 1
+
+    for name in NAMES[:10]:
+        engine('melk', name)
+    assert len(engine) == 3
+
+
+def test_compare_with_matches_reference():
+    groceries = GroceryList(['2 dl fløte', '400 g kjøttdeig', '1 boks hakkede tomater', 'salt'])
+    for recipe in cookbook_reader.recipes:
+        assert recipe.ingredients.compare_with(groceries, verbose=True) == \
+            recipe.ingredients.compare_with(groceries, verbose=True, similarity=tregex.similarity)
@@ -0,0 +1,67 @@
+"""Tests for the binary cookbook snapshot."""
+import struct
+from copy import deepcopy
+
+import pytest
+
+from groceries.configs.config_handler import config
+from groceries.configs.language.norwegian import language as norwegian_language
+from groceries.snapshot import save_snapshot, load_snapshot, SnapshotError, HEADER, MAGIC
+from groceries.recipes import Cookbook
+from groceries.test.bin import cookbook_reader
+
+
+def test_snapshot_round_trip(tmpdir):
+    filename = str(tmpdir.join('cookbook.bin'))
+    cookbook = Cookbook(cookbook_reader.recipes)
+    save_snapshot(cookbook, filename)
+    loaded = load_snapshot(filename)
+
+    assert list(loaded.recipes) == list(cookbook.recipes)
+    for name, recipe in cookbook.recipes.items():
+        loaded_recipe = loaded.recipes[name]
+        for field in ['tags', 'time', 'serves', 'how_to']:
+            assert getattr(loaded_recipe, field) == getattr(recipe, field)
+        assert str(loaded_recipe.ingredients) == str(recipe.ingredients)
+        assert loaded_recipe.ingredients.components() == recipe.ingredients.components()
+        assert all(component.recipe is loaded_recipe for ing in loaded_recipe.ingredients.ingredient_list
+                   for component in ing.components)
+
+
+def test_snapshot_rejects_other_configs(tmpdir):
+    filename = str(tmpdir.join('cookbook.bin'))
+    save_snapshot(Cookbook(cookbook_reader.recipes), filename)
+
+    old_language = deepcopy(config.language)
+    try:
+        config.set_config(norwegian_language)
+        with pytest.raises(SnapshotError):
+            load_snapshot(filename)
+    finally:
+        config.set_config(old_language)
+
+    assert list(load_snapshot(filename).recipes) == [recipe.name for recipe in cookbook_reader.recipes]
+
+
+def test_snapshot_rejects_other_files(tmpdir):
+    filename = str(tmpdir.join('cookbook.bin'))
+    save_snapshot(Cookbook(cookbook_reader.recipes), filename)
+    with open(filename, 'rb') as fid:
+        data = bytearray(fid.read())
+
+    # Another version of the format:
+    struct.pack_into('<I', data, len(MAGIC), 2)
+    with open(filename, 'wb') as fid:
+        fid.write(data)
+    with pytest.raises(SnapshotError):
+        load_snapshot(filename)
+
+    with open(filename, 'wb') as fid:
+        fid.write(b'Not a snapshot.' * HEADER.size)
+    with pytest.raises(SnapshotError):
+        load_snapshot(filename)
+
+    with open(filename, 'wb') as fid:
+        fid.write(b'')
+    with pytest.raises(SnapshotError):
+        load_snapshot(filename)
@@ -0,0 +1,51 @@
+import pytest
+
+from groceries.symbols import SymbolTable, ingredient_key, split_key, names, dimensions
+from groceries import Ingredient, GroceryList
+
+
+def test_symbol_table():
+    table = SymbolTable(limit=2)
+    assert table.id('milk') == 0
+    assert table.id('banana') == 1
+    assert table.id('milk') == 0
+    assert 'banana' in table and 'apple' not in table
+    assert table.symbol(1) == 'banana'
+    assert table.symbols == ['milk', 'banana']
+    assert len(table) == 2
+    with pytest.raises(OverflowError):
+        table.id('apple')
+
+
+def test_ingredient_keys():
+    key = ingredient_key('milk', 'volume')
+    assert key == ingredient_key('milk', 'volume')
+    assert key != ingredient_key('milk', 'mass')
+    assert split_key(key) == ('milk', 'volume')
+    assert 'milk' in names and 'volume' in dimensions
+
+    milk = Ingredient('2 dl milk')
+    assert milk.key == Ingredient('1 l milk').key == ingredient_key('milk', milk.unit.dimension)
+    assert milk.key != Ingredient('200 g milk').key
+    assert split_key(milk.key) == ('milk', milk.unit.dimension)
+    assert milk.id == 'milk_' + milk.unit.dimension
+
+
+def test_ingredient_key_follows_name_and_unit():
+    milk = Ingredient('2 dl milk')
+    copied = Ingredient(milk)
+    assert copied.key == milk.key
+
+    copied.name = 'cream'
+    assert copied.key == ingredient_key('cream', milk.unit.dimension)
+    copied.unit = Ingredient('200 g milk').unit
+    assert split_key(copied.key) == ('cream', copied.unit.dimension)
+    assert milk.key == ingredient_key('milk', milk.unit.dimension)
+
+
+def test_collation_on_keys():
+    grocery_list = GroceryList(['2 dl milk', '1 banana', '1 l milk', '200 g milk'])
+    amounts = grocery_list.amounts()
+    assert set(amounts) == {ing.id for ing in grocery_list.collate_ingredients()}
+    assert len(amounts) == 3
+    assert grocery_list.contains(Ingredient('1 dl milk'))
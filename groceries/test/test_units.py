@@ -1,8 +1,9 @@
 """Tests for the unit-components of the groceries package."""
 import pytest
 import numpy
+from copy import deepcopy
 from groceries.configs.config_handler import config
-from groceries import units
+from groceries import units, formatter
 
 TEST_CASES_COMPONENTS = [
     ('mg', numpy.array([1000000, 1000000 * 4 / 3]), '1 - 1 1/3 kg'),
@@ -61,3 +62,102 @@ def test_match_non_unit():
     assert unit.dimension == 'none'
     assert scale == 1
     assert text == ''
+
+
+@pytest.mark.parametrize('candidate', ['kg', '2 kg', '2kg salt', 'fluid ounce', '2 fluid ounces water', 'fluid', 'mm',
+                                       'in', 'x2dl', 'salt', '1 pakke', 'hele', ''])
+def test_units_match_index(candidate):
+    # The unit index gives the same result as trying every unit in order:
+    u = units.Units()
+
+    expected = (u.no_unit, 1, '')
+    for unit in u.units:
+        if unit.match(candidate)[0]:
+            expected = unit.match(candidate)
+            break
+
+    assert u.match(candidate) == expected
+
+
+def test_units_match_unindexed_unit():
+    u = units.Units()
+    u.units.insert(0, units.Unit('custom', {'fl.oz': {'scale': 2}}))
+    u._build_index()
+
+    assert u.match('2 fl.oz')[0].dimension == 'custom'
+    assert u.match('2 kg')[0].dimension == 'mass'
+
+
+def test_units_are_built_on_first_use():
+    u = units.Units()
+    assert not u.loaded
+
+    u.reload_units()
+    assert not u.loaded and u.revision == 1
+
+    assert u.match('2 kg')[0].dimension == 'mass'
+    assert u.loaded
+
+    unit = units.Unit('custom', {'fl.oz': {'scale': 2}})
+    assert unit._lookup_dict is None
+    assert unit.formatting[0]['unit'] == 'fl.oz'
+    assert 'fl.oz' in unit.lookup_dict
+
+
+def test_fraction_table_matches_find_intuitive_fraction():
+    table = formatter.fraction_table(config.constants.intuitive_denominators)
+    numbers = numpy.random.RandomState(0).uniform(-1, 1, 20000).tolist()
+    numbers += [i / 10000 for i in range(-10000, 10001, 7)] + [0.99996, -0.99996, 0.00004, 1 / 3, 2 / 3]
+    for number in numbers:
+        assert table.find(number) == units.Unit.find_intuitive_fraction(number)
+
+
+def test_rule_table_matches_checks():
+    candidates = numpy.concatenate([numpy.random.RandomState(0).uniform(0, 3000, 2000),
+                                    numpy.random.RandomState(1).uniform(0, 2, 2000),
+                                    [0, 0.5, 1, 300, 1000, 2000, 0.01, 0.015, 0.005 / 4, 453.59237]])
+    for unit in units.Units().units:
+        rules = formatter.RuleTable(unit.formatting)
+        expected = []
+        for candidate in candidates:
+            matches = [i for i, variant in enumerate(unit.formatting)
+                       if all(check(candidate) for check in variant['checks'])]
+            expected += [matches[0] if matches else len(rules)]
+
+        assert [rules.find(candidate) for candidate in candidates] == expected
+        assert rules.find_all(candidates).tolist() == expected
+
+
+def test_fraction_translation():
+    fractions_inverse = config.constants.fractions_inverse
+    translate = formatter.fraction_translation(fractions_inverse)
+    for string in ['1/2 dl', '1 1/2 - 2 3/4 cups', '1/2/3', '11/22', '3/1/2 1/3/4']:
+        expected = string
+        for fraction in fractions_inverse:
+            expected = expected.replace(fraction, fractions_inverse[fraction])
+        assert translate(string) == expected
+
+    # Replacing one at a time, 1/2 is replaced before 11/2 is found:
+    assert formatter.fraction_translation({'1/2': 'a', '11/2': 'b'})('11/2') == '1a'
+
+
+@pytest.mark.parametrize('small_fractions', [False, True])
+def test_amounts_formatted_matches_amount_formatted(small_fractions):
+    old_settings = deepcopy(config.settings)
+    settings = deepcopy(config.settings)
+    settings.small_fractions = small_fractions
+    config.set_config(settings)
+    try:
+        random = numpy.random.RandomState(0)
+        amounts = [numpy.array([x]) for x in random.uniform(0, 3000, 500)]
+        amounts += [numpy.array(sorted(x)) for x in random.uniform(0, 3, (200, 2))]
+        amounts += [numpy.array(x) for x in [[], [0], [0, 0], [3, 0], [0, 2.5], [-0.5], [-1, -2], [-1, 0.5],
+                                             [1], [1, 1], [24], [numpy.nan], [0.99996], [1 / 3, 2 / 3]]]
+
+        u = units.Units()
+        for unit in u.units + [u.no_unit]:
+            expected = [unit.amount_formatted(amount.copy()) if amount.size else '' for amount in amounts]
+            assert unit.formatter.amounts_formatted(amounts) == expected
+            assert formatter.amounts_formatted([unit] * len(amounts), amounts) == expected
+    finally:
+        config.set_config(old_settings)
@@ -9,12 +9,15 @@
 # Licence:     <your licence>
 # -------------------------------------------------------------------------------
 import math
+import re
 import numpy
-from re import sub
+import threading
 from typing import List, Tuple, Dict, Union
 
 import tregex
 
+from groceries.formatter import UnitFormatter
+from groceries.instrumentation import instrumentation
 from groceries.configs.config_handler import config
 
 
@@ -39,15 +42,46 @@ class Unit(object):
         self.dimension = dimension
         if not units:
             units = {'': config.unit_definition.constants.empty_unit}
-        self.lookup_dict = self.construct_lookup_dict(units)
-
-        self.pattern = r'(?:(?<=[\d\W])|(?<=^))(?P<unit>' + '|'.join(self.lookup_dict.keys()) + r')(?:(?=\W)|(?=$))'
-
-        if not formatting:
+        self._units = units
+        self._formatting = formatting
+
+        # The lookup dict and pattern are built the first time they are used.
+        self._lookup_dict = None
+        self._pattern = None
+        self._formatter = None
+
+    @property
+    def lookup_dict(self) -> dict:
+        """Every unit text of the dimension (prefixes, variants and plurals)
+        with the scale, unit and plural it maps to."""
+        if self._lookup_dict is None:
+            self._lookup_dict = self.construct_lookup_dict(self._units)
+        return self._lookup_dict
+
+    @property
+    def pattern(self) -> str:
+        """Regex matching any of the unit texts of the dimension."""
+        if self._pattern is None:
+            self._pattern = r'(?:(?<=[\d\W])|(?<=^))(?P<unit>' + '|'.join(self.lookup_dict.keys()) + r')(?:(?=\W)|(?=$))'
+        return self._pattern
+
+    @property
+    def formatting(self) -> List[Dict]:
+        """Formatting rules of the unit. Defaults to always using the first unit."""
+        if not self._formatting:
             unit = list(self.lookup_dict.values())[0]['unit']
-            formatting = [{'unit': unit, 'checks': [config.unit_definition.constants.AlwaysTrue()]}]
+            self._formatting = [{'unit': unit, 'checks': [config.unit_definition.constants.AlwaysTrue()]}]
+        return self._formatting
+
+    def __eq__(self, other: object) -> bool:
+        """Units are equal if they measure the same dimension. Keeps Ingredients
+        parsed before and after Units.reload_units comparable."""
+        if not isinstance(other, Unit):
+            return NotImplemented
+        return self.dimension == other.dimension
 
-        self.formatting = formatting
+    def __hash__(self) -> int:
+        return hash(self.dimension)
 
     def __repr__(self) -> str:
         limit = 3
@@ -71,59 +105,33 @@ class Unit(object):
         else:
             return False, False, False
 
+    def __getstate__(self) -> dict:
+        # The formatter holds compiled functions, which can't be pickled, and is rebuilt when first used.
+        state = dict(self.__dict__)
+        state['_formatter'] = None
+        return state
+
+    @property
+    def formatter(self) -> UnitFormatter:
+        """The compiled formatting of the unit, rebuilt when the configs change."""
+        if self._formatter is None or self._formatter.revision != config.revision:
+            self._formatter = UnitFormatter(self)
+        return self._formatter
+
     def scale_amount(self, normalized_amount: numpy.array) -> list:
         """
         Return a list of tuples containing the scaled components of the
         normalized amount,  according to this unit. The components consist
         of integer,  decimal,  numerator and denominator,  along with the
         unit_prefix corresponding to the scaling.
-        """
-
-        integer = 0
-        decimal = 0
-        numerator = 0
-        denominator = 0
-        unit = ''
-        amounts = []
-
-        normalized_amount.sort()
-
-        for variant in self.formatting:
-            try:
-                if len(variant['checks']) == sum([check(normalized_amount[0]) for check in variant['checks']]):
-                    unit = variant['unit']
-                    break
-            except TypeError:
-                abs(1)
-
-        # If no formatting is found, select the unit with scale == 1:
-        if not unit:
-            for variant in self.lookup_dict:
-                if self.lookup_dict[variant]['scale'] == 1:
-                    unit = variant
-                    break
 
-        # If still no unit, select the unit with the lowest scale:
-        if not unit:
-            lowest = None
-            for variant in self.lookup_dict:
-                if not lowest or self.lookup_dict[variant]['scale'] < lowest:
-                    unit = variant
-
-        scale = self.lookup_dict[unit]['scale']
-
-        for number in normalized_amount:
-            number /= scale
-            if number != 0:  # Only parse if nonzero.
-                decimal, integer = math.modf(number)
-
-                if decimal:
-                    numerator, denominator = self.find_intuitive_fraction(decimal)
-
-            amounts += [(integer, decimal, numerator, denominator, unit)]
-
-        return amounts
+        The unit is chosen by the first formatting rule where all checks are
+        true for the smallest number. If no rule matches, the unit with
+        scale == 1 is used.
+        """
+        return self.formatter.scale_amount(normalized_amount)
 
+    @instrumentation.timed('format')
     def amount_formatted(self, normalized_amount: numpy.array) -> str:
         """
         Return the amount and unit as a text string,  with logic for handling
@@ -134,62 +142,7 @@ class Unit(object):
         Assumes that the amount is normalized to the base unit of the current
         current Unit object.
         """
-
-        unit = ''
-        space = ''
-
-        amount_strings = []
-
-        if not isinstance(normalized_amount, numpy.ndarray):
-            raise TypeError('amount_formatted input must be numpy.ndarray')
-
-        if normalized_amount.size == 0:
-            return unit
-
-        less_than_zero = ''
-        check = normalized_amount < 0
-        if check.all():
-            normalized_amount = abs(normalized_amount)
-            less_than_zero = '-'
-
-        amounts = self.scale_amount(normalized_amount)
-
-        fraction = False
-        for integer, decimal, numerator, denominator, unit in amounts:
-            fraction = False
-            if decimal:
-                if numerator:
-                    fraction = True
-                    if integer:
-                        amount = '%(integer)d %(numerator)d/%(denominator)d' % locals()
-                    else:
-                        amount = '%(numerator)d/%(denominator)d' % locals()
-                else:
-                    amount = '%0.2f' % (integer + decimal)  # Keep decimals if fraction is not found.
-            else:
-                amount = '%0.0f' % integer  # No decimal if no decimal.
-
-            amount_strings += [less_than_zero + amount]
-
-        amount_string = ' - '.join(amount_strings)
-
-        if not normalized_amount.size == 0:
-            if max(normalized_amount) != 1 and not fraction:
-                unit = self.lookup_dict[unit]['plural']
-            else:
-                unit = self.lookup_dict[unit]['unit']
-
-        if amount_string and unit:
-            space = ' '
-
-        formatted = '%(amount_string)s%(space)s%(unit)s' % locals()
-
-        # Swap big fractions (1/2) with small fractions (½):
-        if config.settings.small_fractions:
-            for fraction in config.constants.fractions_inverse:
-                formatted = sub(fraction, config.constants.fractions_inverse[fraction], formatted)
-
-        return formatted
+        return self.formatter.amount_formatted(normalized_amount)
 
     @staticmethod
     def find_intuitive_fraction(number: Union[float, int]) -> Union[
@@ -253,14 +206,78 @@ class Units:
         - Unused dictionary keys do not need to be specified as they are covered by default values.
 """
 
-    def __init__(self) -> None:
+    # A unit can only start at the start of the string or after a digit or non-word character. The lookahead
+    # captures the word starting at each such position, so that overlapping candidates are all found.
+    candidate_pattern = re.compile(r'(?:(?<=[\d\W])|(?<=^))(?=(\w+))')
+    digit_pattern = re.compile(r'\d')
+    single_word_pattern = re.compile(r'\w+')
+    multi_word_pattern = re.compile(r'\w+(?: \w+)+')
 
-        self.units = self._define_units()
-        self.no_unit = Unit()  # Empty unit with default, blank properties for those groceries without a unit.
+    # Attributes built from the configs the first time any of them is used.
+    lazy_attributes = ('units', 'no_unit', 'index', 'multi_word_index', 'unindexed', 'dimensions')
+
+    def __init__(self) -> None:
+        self.revision = 0  # Incremented on reload, so that anything holding on to Unit objects knows they are stale.
+        self._lock = threading.RLock()
+
+    def __getattr__(self, item: str) -> object:
+        # Only called for attributes that are not set, i.e. the lazy attributes before the units are loaded.
+        if item in Units.lazy_attributes:
+            with self._lock:  # Another thread may be loading the units.
+                if item not in self.__dict__:
+                    self._load_units()
+            return self.__dict__[item]
+        raise AttributeError(item)
+
+    @property
+    def loaded(self) -> bool:
+        """True if the units have been built from the configs."""
+        return 'units' in self.__dict__
+
+    def _load_units(self) -> None:
+        with self._lock:
+            if 'no_unit' not in self.__dict__:
+                self.no_unit = Unit()  # Empty unit with default, blank properties for those groceries without a unit.
+            self.units = self._define_units()
+            self._build_index()
 
     def reload_units(self) -> None:
-        """Reload the units based on the configs."""
-        self.units = self._define_units()
+        """Reload the units based on the configs. Units that are not loaded
+        yet are built from the configs when they are first used."""
+        self.revision += 1
+        if self.loaded:
+            self._load_units()
+
+    def _build_index(self) -> None:
+        """Build the lookup tables used by match from the lookup_dict of every Unit.
+            - index: unit text -> (unit order, key order, Unit, scale) for all single word unit texts.
+            - multi_word_index: first word -> [(text, unit order, key order, Unit, scale)] for unit texts containing
+              spaces, like "fluid ounce".
+            - unindexed: (unit order, Unit) for units with unit texts that are neither, matched with Unit.match.
+            - dimensions: dimension -> Unit, for getting the Unit of a dimension.
+        The first Unit in self.units defining a unit text takes precedence, same as when scanning the units in order.
+        The tables are built before they are set, so that other threads never see them half built."""
+        index = {}
+        multi_word_index = {}
+        unindexed = []
+        dimensions = {self.no_unit.dimension: self.no_unit}
+
+        for unit_order, unit in enumerate(self.units):
+            dimensions.setdefault(unit.dimension, unit)
+            if not all(self.single_word_pattern.fullmatch(text) or self.multi_word_pattern.fullmatch(text)
+                       for text in unit.lookup_dict):
+                unindexed += [(unit_order, unit)]
+                continue
+
+            for key_order, (text, properties) in enumerate(unit.lookup_dict.items()):
+                entry = (unit_order, key_order, unit, properties['scale'])
+                if ' ' not in text:
+                    index.setdefault(text, entry)
+                else:
+                    first_word = text.split(' ', 1)[0]
+                    multi_word_index.setdefault(first_word, []).append((text,) + entry)
+
+        self.index, self.multi_word_index, self.unindexed, self.dimensions = index, multi_word_index, unindexed, dimensions
 
     @staticmethod
     def _define_units() -> list:
@@ -282,11 +299,47 @@ class Units:
                 units += [Unit(dimension, config.unit_definition.units[dimension], formatting)]
         return units
 
+    def get(self, dimension: str) -> Unit:
+        """Return the Unit measuring a dimension."""
+        return self.dimensions[dimension]
+
+    @instrumentation.timed('units.match')
     def match(self, string: str) -> Tuple[Unit, Union[float, int], str]:
-        for unit in self.units:
-            unit, scale, text = unit.match(string)
-            if unit:
-                return unit, scale, text
+        """Find the unit in string. Gives the same result as trying Unit.match for every unit in order, but looks
+        up the candidate words of the string in the unit index instead."""
+
+        # Fast path for a single known unit word, which is what IngredientComponent passes in.
+        hit = self.index.get(string)
+        if hit and not self.unindexed and not self.digit_pattern.search(string):
+            unit_order, key_order, unit, scale = hit
+            return unit, scale, string
+
+        best = None  # (unit order, position, key order, Unit, scale, text)
+        for candidate in self.candidate_pattern.finditer(string):
+            position = candidate.start()
+            word = candidate.group(1)
+
+            hit = self.index.get(word)
+            if hit:
+                unit_order, key_order, unit, scale = hit
+                if not best or (unit_order, position, key_order) < best[:3]:
+                    best = (unit_order, position, key_order, unit, scale, word)
+
+            for text, unit_order, key_order, unit, scale in self.multi_word_index.get(word, []):
+                end = position + len(text)
+                if string.startswith(text, position) and not self.single_word_pattern.match(string, end):
+                    if not best or (unit_order, position, key_order) < best[:3]:
+                        best = (unit_order, position, key_order, unit, scale, text)
+
+        for unit_order, unit in self.unindexed:
+            if best and best[0] < unit_order:
+                break
+            matched_unit, scale, text = unit.match(string)
+            if matched_unit:
+                return matched_unit, scale, text
+
+        if best:
+            return best[3], best[4], best[5]
         return self.no_unit, 1, ''
 
 units = Units()
@@ -16,13 +16,18 @@ setuptools.setup(name='groceries-tobiasli',
                            'groceries/configs/menu_format',
                            'groceries/configs/settings',
                            'groceries/configs/unit_definition',
+                           'groceries/configs/density_table',
                            'groceries/test'],
                  package_data={'': ['groceries/test/bin/cookbook.yaml']},
                  long_description=long_description,
                  long_description_content_type="text/markdown",
+                 python_requires='>=3.7',
                  install_requires=['tregex-tobiasli', 'numpy', 'pytest', 'pyyaml'],
                  classifiers=[
                      "Programming Language :: Python :: 3",
+                     "Programming Language :: Python :: 3 :: Only",
+                     "Programming Language :: Python :: 3.7",
+                     "Programming Language :: Python :: 3.8",
                      "License :: OSI Approved :: MIT License",
                      "Operating System :: OS Independent",
                  ],